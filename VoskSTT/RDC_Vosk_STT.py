@@ -1,8 +1,5 @@
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
-import queue
-import sounddevice as sd
-import vosk
+from tkinter import ttk, scrolledtext, messagebox, filedialog
 import sys
 import json
 import threading
@@ -17,11 +14,26 @@ import win32com.client
 import win32api as wapi
 import win32con as wcon
 import time
+import queue
 import numpy as np
 import traceback  # Add this import
 import shutil  # For moving dropped model folders
 from tkinter.font import Font  # Add for customizing fonts
 import webbrowser  # Add this import
+from collections import deque
+from stt_engine import RecognitionEngine, MicrophoneSource, CallbackSink
+from model_index import ModelIndex, ModelWatcher, calculate_folder_size
+from model_pool import ModelPool
+from model_loader import ModelLoader
+from vad import EnergyTracker, VoiceActivityDetector
+from key_phrases import KeyPhraseSpotter, PhraseMatcher
+from log_pipeline import LogPipeline
+from delivery import DeliveryWorker, create_backend
+from journal import SessionJournal, JournalSink
+from word_store import WordStore
+from multilang import LanguageSet
+from metrics import REGISTRY, LatencyStats, MetricsWriter, SamplingProfiler
+from rescoring import Rescorer, SegmentStore
 
 # Get the path to the model folder relative to the script location
 BASE_PATH = os.path.dirname(os.path.abspath(__file__))
@@ -33,6 +45,48 @@ MODELS = {
     "Large": "vosk-model-en-us-0.22"
 }
 
+# Memory budget for models kept loaded for quick switching
+MODEL_POOL_BUDGET_MB = 2048
+
+# Capture block sizes in milliseconds. Low-latency mode captures small blocks so
+# silence detection reacts quickly, and aggregates them for the recognizer.
+SAMPLE_RATE = 16000
+CAPTURE_BLOCK_MS = 500
+LOW_LATENCY_CAPTURE_MS = 20
+LOW_LATENCY_CHUNK_MS = 200
+
+# Only forward speech regions to the recognizer, skipping silence and room noise
+USE_VAD = True
+
+# When decoding falls behind live speech: "block" decodes everything, "drop_silence"
+# skips non-speech audio and "coalesce" decodes the backlog in large blocks
+OVERLOAD_POLICY = "drop_silence"
+# Seconds behind live audio at which the user is warned, or a smaller model of the
+# same language is loaded when LAG_SWITCH_MODEL is set
+LAG_WARN_SECONDS = 8.0
+LAG_SWITCH_MODEL = True
+
+# Re-decode finished utterances with the largest model of the same language while
+# nobody is speaking, and update the transcript with the result
+TWO_PASS = True
+RESCORE_IDLE_SECONDS = 5.0  # Silence before the second pass may use the CPU
+
+# After the spotter hears a key phrase, wait this long for the words before it
+# to be finalized and delivered before pressing Enter anyway
+KEY_PHRASE_FLUSH_WAIT_MS = 400
+# A phrase seen by both the spotter and the main recognizer only presses Enter once
+KEY_PHRASE_DEDUPE_SECONDS = 2.0
+# Character edits tolerated per word of key phrases added with a trailing "~"
+# ("i'm done talking~"); 0 matches every phrase exactly, since a false match
+# presses Enter in the target window
+KEY_PHRASE_MAX_EDITS = 0
+
+# How finished utterances reach other windows: "keystrokes" or "clipboard"
+DELIVERY_BACKEND = "keystrokes"
+
+# Start the microphone at launch and decode the buffered audio once the model is ready
+CAPTURE_DURING_LOAD = False
+
 # Add preset applications
 APP_PRESETS = {
     "Notepad": "Notepad",
@@ -42,21 +96,77 @@ APP_PRESETS = {
     "Default": None
 }
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG,
-                   format='%(asctime)s - %(levelname)s - %(message)s',
-                   handlers=[logging.StreamHandler(),
-                           logging.FileHandler('speech_debug.log')])
+# Configure logging: callers only queue records, a writer thread does the I/O
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+LOG_PIPELINE = LogPipeline('speech_debug.log', level=logging.DEBUG)
+LOG_PIPELINE.start()
+
+# How often the Tk thread runs callbacks queued by the recognition and other worker
+# threads, which must not touch Tk variables or widgets themselves
+UI_POLL_MS = 10
+
+# Debug window keeps only the most recent lines and repaints at most this often
+DEBUG_BUFFER_LINES = 2000
+DEBUG_REFRESH_MS = 250
+DEBUG_METRICS_REFRESH_MS = 1000
+
+# Stage timings and counters, rewritten every few seconds for scrapers (speech_metrics.json / .prom)
+METRICS_FLUSH_SECONDS = 10
+METRICS_WRITER = MetricsWriter(REGISTRY, 'speech_metrics', interval=METRICS_FLUSH_SECONDS)
+METRICS_WRITER.start()
+# Where the Debug window's Profile toggle writes its report
+PROFILE_PATH = 'speech_profile.txt'
 
 class DebugWindow:
     def __init__(self, parent):  # Add parent parameter
         self.window = tk.Toplevel()
         self.window.title("Debug Info")
-        self.window.geometry("400x300")
+        self.window.geometry("520x460")
         self.parent = parent  # Store parent reference
         
+        level_frame = ttk.Frame(self.window)
+        level_frame.pack(fill=tk.X)
+        ttk.Label(level_frame, text="Level:").pack(side=tk.LEFT, padx=5)
+        self.level_var = tk.StringVar(value=logging.getLevelName(LOG_PIPELINE.level))
+        level_combo = ttk.Combobox(
+            level_frame,
+            textvariable=self.level_var,
+            values=LOG_LEVELS,
+            state='readonly',
+            width=10
+        )
+        level_combo.pack(side=tk.LEFT)
+        level_combo.bind('<<ComboboxSelected>>', lambda e: LOG_PIPELINE.set_level(self.level_var.get()))
+
+        ttk.Label(level_frame, text="Filter:").pack(side=tk.LEFT, padx=5)
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add('write', lambda *args: self.render(full=True))
+        ttk.Entry(level_frame, textvariable=self.filter_var).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+        self.profiler = SamplingProfiler()
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            level_frame,
+            text="Profile",
+            variable=self.profile_var,
+            command=self.toggle_profiler
+        ).pack(side=tk.LEFT, padx=5)
+
         self.log_area = scrolledtext.ScrolledText(self.window, wrap=tk.WORD)
         self.log_area.pack(expand=True, fill='both')
+
+        # Live stage metrics, repainted while the window is open
+        self.metrics_area = tk.Text(self.window, height=10, wrap=tk.NONE, font=('Courier', 8))
+        self.metrics_area.pack(fill=tk.X)
+        self.metrics_job = None
+
+        # Recent lines; log() may be called from any thread, rendering happens on the Tk thread
+        self.entries = deque(maxlen=DEBUG_BUFFER_LINES)
+        self.entries_lock = threading.Lock()
+        self.total_logged = 0  # Lines ever appended
+        self.rendered = 0  # total_logged as of the last render
+        self.visible = False
+        self.refresh_job = None
         
         # Hide window by default
         self.window.withdraw()
@@ -66,13 +176,85 @@ class DebugWindow:
     
     def show(self):
         self.window.deiconify()
+        self.visible = True
+        self.render(full=True)
+        if self.refresh_job is None:
+            self.refresh_job = self.window.after(DEBUG_REFRESH_MS, self.refresh)
+        if self.metrics_job is None:
+            self.refresh_metrics()
         
     def on_closing(self):
         self.window.withdraw()  # Just hide the window
+        self.visible = False
+        if self.refresh_job is not None:
+            self.window.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        if self.metrics_job is not None:
+            self.window.after_cancel(self.metrics_job)
+            self.metrics_job = None
+
+    def refresh_metrics(self):
+        self.metrics_job = None
+        if not self.visible:
+            return
+        self.metrics_area.delete(1.0, tk.END)
+        self.metrics_area.insert(tk.END, "\n".join(REGISTRY.summary()) or "No metrics yet")
+        self.metrics_job = self.window.after(DEBUG_METRICS_REFRESH_MS, self.refresh_metrics)
+
+    def toggle_profiler(self):
+        """Start sampling all threads, or stop and write the report"""
+        if self.profile_var.get():
+            self.profiler.start()
+            logging.info("Sampling profiler started")
+            return
+        self.profiler.stop()
+        report = self.profiler.report()
+        try:
+            with open(PROFILE_PATH, 'w', encoding='utf-8') as f:
+                f.write(report + "\n")
+        except OSError as e:
+            logging.warning(f"Could not write profile: {e}")
+        logging.info(f"Sampling profiler stopped, report in {PROFILE_PATH}:\n" + "\n".join(report.splitlines()[:12]))
     
     def log(self, message):
-        self.log_area.insert(tk.END, f"{message}\n")
-        self.log_area.see(tk.END)
+        """Buffer a line; costs the same whether or not the window is open"""
+        with self.entries_lock:
+            self.entries.append(message)
+            self.total_logged += 1
+
+    def refresh(self):
+        """Periodic repaint while the window is visible"""
+        self.refresh_job = None
+        if not self.visible:
+            return
+        if self.total_logged != self.rendered:
+            self.render()
+        self.refresh_job = self.window.after(DEBUG_REFRESH_MS, self.refresh)
+
+    def render(self, full=False):
+        """Append the lines logged since the last render in one insert"""
+        with self.entries_lock:
+            new = self.total_logged - self.rendered
+            self.rendered = self.total_logged
+            lines = list(self.entries)
+        if not full and new >= len(lines):
+            full = True  # Everything on screen has scrolled out of the buffer
+        if not full:
+            lines = lines[-new:] if new else []
+        query = self.filter_var.get().strip().lower()
+        if query:
+            lines = [line for line in lines if query in line.lower()]
+        at_bottom = self.log_area.yview()[1] >= 0.999
+        if full:
+            self.log_area.delete(1.0, tk.END)
+        if lines:
+            self.log_area.insert(tk.END, "\n".join(lines) + "\n")
+        # Keep the widget itself as bounded as the buffer
+        excess = int(self.log_area.index('end-1c').split('.')[0]) - 1 - DEBUG_BUFFER_LINES
+        if excess > 0:
+            self.log_area.delete(1.0, f"{excess + 1}.0")
+        if at_bottom or full:
+            self.log_area.see(tk.END)
 
 class WindowSelector(tk.Toplevel):
     def __init__(self, parent, presets):
@@ -159,6 +341,47 @@ class WindowSelector(tk.Toplevel):
             self.selected_hwnd = self.windows[selection[0]][0]
             self.destroy()
 
+class TranscriptSearchWindow(tk.Toplevel):
+    """Keyword and date search over the session journal"""
+
+    def __init__(self, parent, journal):
+        super().__init__(parent)
+        self.title("Search Transcripts")
+        self.geometry("500x400")
+        self.journal = journal
+
+        query_frame = ttk.Frame(self)
+        query_frame.pack(fill=tk.X, padx=5, pady=5)
+        self.query_var = tk.StringVar()
+        entry = ttk.Entry(query_frame, textvariable=self.query_var)
+        entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        entry.bind('<Return>', self.run_search)
+        ttk.Label(query_frame, text="Since (YYYY-MM-DD):").pack(side=tk.LEFT, padx=5)
+        self.since_var = tk.StringVar()
+        ttk.Entry(query_frame, textvariable=self.since_var, width=11).pack(side=tk.LEFT)
+        ttk.Button(query_frame, text="Search", command=self.run_search).pack(side=tk.LEFT, padx=5)
+
+        self.results_area = scrolledtext.ScrolledText(self, wrap=tk.WORD)
+        self.results_area.pack(fill=tk.BOTH, expand=True, padx=5)
+        self.status_label = ttk.Label(self, text="Words must all appear; end a word with * to match a prefix")
+        self.status_label.pack(fill=tk.X, padx=5, pady=2)
+        entry.focus_set()
+
+    def run_search(self, event=None):
+        try:
+            since = time.mktime(time.strptime(self.since_var.get(), '%Y-%m-%d')) if self.since_var.get().strip() else None
+        except ValueError:
+            messagebox.showwarning("Invalid Date", "Use the YYYY-MM-DD format", parent=self)
+            return
+        t0 = time.perf_counter()
+        results = self.journal.search(self.query_var.get(), start=since, limit=200)
+        elapsed = (time.perf_counter() - t0) * 1000
+        self.results_area.delete(1.0, tk.END)
+        for record in results:
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record["t"]))
+            self.results_area.insert(tk.END, f"{stamp}  {record['text']}\n")
+        self.status_label.config(text=f"{len(results)} results in {elapsed:.1f} ms")
+
 class LoadingWindow:
     def __init__(self, parent):
         self.window = tk.Toplevel(parent)
@@ -178,13 +401,116 @@ class LoadingWindow:
         self.label = ttk.Label(self.window, text="Loading model...\nPlease wait...")
         self.label.pack(pady=20)
         
-        self.progress = ttk.Progressbar(self.window, mode='indeterminate')
+        self.progress = ttk.Progressbar(self.window, mode='determinate', maximum=100)
         self.progress.pack(fill=tk.X, padx=20)
-        self.progress.start()
+
+    def set_progress(self, fraction, message):
+        self.progress['value'] = fraction * 100
+        self.label.config(text=f"Loading model...\n{message}")
 
     def destroy(self):
         self.window.destroy()
 
+def segment_tag(segment_id):
+    """Text tag over the committed text of a segment stored for the second pass"""
+    return f"segment{segment_id}"
+
+
+class PartialTextRegion:
+    """In-progress utterance shown at the end of a Text widget
+
+    The region runs from the "partial_start" mark to the end of the widget.
+    Updates only delete and insert the words after the longest common
+    prefix with the previous partial, so the transcript is never re-rendered.
+    """
+
+    MARK = "partial_start"
+    TAG = "partial"
+
+    def __init__(self, text_widget):
+        self.text = text_widget
+        self.words = []
+        self.text.tag_configure(self.TAG, foreground='#2A2A2A', font=('TkDefaultFont', 12, 'italic'))
+
+    @property
+    def active(self):
+        return bool(self.words)
+
+    def _offset(self, count):
+        # Every word is followed by a single space, as in output_text
+        return sum(len(w) + 1 for w in self.words[:count])
+
+    def update(self, partial_text):
+        new_words = partial_text.split()
+        if not self.words:
+            if not new_words:
+                return
+            self.text.mark_set(self.MARK, "end-1c")
+            self.text.mark_gravity(self.MARK, tk.LEFT)
+
+        keep = 0
+        for old, new in zip(self.words, new_words):
+            if old != new:
+                break
+            keep += 1
+
+        start = f"{self.MARK} + {self._offset(keep)} chars"
+        self.text.delete(start, f"{self.MARK} + {self._offset(len(self.words))} chars")
+        if new_words[keep:]:
+            self.text.insert(start, "".join(w + " " for w in new_words[keep:]), self.TAG)
+        self.words = new_words
+        self.text.see(tk.END)
+
+    def commit(self, final_text, tag=None):
+        """Turn the region into regular transcript text holding final_text, optionally tagged"""
+        self.update(final_text)
+        if self.words:
+            end = f"{self.MARK} + {self._offset(len(self.words))} chars"
+            self.text.tag_remove(self.TAG, self.MARK, end)
+            if tag:
+                self.text.tag_add(tag, self.MARK, end)
+        self.words = []
+
+    def replace_committed(self, tag, final_text):
+        """Swap the committed text under tag for final_text; False once it is gone"""
+        ranges = self.text.tag_ranges(tag)
+        if not ranges:
+            return False
+        start = str(ranges[0])
+        self.text.mark_set("replace_end", ranges[-1])
+        new = "".join(w + " " for w in final_text.split())
+        # Insert first, so a region starting right after the old text stays after the new
+        self.text.insert(start, new, tag)
+        self.text.delete(f"{start} + {len(new)} chars", "replace_end")
+        self.text.mark_unset("replace_end")
+        return True
+
+    def forget(self, tag):
+        """Drop a tag whose text won't be replaced again; lookups slow down as tags pile up"""
+        self.text.tag_delete(tag)
+
+    def forget_all(self, prefix):
+        tags = [t for t in self.text.tag_names() if t.startswith(prefix)]
+        if tags:
+            self.text.tag_delete(*tags)
+
+    def clear(self):
+        self.update("")
+        self.words = []
+
+    def reset(self):
+        """Forget the region after the widget was cleared externally"""
+        self.words = []
+
+    def insert_before(self, text):
+        """Insert finished text ahead of the in-progress region"""
+        if self.words:
+            self.text.insert(self.MARK, text)
+            self.text.mark_set(self.MARK, f"{self.MARK} + {len(text)} chars")
+        else:
+            self.text.insert(tk.END, text)
+        self.text.see(tk.END)
+
 class ModelSelector(tk.Toplevel):
     def __init__(self, parent, models):
         super().__init__(parent)
@@ -220,32 +546,27 @@ class ModelSelector(tk.Toplevel):
             self.selected_model = self.models[selection[0]]
         self.destroy()
 
+# Cached model metadata; only new or changed model folders get rescanned
+MODEL_INDEX = ModelIndex()
+
 def find_available_models():
-    import os
-    one_level_up = os.path.abspath(os.path.join(BASE_PATH, '..'))
-    models_path = os.path.join(one_level_up, 'models')
-    if not os.path.isdir(models_path):
-        return []
-    all_dirs = [d for d in os.listdir(models_path)
-                if os.path.isdir(os.path.join(models_path, d))]
-    return [os.path.join(models_path, d) for d in all_dirs]
-
-def calculate_folder_size(folder_path):
-    total_size = 0
-    for root, dirs, files in os.walk(folder_path):
-        for f in files:
-            fp = os.path.join(root, f)
-            if os.path.isfile(fp):
-                total_size += os.path.getsize(fp)
-    return total_size
+    return MODEL_INDEX.paths()
 
 def find_smallest_model():
-    models = find_available_models()
-    if not models:
-        return None
-    sizes = [(m, calculate_folder_size(m)) for m in models]
-    smallest = min(sizes, key=lambda x: x[1])[0]
-    return smallest
+    return MODEL_INDEX.smallest()
+
+def refresh_and_find_smallest_model():
+    """Rescan the models folder, which reads the size and conf of every new model, then pick the smallest"""
+    MODEL_INDEX.refresh()
+    return find_smallest_model()
+
+def model_size(path):
+    entry = MODEL_INDEX.get(path)
+    return entry["size"] if entry else calculate_folder_size(path)
+
+# Recently used models stay loaded so switching back only needs a new recognizer
+MODEL_POOL = ModelPool(MODEL_POOL_BUDGET_MB * 1024 ** 2, size_of=model_size)
+MODEL_LOADER = ModelLoader(MODEL_POOL)
 
 class SpeechToTextApp:
     def __init__(self, root):
@@ -257,39 +578,91 @@ class SpeechToTextApp:
 
         self.is_recording = False
         self.is_muted = False
-        self.q = queue.Queue()
         self.current_model = None
-        self.rec = None
+        self.current_model_rate = None  # Rate declared in the model's conf/mfcc.conf
+        self.current_model_path = None
+        self.engine = None  # Headless recognition engine, created once a model is loaded
+        self.tracker = None  # Shared energy/silence tracker fed by the engine
+        self.audio_source = None
         self.target_window = None
         self.output_lock = threading.Lock()  # Add this line
         self.debug_window = DebugWindow(self)  # Pass self as parent
+        # The log writer thread buffers lines for the debug window, which paints them itself
+        LOG_PIPELINE.add_sink(self.debug_window.log)
         self.debug_log("Application started")
         self.shell = win32com.client.Dispatch("WScript.Shell")
         self.last_focused_window = None
         self.window_mode_active = False
         self.live_mode_active = False
         self.last_audio_time = time.time()
-        self.silence_threshold = 500  # Adjust based on your mic sensitivity
         self.silence_duration = 3.0  # Seconds of silence before Enter
         self.last_enter_time = 0
         self.min_enter_interval = 1.0  # Minimum seconds between Enter presses
         self.debug_mode = True  # Enable detailed logging
         self.live_mode_test = True  # Test mode without Enter simulation
         self.is_delivering_text = False  # Prevent premature Enter
+        self.ui_calls = queue.Queue()  # (func, args) from worker threads, run by drain_ui_calls
+        # Focuses the target once per utterance and sends it whole, off the Tk thread
+        self.delivery = DeliveryWorker(
+            create_backend(DELIVERY_BACKEND),
+            on_delivered=self.on_text_delivered,
+            on_failed=self.on_delivery_failed,
+            on_idle=lambda: self.call_in_ui(self.finish_delivery)
+        )
+        self.delivery.start()
+        # Word timings of this session, for caption export
+        self.word_store = WordStore()
+        # Audio of each utterance, decoded again with a larger model when the app is idle
+        self.segment_store = SegmentStore()
+        self.segment_store.on_evict = lambda segment: self.call_in_ui(self.partial_region.forget,
+                                                                      segment_tag(segment.id))
+        self.rescorer = Rescorer(
+            self.segment_store,
+            self.rescoring_model_path,
+            load=self.load_rescoring_model,
+            release=MODEL_POOL.release,
+            can_load=self.rescoring_model_fits,
+            is_idle=self.is_idle_for_rescoring,
+            on_rescored=lambda segment, result: self.call_in_ui(self.apply_rescored, segment, result)
+        )
+        if TWO_PASS:
+            self.rescorer.start()
+        # Every final result also goes to the on-disk journal
+        self.journal = SessionJournal()
+        self.journal_sink = None
+        try:
+            self.journal.start()
+            self.journal_sink = JournalSink(self.journal)
+        except OSError as e:
+            self.debug_log(f"Transcript journal unavailable: {str(e)}")
         self.delay_var = tk.IntVar(value=0)  # Changed default to 0 for Manual mode
         self.phrase_var = tk.StringVar(value="")  # Custom key phrase
         self.activate_on_phrase = tk.BooleanVar(value=False)
+        # Copy of activate_on_phrase for the audio callback, which must not call into Tcl
+        self.phrase_mode = False
+        self.activate_on_phrase.trace_add('write', self.on_phrase_mode_changed)
         self.show_key_phrase_var = tk.BooleanVar(value=True)  # New toggle for showing phrase
+        self.phrase_anywhere_var = tk.BooleanVar(value=False)  # Match key phrases mid-utterance too
+        self.low_latency_var = tk.BooleanVar(value=False)  # Small capture blocks, applied on next Start
+        self.multi_language_var = tk.BooleanVar(value=False)  # Decode with every installed language
+        self.language_set = None
+        self.single_model_name = None  # Journal model name to restore when leaving multi-language mode
 
         # Key phrase settings
         self.default_phrases = ["Send it", "I'm done talking", "That's it"]
         self.key_phrases = set(self.default_phrases)
+        self.phrase_matcher = PhraseMatcher(self.key_phrases, max_edits=KEY_PHRASE_MAX_EDITS)
         self.waiting_for_silence = False
         
         # Improved state tracking
         self.key_phrase_detected = False
-        self.last_speech_time = time.time()
-        self.silence_threshold = 300  # Lowered threshold for better detection
+        self.spotter = None  # Grammar-constrained recognizer watching for key phrases
+        self.pending_enter_phrase = None  # Key phrase waiting for its text to be delivered
+        self.pending_enter_spoken = None  # Capture time of the end of that phrase
+        # Spoken-to-delivered latency per delivery mode, from the audio capture clock
+        self.e2e = LatencyStats("e2e")
+        self.enter_sent_for_speech = None  # Audio-clock end of the speech auto-Enter last fired for
+        self.silence_threshold = 300  # Minimum speech energy; the tracker adapts above the room's noise floor
         self.last_phrase_time = 0
         self.min_phrase_interval = 0.5  # Minimum seconds between phrase triggers
         
@@ -306,15 +679,17 @@ class SpeechToTextApp:
         # Disable all widgets initially
         self.root.withdraw()
         
-        # Show loading window and initialize model
+        # Pick up models dropped into models/ while the app is running
+        self.model_watcher = ModelWatcher(MODEL_INDEX, on_change=self.on_models_changed)
+
+        # Show loading window and load the model in the background
         self.loading_window = LoadingWindow(self.root)
         self.root.after(100, self.initialize_model)
+        self.root.after(UI_POLL_MS, self.drain_ui_calls)
         
-        # Audio stream setup
-        self.stream = None
         self.last_final_text = ""
         self.last_partial_text = ""
-        self.disable_partials = True  # new flag to ignore partial results
+        self.disable_partials = False  # Set to ignore partial results
 
     def create_context_menu(self):
         """Create right-click context menu"""
@@ -453,6 +828,23 @@ class SpeechToTextApp:
             text="Show key phrase in output",
             variable=self.show_key_phrase_var
         ).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(
+            show_phrase_frame,
+            text="Key phrase anywhere",
+            variable=self.phrase_anywhere_var,
+            command=self.update_spotter
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(
+            show_phrase_frame,
+            text="Low latency capture",
+            variable=self.low_latency_var
+        ).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(
+            show_phrase_frame,
+            text="Multi-language",
+            variable=self.multi_language_var,
+            command=self.toggle_multi_language
+        ).pack(side=tk.LEFT, padx=5)
 
         # Control buttons frame (existing code)
         control_frame = ttk.Frame(self.root)
@@ -511,6 +903,22 @@ class SpeechToTextApp:
             width=10
         )
         self.placeholder_size_button.pack(side=tk.LEFT, padx=5)
+
+        self.search_button = ttk.Button(
+            switch_frame,
+            text="Search",
+            command=self.open_transcript_search,
+            width=10
+        )
+        self.search_button.pack(side=tk.LEFT, padx=5)
+
+        self.export_button = ttk.Button(
+            switch_frame,
+            text="Export",
+            command=self.export_captions,
+            width=10
+        )
+        self.export_button.pack(side=tk.LEFT, padx=5)
         
         # Add Copy All and Clear All buttons to switch_frame
         self.copy_button = ttk.Button(
@@ -541,6 +949,7 @@ class SpeechToTextApp:
             state='normal'  # Make sure it's editable
         )
         self.text_area.pack(padx=10, pady=10, expand=True, fill=tk.BOTH)
+        self.partial_region = PartialTextRegion(self.text_area)
         
         # Enable mouse interaction
         self.text_area.config(cursor="ibeam")  # Show text cursor
@@ -602,6 +1011,30 @@ class SpeechToTextApp:
         self.text_area.see(tk.INSERT)
         return 'break'  # Prevent default behavior
 
+    def export_captions(self):
+        """Save this session's words with their timings as SRT, VTT or JSON"""
+        if not len(self.word_store):
+            messagebox.showinfo("Export", "Nothing has been transcribed yet")
+            return
+        path = filedialog.asksaveasfilename(
+            defaultextension=".srt",
+            filetypes=[("SubRip subtitles", "*.srt"), ("WebVTT captions", "*.vtt"), ("JSON with word timings", "*.json")]
+        )
+        if not path:
+            return
+        try:
+            self.word_store.export(path)
+            self.debug_log(f"Exported {len(self.word_store)} words to {path}")
+            if self.word_store.trimmed:
+                self.debug_log(f"The oldest {self.word_store.trimmed} words of this session are no longer kept")
+        except (OSError, ValueError) as e:
+            self.debug_log(f"Export failed: {str(e)}")
+            messagebox.showerror("Export Error", str(e))
+
+    def open_transcript_search(self):
+        """Search the transcripts of this and earlier sessions"""
+        TranscriptSearchWindow(self.root, self.journal)
+
     def show_debug(self):
         """Show debug window"""
         self.debug_window.show()
@@ -616,246 +1049,492 @@ class SpeechToTextApp:
 
     def toggle_mute(self):
         self.is_muted = not self.is_muted
+        if self.audio_source:
+            self.audio_source.muted = self.is_muted
         self.mute_button.configure(text="Unmute" if self.is_muted else "Mute")
 
-    def audio_callback(self, indata, frames, time, status):
-        """Enhanced audio callback with error handling"""
+    def on_phrase_mode_changed(self, *args):
+        self.phrase_mode = self.activate_on_phrase.get()
+
+    def on_audio_block(self, samples, captured):
+        """Key phrase checks on each captured block (runs on the audio thread, so no Tk calls)"""
         try:
-            if not self.is_muted:
-                audio_data = bytes(indata)
-                self.q.put(audio_data)
-                
-                try:
-                    if self.activate_on_phrase.get():
-                        self.check_key_phrase(audio_data)
-                    elif self.live_mode_active:
-                        self.check_silence_and_enter(audio_data)
-                except Exception as e:
-                    self.debug_log(f"Error in live or key phrase mode processing: {str(e)}\n{traceback.format_exc()}")
-                    self.disable_live_mode()
-                        
+            if self.phrase_mode:
+                self.check_key_phrase(samples, captured)
         except Exception as e:
-            self.debug_log(f"Error in audio callback: {str(e)}\n{traceback.format_exc()}")
+            self.debug_log(f"Error in live or key phrase mode processing: {str(e)}\n{traceback.format_exc()}")
+            self.call_in_ui(self.disable_live_mode)
+
+    def check_key_phrase(self, samples, captured=None):
+        """Hand captured audio to the key phrase spotter"""
+        spotter = self.spotter
+        if spotter:
+            spotter.feed(samples, captured)
+
+    def update_spotter(self):
+        """Run the key phrase spotter only while recording in key phrase mode"""
+        wanted = self.is_recording and self.activate_on_phrase.get() and self.current_model is not None
+        at_end = not self.phrase_anywhere_var.get()
+        if self.spotter and (not wanted or self.spotter.model is not self.current_model
+                             or self.spotter.model_rate != (self.current_model_rate or SAMPLE_RATE)):
+            self.spotter.stop()
+            self.debug_log(f"Key phrase spotter stopped, latency: {self.spotter.latency_stats()}")
+            self.spotter = None
+        if wanted and not self.spotter:
+            spotter = KeyPhraseSpotter(
+                self.current_model,
+                self.key_phrases,
+                SAMPLE_RATE,
+                on_detect=self.on_key_phrase_spotted,
+                cooldown=self.min_phrase_interval,
+                at_end=at_end,
+                model_rate=self.current_model_rate
+            )
+            spotter.start()
+            self.spotter = spotter
+            self.debug_log("Key phrase spotter started")
+        elif self.spotter:
+            self.spotter.at_end = at_end
+
+    def on_key_phrase_spotted(self, phrase, latency, spoken_at):
+        """Spotter callback (runs on the spotter thread)"""
+        self.debug_log(f"Key phrase spotted: {phrase} ({latency * 1000:.0f} ms)")
+        self.call_in_ui(self.begin_key_phrase_enter, phrase, spoken_at)
+
+    def begin_key_phrase_enter(self, phrase, spoken_at=None):
+        """Press Enter for a key phrase once the text spoken before it is out"""
+        now = time.time()
+        if self.pending_enter_phrase or now - self.last_phrase_time < KEY_PHRASE_DEDUPE_SECONDS:
+            return
+        self.debug_log(f"Key phrase detected: {phrase}")
+        self.last_phrase_time = now
+        self.pending_enter_phrase = phrase
+        self.pending_enter_spoken = spoken_at
+        if self.engine:
+            self.engine.request_flush()
+        self.root.after(KEY_PHRASE_FLUSH_WAIT_MS, self.press_pending_enter)
+
+    def press_pending_enter(self):
+        if not self.pending_enter_phrase:
+            return
+        if self.is_delivering_text:
+            self.root.after(100, self.press_pending_enter)
+            return
+        self.pending_enter_phrase = None
+        self.simulate_enter_key(self.pending_enter_spoken, "key_phrase")
 
-    def process_audio(self):
-        """Process audio stream"""
-        while self.is_recording:
-            try:
-                data = self.q.get(timeout=1.0)
-                if self.rec and self.rec.AcceptWaveform(data):
-                    result = json.loads(self.rec.Result())
-                    text = result.get("text", "").strip().lower()
-                    
-                    if text:
-                        # Check for key phrase if enabled
-                        if self.activate_on_phrase.get():
-                            for phrase in self.key_phrases:
-                                if phrase.lower() == text:
-                                    self.debug_log(f"Key phrase detected: {text}")
-                                    # Only show phrase if the option is enabled
-                                    if self.show_key_phrase_var.get():
-                                        self.root.after(0, self.output_text, text)
-                                    self.simulate_enter_key()
-                                    break
-                            else:  # No key phrase found, show text normally
-                                if text != self.last_final_text:
-                                    self.last_final_text = text
-                                    self.root.after(0, self.output_text, text)
-                        else:  # Normal mode, always show text
-                            if text != self.last_final_text:
-                                self.last_final_text = text
-                                self.root.after(0, self.output_text, text)
-                            
-            except queue.Empty:
-                continue
-            except Exception as e:
-                self.debug_log(f"Error processing audio: {str(e)}")
-                if not self.is_recording:
-                    break
+    def on_activity(self, tracker):
+        """Energy tracker listener (runs on the recognition thread): pass silence after speech to the Tk thread"""
+        if self.live_mode_active and tracker.silence_seconds and tracker.last_speech_time != self.enter_sent_for_speech:
+            self.call_in_ui(self.check_silence_and_enter, tracker.silence_seconds, tracker.last_speech_time,
+                            tracker.noise_floor)
+
+    def handle_final_text(self, text, result):
+        """Engine sink: final results arrive on the recognition thread and are routed on the Tk thread"""
+        self.call_in_ui(self.route_final_text, text, result)
 
-    def simulate_enter_key(self):
-        """Just press Enter key"""
+    def route_final_text(self, text, result):
+        """Send a final result to key phrase handling or output"""
         try:
-            self.debug_log("Pressing Enter key")
-            wapi.keybd_event(wcon.VK_RETURN, 0, 0, 0)
-            wapi.keybd_event(wcon.VK_RETURN, 0, wcon.KEYEVENTF_KEYUP, 0)
+            text = text.lower()
+            captured = result.get("captured_end")  # When the utterance ended, on the capture clock
+            segment = result.get("segment")  # Stored for the second pass
+            # Check for key phrase if enabled
+            if self.activate_on_phrase.get():
+                at_end = not self.phrase_anywhere_var.get()
+                remaining, phrase = self.phrase_matcher.remove(text, at_end=at_end)
+                if phrase:
+                    # Only show phrase if the option is enabled
+                    if not self.show_key_phrase_var.get():
+                        text = remaining
+                    if text:
+                        self.deliver_final_text(text, captured, segment)
+                    else:
+                        self.partial_region.clear()
+                    # Usually the spotter fired already; this covers it missing the phrase
+                    self.begin_key_phrase_enter(phrase, captured)
+                    return
+            if text != self.last_final_text:
+                self.last_final_text = text
+                self.deliver_final_text(text, captured, segment)
+            else:
+                self.partial_region.clear()
         except Exception as e:
-            self.debug_log(f"Error pressing Enter: {str(e)}")
+            self.debug_log(f"Error processing audio: {str(e)}")
 
-    def update_streaming_text(self, partial_text):
-        """Append new partial text only if different from the last update"""
-        self.text_area.insert(tk.END, " " + partial_text)
-        self.text_area.see(tk.END)
+    def simulate_enter_key(self, spoken_at=None, reason=None):
+        """Just press Enter key, after any text still being delivered
 
-    def ensure_window_focus(self, hwnd):
-        """Ensure window has focus and return success status"""
-        try:
-            # Get current focus
-            current_focus = win32gui.GetForegroundWindow()
-            self.debug_log(f"Current focused window: {win32gui.GetWindowText(current_focus)}")
-            
-            if current_focus != hwnd:
-                # Bring window to front
-                win32gui.ShowWindow(hwnd, wcon.SW_RESTORE)
-                win32gui.SetForegroundWindow(hwnd)
-                
-                # Wait briefly for focus
-                for _ in range(10):
-                    if win32gui.GetForegroundWindow() == hwnd:
-                        break
-                    self.root.after(50)
-                
-            # Verify focus
-            new_focus = win32gui.GetForegroundWindow()
-            success = (new_focus == hwnd)
-            self.debug_log(f"Focus attempt {'successful' if success else 'failed'} for window: {win32gui.GetWindowText(hwnd)}")
-            return success
-            
-        except Exception as e:
-            self.debug_log(f"Error setting focus: {str(e)}")
-            return False
+        With spoken_at (capture time of the speech that triggered it) the
+        press is timed end to end under reason.
+        """
+        self.debug_log("Pressing Enter key")
+        self.delivery.press_enter(created=spoken_at, tag=reason if spoken_at is not None else None)
 
-    def simulate_typing(self, text):
-        """Simulate keyboard input using keyboard.write for Unicode support"""
-        try:
-            keyboard.write(text, delay=0.01)
-            keyboard.send('space')
-            return True
-        except Exception as e:
-            self.debug_log(f"Error simulating typing: {str(e)}")
-            return False
+    def handle_partial_text(self, text, result):
+        """Engine sink: partial results arrive on the recognition thread"""
+        if text != self.last_partial_text:
+            self.last_partial_text = text
+            self.call_in_ui(self.update_streaming_text, text.lower())
 
-    def output_text(self, text):
+    def update_streaming_text(self, partial_text):
+        """Show the in-progress utterance, touching only the words that changed"""
+        self.partial_region.update(partial_text)
+
+    def deliver_final_text(self, text, captured=None, segment=None):
+        """Replace the in-progress region with the final text, or send it out"""
+        self.last_partial_text = ""
+        external = self.cursor_mode_active or (self.target_window and win32gui.IsWindow(self.target_window))
+        if external:
+            self.partial_region.clear()
+            self.output_text(text, captured)
+        else:
+            # Tagged with its segment, so the second pass can rewrite it in place
+            self.partial_region.commit(text, segment_tag(segment) if segment is not None else None)
+            if captured is not None:
+                self.e2e.record("interface", time.perf_counter() - captured)
+            self.debug_log(f"Attempting to output text: {text}")
+            self.press_pending_enter()
+
+    def output_text(self, text, captured=None):
+        """Hand a finished utterance to the delivery worker
+
+        captured is when the utterance ended on the audio capture clock;
+        the worker then measures latency from there instead of from now.
+        """
         # Prevent pressing Enter while text is being delivered
         self.is_delivering_text = True
         self.debug_log(f"Attempting to output text: {text}")
-        words = text.split()
-        delay = 100  # delay in milliseconds between words
-
-        def deliver_word(i):
-            if i < len(words):
-                word = words[i]
-                # Try to send word via typing simulation if target window and cursor mode are active
-                if self.cursor_mode_active:
-                    self.debug_log("Cursor mode active - delivering word via simulate_typing")
-                    self.simulate_typing(word + " ")
-                elif self.target_window and win32gui.IsWindow(self.target_window):
-                    window_title = win32gui.GetWindowText(self.target_window)
-                    self.debug_log(f"Target window: {window_title} (hwnd: {self.target_window})")
-                    if self.ensure_window_focus(self.target_window):
-                        self.simulate_typing(word + " ")
-                    else:
-                        self.debug_log("Focusing failed - falling back to text area")
-                        self.text_area.insert(tk.END, word + " ")
-                        self.text_area.see(tk.END)
-                else:
-                    # Fallback to text area delivery
-                    self.text_area.insert(tk.END, word + " ")
-                    self.text_area.see(tk.END)
-                # Schedule next word delivery
-                self.root.after(delay, lambda: deliver_word(i + 1))
-            else:
-                self.is_delivering_text = False
-
-        deliver_word(0)
+        # Cursor mode types wherever the cursor is; window mode focuses the target first
+        target = None if self.cursor_mode_active else self.target_window
+        mode = "cursor" if self.cursor_mode_active else "window"
+        self.delivery.deliver(text + " ", target, created=captured, tag=mode if captured is not None else None)
+
+    def on_text_delivered(self, text, latency, tag):
+        """Delivery worker callback (runs on the delivery thread); tagged jobs were timed from capture"""
+        if tag:
+            self.e2e.record(tag, latency)
+        if text is not None:
+            self.debug_log(f"Delivered {len(text.split())} words in {latency * 1000:.1f} ms")
+
+    def on_delivery_failed(self, text):
+        """Delivery worker callback: focusing or sending failed, keep the text locally"""
+        self.debug_log("Delivery failed - falling back to text area")
+        self.call_in_ui(self.partial_region.insert_before, text)
+
+    def finish_delivery(self):
+        if self.delivery.pending:
+            return  # More text was queued in the meantime
+        self.is_delivering_text = False
+        self.press_pending_enter()
+
+    def on_models_changed(self, index):
+        """Model watcher callback (runs on the watcher thread)"""
+        names = ", ".join(e["name"] for e in index.entries())
+        self.debug_log(f"Model folder changed, available models: {names}")
 
     def initialize_model(self):
-        smallest = find_smallest_model()
-        if not smallest:
+        self.model_watcher.start()
+        if CAPTURE_DURING_LOAD:
+            try:
+                # Audio queues up in the source until the recognizer is ready
+                self.audio_source = self.create_audio_source()
+                self.audio_source.open()
+                self.debug_log("Capturing audio while the model loads")
+            except Exception as e:
+                self.debug_log(f"Could not start capture during load: {str(e)}")
+                self.audio_source = None
+        # Scanning the models folder can take seconds, so it runs on the loader thread before the load
+        self.load_model_async(refresh_and_find_smallest_model, self.on_initial_model_loaded,
+                              self.on_initial_model_failed)
+
+    def model_rate(self, path):
+        """Sample rate the model at path was trained at, None when its conf doesn't say"""
+        entry = MODEL_INDEX.get(path)
+        return entry.get("sample_rate") if entry else None
+
+    def on_initial_model_loaded(self, path, model):
+        self.current_model = model
+        self.current_model_path = path
+        self.current_model_rate = self.model_rate(path)
+        # One energy/silence tracker shared by the VAD and live-mode auto-Enter
+        self.tracker = EnergyTracker(SAMPLE_RATE, min_threshold=self.silence_threshold)
+        self.tracker.add_listener(self.on_activity)
+        self.segment_store.model = os.path.basename(path)
+        # The segment store goes first so the others see result["segment"]
+        sinks = [self.segment_store, CallbackSink(on_final=self.handle_final_text, on_partial=self.handle_partial_text),
+                 self.word_store]
+        if self.journal_sink:
+            self.journal_sink.model = os.path.basename(path)
+            sinks.append(self.journal_sink)
+        self.engine = RecognitionEngine(
+            self.current_model,
+            sinks=sinks,
+            partials=not self.disable_partials,
+            vad=VoiceActivityDetector(SAMPLE_RATE, tracker=self.tracker) if USE_VAD else None,
+            tracker=self.tracker,
+            words=True,
+            model_rate=self.current_model_rate,
+            overload=OVERLOAD_POLICY,
+            lag_warn=LAG_WARN_SECONDS,
+            on_lag=lambda lag: self.call_in_ui(self.on_recognition_lag, lag),
+            recorder=self.segment_store
+        )
+        self.close_loading_window()
+        self.root.deiconify()
+        self.model_label.config(text=f"Current Model: {os.path.basename(path)}")
+        self.status_label.config(text="Model loaded successfully")
+        self.debug_log(f"Model loaded from: {path}")
+        if self.audio_source:
+            # Decode what was captured during the load, then carry on live
+            self.start_recording()
+            self.start_button.configure(text="Stop")
+
+    def on_initial_model_failed(self, path, error):
+        self.close_loading_window()
+        if self.audio_source:
+            self.audio_source.close()
+            self.audio_source = None
+        if path is None:
             messagebox.showerror("Error", "No models found in the folder. Please add a model to continue.")
-            self.root.destroy()
-            return
-        try:
-            self.current_model = vosk.Model(smallest)
-            self.rec = vosk.KaldiRecognizer(self.current_model, 16000)
-            self.loading_window.destroy()
-            self.root.deiconify()
-            self.model_label.config(text=f"Current Model: {os.path.basename(smallest)}")
-            self.status_label.config(text="Model loaded successfully")
-            self.debug_log(f"Model loaded from: {smallest}")
-        except Exception as e:
-            self.loading_window.destroy()
+        else:
             messagebox.showerror("Error", "Error loading model: Please ensure the model files are valid and try again.")
-            self.debug_log(f"Failed to load model: {str(e)}")
-            self.root.destroy()
+        self.debug_log(f"Failed to load model: {str(error)}")
+        self.root.destroy()
+
+    def load_model_async(self, path, on_loaded, on_failed):
+        """Load a model on the loader thread; callbacks come back on the Tk thread"""
+        if self.loading_window is None:
+            self.loading_window = LoadingWindow(self.root)
+        MODEL_LOADER.load(
+            path,
+            on_progress=lambda fraction, message: self.call_in_ui(self.on_load_progress, fraction, message),
+            on_done=lambda p, model: self.call_in_ui(on_loaded, p, model),
+            on_error=lambda p, error: self.call_in_ui(on_failed, p, error)
+        )
+
+    def on_load_progress(self, fraction, message):
+        if self.loading_window:
+            self.loading_window.set_progress(fraction, message)
+
+    def close_loading_window(self):
+        if self.loading_window:
+            self.loading_window.destroy()
+            self.loading_window = None
 
     def load_model(self, model_name=None):
-        """Modified to show loading indicator"""
-        try:
-            loading = LoadingWindow(self.root)
-            self.root.update()
-            
-            was_recording = self.is_recording
-            if was_recording:
-                self.stop_recording()
-
-            # Load model
-            model_path = os.path.join(BASE_PATH, MODELS["English"])
-            if not os.path.exists(model_path):
-                raise FileNotFoundError(f"Model directory not found: {model_path}")
-            
-            self.current_model = vosk.Model(model_path)
-            self.rec = vosk.KaldiRecognizer(self.current_model, 16000)
-            
-            if was_recording:
-                self.start_recording()
-            
-            loading.destroy()
-            self.status_label.config(text="Model loaded successfully")
-            self.debug_log("Model reloaded successfully")
-            return True
-            
-        except Exception as e:
-            if 'loading' in locals():
-                loading.destroy()
-            error_msg = f"Failed to load model: {str(e)}"
+        """Reload the default English model in the background"""
+        model_path = os.path.join(BASE_PATH, MODELS["English"])
+        if not os.path.exists(model_path):
+            error_msg = f"Failed to load model: Model directory not found: {model_path}"
             messagebox.showerror("Error", error_msg)
             self.debug_log(error_msg)
             return False
+        self.start_model_switch(model_path)
+        return True
 
     def switch_model(self):
-        """Bare minimum model switching"""
+        """Pick a model and load it without blocking the UI"""
         models = find_available_models()
         if not models:
             messagebox.showerror("Error", "No models found")
             return
 
-        # Stop everything
-        was_recording = self.is_recording
-        self.stop_recording()
-        
-        # Show selector
+        # Show selector (recording carries on with the current model meanwhile)
         selector = ModelSelector(self.root, models)
         selector.wait_window()
-        
+
+        if selector.selected_model:
+            self.start_model_switch(selector.selected_model)
+
+    def start_model_switch(self, path):
+        was_recording = self.is_recording
+        if was_recording:
+            # Keep the microphone capturing into its buffer while the new model loads
+            self.engine.stop(close_source=False)
+        self.load_model_async(
+            path,
+            lambda p, model: self.on_model_switched(p, model, was_recording),
+            lambda p, error: self.on_model_switch_failed(p, error, was_recording)
+        )
+
+    def on_model_switched(self, path, model, was_recording):
+        self.close_loading_window()
+        if self.language_set:
+            # Picking a model by hand leaves multi-language mode
+            self.multi_language_var.set(False)
+            self.close_language_set()
+        # Reused from the pool when it was loaded recently; the loader leased it for us
+        MODEL_POOL.release(self.current_model)
+        self.current_model = model
+        self.current_model_path = path
+        self.current_model_rate = self.model_rate(path)
+        self.engine.set_model(self.current_model, self.current_model_rate)
+        self.segment_store.model = os.path.basename(path)
+        if self.journal_sink:
+            self.journal_sink.model = os.path.basename(path)
+        self.debug_log(f"Model pool: {MODEL_POOL.stats()}")
+        self.model_label.config(text=f"Model: {os.path.basename(path)}")
+        self.status_label.config(text="Model loaded successfully")
+        if was_recording:
+            self.engine.start(self.audio_source)  # Catches up on the buffered audio
+        self.update_spotter()
+
+    def on_recognition_lag(self, lag):
+        """Engine lag callback: move to a faster model, or tell the user"""
+        if not self.is_recording:
+            return
+        self.debug_log(f"Recognition is {lag:.1f}s behind live audio ({self.engine.stats.shed_seconds:.1f}s shed)")
+        faster = None
+        if LAG_SWITCH_MODEL and self.current_model_path and not self.language_set:
+            faster = MODEL_INDEX.faster_model(self.current_model_path)
+        if faster:
+            self.debug_log(f"Switching to the faster model {os.path.basename(faster)}")
+            self.status_label.config(text=f"Falling behind, switching to {os.path.basename(faster)}")
+            self.start_model_switch(faster)
+        else:
+            self.status_label.config(text=f"Warning: transcription is {lag:.0f}s behind")
+
+    def rescoring_model_path(self, segment):
+        """Largest model in the language of the model that decoded segment (rescorer thread)"""
+        if not segment.model:
+            return None
+        return MODEL_INDEX.larger_model(segment.model)  # None for multi-language names
+
+    def load_rescoring_model(self, path):
+        """Rescorer thread: share the model when the pool has it, else load a copy that never evicts a live one"""
+        return MODEL_POOL.borrow(path)
+
+    def rescoring_model_fits(self, path):
+        """True while the larger model fits in the pool budget next to the models in use"""
+        return MODEL_POOL.fits(path)
+
+    def is_idle_for_rescoring(self):
+        """True while the second pass can't slow down live recognition (rescorer thread)"""
+        if self.is_delivering_text or MODEL_LOADER.is_loading:
+            return False
+        engine = self.engine
+        if not self.is_recording or engine is None or not engine.is_running:
+            return True
+        tracker = self.tracker
+        if engine.lagging or tracker is None or tracker.in_speech:
+            return False
+        return tracker.silence_seconds >= RESCORE_IDLE_SECONDS
+
+    def apply_rescored(self, segment, result):
+        """Put the second-pass text of an utterance into the session transcript"""
+        tag = segment_tag(segment.id)
+        if result["text"] != segment.text:
+            self.debug_log(f"Rescored with {result['model']}: '{segment.text}' -> '{result['text']}'")
+            self.word_store.replace_utterance(segment.id, result)
+            text = result["text"].lower()
+            if self.activate_on_phrase.get() and not self.show_key_phrase_var.get():
+                text = self.phrase_matcher.remove(text, at_end=not self.phrase_anywhere_var.get())[0]
+            if text:
+                self.partial_region.replace_committed(tag, text)
+        self.partial_region.forget(tag)  # The segment is only ever rescored once
+
+    def toggle_multi_language(self):
+        """Feed every installed language in parallel and keep the most confident result"""
+        if not self.engine:
+            self.multi_language_var.set(False)
+            return
+        if self.multi_language_var.get():
+            self.status_label.config(text="Loading language models...")
+            threading.Thread(target=self.load_language_set, daemon=True).start()
+        elif self.language_set:
+            # Detaching flushes the last utterance through the language set, so close it afterwards
+            self.apply_engine_model(self.current_model, self.current_model_rate)
+            self.close_language_set()
+            self.segment_store.model = os.path.basename(self.current_model_path)
+            if self.journal_sink:
+                self.journal_sink.model = self.single_model_name
+            self.status_label.config(text="Single language")
+
+    def load_language_set(self):
+        """Runs on a worker thread; models come from the pool when already loaded"""
+        models = {}  # Leased, so the pool can't evict one language while loading the next
         try:
-            if selector.selected_model:
-                # Kill old model completely
-                self.rec = None
-                if self.current_model:
-                    del self.current_model
-                
-                # Load new one
-                self.current_model = vosk.Model(selector.selected_model)
-                self.rec = vosk.KaldiRecognizer(self.current_model, 16000)
-                
-                # Update UI
-                name = os.path.basename(selector.selected_model)
-                self.model_label.config(text=f"Model: {name}")
-                
-                # Restart if needed
-                if was_recording:
-                    self.start_recording()
-                    
+            paths = MODEL_INDEX.smallest_per_language()
+            if len(paths) < 2:
+                raise ValueError("Multi-language mode needs models for at least two languages")
+            for lang, path in sorted(paths.items()):
+                models[lang] = MODEL_POOL.get(path, lease=True)
+            rates = {lang: self.model_rate(path) for lang, path in paths.items()}
         except Exception as e:
-            self.debug_log(f"Model switch failed: {str(e)}")
-            messagebox.showerror("Error", "Model switch failed")
-            self.initialize_model()  # Try to recover
+            for model in models.values():
+                MODEL_POOL.release(model)
+            self.call_in_ui(self.on_language_set_failed, e)
+            return
+        self.call_in_ui(self.on_language_set_loaded, LanguageSet(models, rates=rates))
+
+    def on_language_set_loaded(self, language_set):
+        if not self.multi_language_var.get():
+            self.release_language_set(language_set)  # Turned off again while loading
+            return
+        self.language_set = language_set
+        self.apply_engine_model(language_set)
+        names = "+".join(lang.name for lang in language_set.languages)
+        self.segment_store.model = names  # Not a model name, so the second pass leaves these alone
+        if self.journal_sink:
+            self.single_model_name = self.journal_sink.model
+            self.journal_sink.model = names
+        self.status_label.config(text=f"Languages: {names}")
+        self.debug_log(f"Multi-language mode: {names}")
+
+    def on_language_set_failed(self, error):
+        self.multi_language_var.set(False)
+        self.status_label.config(text="Single language")
+        self.debug_log(f"Multi-language mode unavailable: {str(error)}")
+        messagebox.showwarning("Multi-language", str(error))
+
+    def close_language_set(self):
+        self.debug_log(f"Language report: {self.language_set.report()}")
+        self.release_language_set(self.language_set)
+        self.language_set = None
+
+    @staticmethod
+    def release_language_set(language_set):
+        language_set.close()
+        for language in language_set.languages:
+            MODEL_POOL.release(language.model)
+
+    def apply_engine_model(self, model, model_rate=None):
+        """Swap the engine's model, resuming on the buffered audio if it was running"""
+        was_running = self.engine.is_running
+        if was_running:
+            self.engine.stop(close_source=False)
+        self.engine.set_model(model, model_rate)
+        if was_running:
+            self.engine.start(self.audio_source)
+
+    def on_model_switch_failed(self, path, error, was_recording):
+        self.close_loading_window()
+        self.debug_log(f"Model switch failed: {str(error)}")
+        messagebox.showerror("Error", "Model switch failed")
+        if was_recording:
+            self.engine.start(self.audio_source)  # Carry on with the previous model
+
+    def call_in_ui(self, func, *args):
+        """Run func(*args) on the Tk thread; safe from any thread and never waits for Tcl"""
+        self.ui_calls.put((func, args))
+
+    def drain_ui_calls(self):
+        """Run the callbacks worker threads queued since the last poll"""
+        while True:
+            try:
+                func, args = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except Exception as e:
+                self.debug_log(f"Error in {getattr(func, '__name__', func)}: {str(e)}\n{traceback.format_exc()}")
+        self.root.after(UI_POLL_MS, self.drain_ui_calls)
 
     def debug_log(self, message):
+        # Queued for the log writer, which also feeds the (possibly hidden) debug window
         logging.debug(message)
-        # Still log messages even when window is hidden
-        self.debug_window.log(message)
 
     def toggle_window_mode(self):
         try:
@@ -920,26 +1599,20 @@ class SpeechToTextApp:
             self.debug_log(f"Error toggling live mode: {str(e)}")
             self.disable_live_mode()
 
-    def check_silence_and_enter(self, audio_data):
-        """Simple silence detection and Enter press"""
-        if not self.live_mode_active or self.delay_var.get() == 0:
+    def check_silence_and_enter(self, silence_seconds, last_speech_time, noise_floor):
+        """Press Enter once the shared energy tracker has seen enough silence after speech"""
+        if not self.live_mode_active or self.activate_on_phrase.get() or self.delay_var.get() == 0:
             return
 
         try:
-            audio_array = np.frombuffer(audio_data, dtype=np.int16)
-            rms = np.sqrt(np.mean(np.square(audio_array)))
-            current_time = time.time()
-
-            if rms > self.silence_threshold:
-                self.last_speech_time = current_time
-            else:
-                silence_duration = current_time - self.last_speech_time
-                delay = self.delay_var.get()
-
-                if silence_duration >= delay:
-                    self.debug_log(f"Live mode - pressing Enter after {delay}s silence")
-                    self.simulate_enter_key()
-                    self.last_speech_time = current_time
+            delay = self.delay_var.get()
+            # Once per silence, keyed on the audio-clock end of the speech it follows
+            if silence_seconds >= delay and last_speech_time != self.enter_sent_for_speech:
+                self.debug_log(f"Live mode - pressing Enter after {delay}s silence "
+                               f"(noise floor {noise_floor:.0f})")
+                spoken_at = self.engine.capture_time(last_speech_time) if self.engine else None
+                self.simulate_enter_key(spoken_at, "live_enter")
+                self.enter_sent_for_speech = last_speech_time
 
         except Exception as e:
             self.debug_log(f"Live mode error: {str(e)}")
@@ -970,12 +1643,16 @@ class SpeechToTextApp:
             if hasattr(self, 'delay_combo'):
                 self.delay_combo.config(state='readonly')  
             self.reset_silence_detection()
+        self.update_spotter()
 
     def add_custom_phrase(self):
         """Add custom phrase to recognized phrases"""
         phrase = self.phrase_var.get().strip()
         if phrase:
             self.key_phrases.add(phrase)
+            self.phrase_matcher.set_phrases(self.key_phrases)
+            if self.spotter:
+                self.spotter.set_phrases(self.key_phrases)
             self.debug_log(f"Added custom key phrase: '{phrase}'")
             self.phrase_var.set("")  # Clear entry
         else:
@@ -987,6 +1664,8 @@ class SpeechToTextApp:
         self.last_audio_time = time.time()
         self.last_enter_time = time.time()
         self.silence_start_time = None
+        # Don't fire for speech that ended before the reset
+        self.enter_sent_for_speech = self.tracker.last_speech_time if self.tracker else None
         self.debug_log("Silence detection reset")
 
     def copy_all_text(self):
@@ -1004,6 +1683,10 @@ class SpeechToTextApp:
         """Clear all text from the text area"""
         try:
             self.text_area.delete(1.0, tk.END)
+            self.partial_region.reset()
+            self.partial_region.forget_all(segment_tag(""))
+            self.word_store.clear()
+            self.segment_store.clear()
             self.debug_log("Text area cleared successfully")
         except Exception as e:
             self.debug_log(f"Error clearing text: {str(e)}")
@@ -1069,30 +1752,52 @@ class SpeechToTextApp:
     def start_recording(self):
         """Start audio recording and processing"""
         try:
-            self.stream = sd.RawInputStream(
-                samplerate=16000,
-                blocksize=8000,
-                dtype='int16',
-                channels=1,
-                callback=self.audio_callback
-            )
-            self.stream.start()
+            if self.audio_source is None:
+                self.audio_source = self.create_audio_source()
+            self.engine.start(self.audio_source)
             self.is_recording = True
-            self.debug_log("Started recording")
-            threading.Thread(target=self.process_audio, daemon=True).start()
+            self.debug_log(f"Started recording, capture format: {self.audio_source.capture_format}")
+            self.update_spotter()
         except Exception as e:
             self.debug_log(f"Failed to start recording: {str(e)}")
             self.is_recording = False
             raise
 
+    def create_audio_source(self):
+        if self.low_latency_var.get():
+            block_ms, chunk_ms = LOW_LATENCY_CAPTURE_MS, LOW_LATENCY_CHUNK_MS
+        else:
+            block_ms = chunk_ms = CAPTURE_BLOCK_MS
+        source = MicrophoneSource(
+            sample_rate=SAMPLE_RATE,
+            block_size=SAMPLE_RATE * block_ms // 1000,
+            chunk_size=SAMPLE_RATE * chunk_ms // 1000,
+            on_block=self.on_audio_block
+        )
+        self.debug_log(f"Capture blocks: {block_ms} ms, recognizer chunks: {chunk_ms} ms")
+        source.muted = self.is_muted
+        return source
+
     def stop_recording(self):
         """Completely stop recording and cleanup"""
-        if self.stream:
-            self.stream.stop()
-            self.stream.close()
-            self.stream = None
+        if self.engine:
+            self.engine.stop()
+            if self.engine.vad:
+                self.debug_log(f"VAD session report: {self.engine.vad_report()}")
+            stats = self.engine.stats
+            self.debug_log(f"Recognition lag: max {stats.max_lag:.1f}s, {stats.shed_seconds:.1f}s shed, "
+                           f"{stats.coalesced} blocks coalesced")
+        if self.language_set:
+            self.debug_log(f"Language report: {self.language_set.report()}")
+        self.debug_log(f"Delivery latency: {self.delivery.latency_stats()}")
+        self.debug_log(f"End-to-end latency by mode: {self.e2e.report()}")
+        if TWO_PASS:
+            self.debug_log(f"Second pass: {self.rescorer.report()}")
+        if self.audio_source:
+            self.audio_source.close()
+        self.audio_source = None
         self.is_recording = False
-        self.q.queue.clear()
+        self.update_spotter()
         self.debug_log("Recording stopped and cleaned up")
 
 def main():
@@ -0,0 +1,129 @@
+"""Preallocated audio buffers for the capture path.
+
+The sounddevice callback runs on a real-time audio thread, so it should
+not allocate sample buffers: AudioRingBuffer copies each block into a
+fixed int16 ring and the recognition thread reads recognizer-sized
+chunks back out of it as bytes, one copy per chunk.
+CaptureClock remembers when each block was captured so any sample
+position can be turned back into a capture time.
+"""
+import threading
+
+import numpy as np
+
+CLOCK_STAMPS = 1024  # Capture blocks whose timestamps are kept
+
+
+class AudioRingBuffer:
+    """Single-producer / single-consumer ring of int16 samples"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buf = np.zeros(capacity, dtype=np.int16)
+        self._out = np.zeros(capacity, dtype=np.int16)  # Consumer-side staging for reads across the wrap
+        # Monotonic sample counters; positions in the ring are taken modulo capacity
+        self._written = 0
+        self._read = 0
+        self._ready = threading.Event()
+        self.overruns = 0  # Samples dropped because the reader fell behind
+
+    @property
+    def write_position(self):
+        """Samples ever written"""
+        return self._written
+
+    @property
+    def read_position(self):
+        """Samples ever read"""
+        return self._read
+
+    def available(self):
+        return self._written - self._read
+
+    def free(self):
+        return self.capacity - self.available()
+
+    def write(self, samples):
+        """Copy samples in without allocating; drops what doesn't fit"""
+        n = len(samples)
+        room = self.free()
+        if n > room:
+            self.overruns += n - room
+            n = room
+        if n:
+            start = self._written % self.capacity
+            first = min(n, self.capacity - start)
+            self._buf[start:start + first] = samples[:first]
+            if first < n:
+                self._buf[:n - first] = samples[first:n]
+            self._written += n
+            self._ready.set()
+        return n
+
+    def wait(self, count, timeout=None):
+        """Block until count samples are buffered; return False on timeout"""
+        while self.available() < count:
+            self._ready.clear()
+            if self.available() >= count:
+                break
+            if not self._ready.wait(timeout):
+                return False
+        return True
+
+    def read(self, count):
+        """Take up to count samples out of the ring as bytes"""
+        n = min(count, self.available())
+        if not n:
+            return b''
+        start = self._read % self.capacity
+        first = min(n, self.capacity - start)
+        if first == n:
+            data = self._buf[start:start + n].tobytes()
+        else:
+            # Only a read across the end of the ring is staged before the copy out
+            self._out[:first] = self._buf[start:]
+            self._out[first:n] = self._buf[:n - first]
+            data = self._out[:n].tobytes()
+        self._read += n
+        return data
+
+    def clear(self):
+        self._read = self._written
+
+
+class CaptureClock:
+    """Capture time (time.perf_counter seconds) of sample positions
+
+    The audio callback stamps the position and capture time of each block
+    into preallocated arrays; time_at() interpolates from the newest stamp
+    at or before a position using the sample rate.
+    """
+
+    def __init__(self, sample_rate, size=CLOCK_STAMPS):
+        self.sample_rate = sample_rate
+        self.size = size
+        self._pos = np.zeros(size, dtype=np.int64)
+        self._time = np.zeros(size, dtype=np.float64)
+        self._count = 0
+
+    def stamp(self, position, captured):
+        i = self._count % self.size
+        self._pos[i] = position
+        self._time[i] = captured
+        self._count += 1
+
+    def time_at(self, position):
+        """When the sample at position was captured, or None before the first stamp"""
+        n = min(self._count, self.size)
+        if not n:
+            return None
+        pos = self._pos[:n]
+        earlier = pos <= position
+        if earlier.any():
+            i = int(np.argmax(np.where(earlier, pos, -1)))
+        else:
+            i = int(np.argmin(pos))  # Older than every stamp: extrapolate back from the oldest
+        return float(self._time[i]) + (position - int(pos[i])) / self.sample_rate
+
+    def clear(self):
+        self._count = 0
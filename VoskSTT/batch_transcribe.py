@@ -0,0 +1,177 @@
+"""Batch transcription of recorded WAV files across all cores.
+
+Usage:
+    python batch_transcribe.py recordings/ -o transcripts/
+    python batch_transcribe.py --model vosk-model-small-en-us-0.15 recordings/ -o transcripts/
+    python batch_transcribe.py --model path/to/model "calls/**/*.wav" --jobs 4 --format jsonl
+    python batch_transcribe.py lectures/ --format srt
+
+Each worker process loads the vosk.Model once and reuses it for every file
+it is handed. Prints the aggregate real-time factor at the end so machines
+can be sized.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import vosk
+
+from model_index import MODELS_PATH, ModelIndex, read_sample_rate
+from stt_engine import RecognitionEngine, WavFileSource, CollectingSink
+from word_store import WordStore
+
+# Per-process state, set up once by _init_worker
+_engine = None
+
+
+def resolve_model_path(model):
+    """Accept either a model directory or the name of a folder in models/"""
+    if not model:
+        index = ModelIndex()
+        index.refresh()
+        smallest = index.smallest()
+        if not smallest:
+            raise FileNotFoundError(f"No models found in {MODELS_PATH}")
+        return smallest
+    if os.path.isdir(model):
+        return os.path.abspath(model)
+    candidate = os.path.join(MODELS_PATH, model)
+    if os.path.isdir(candidate):
+        return candidate
+    raise FileNotFoundError(f"Model directory not found: {model}")
+
+
+def collect_inputs(patterns, recursive=False):
+    """Expand files, directories and glob patterns into a sorted list of WAV paths"""
+    found = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            sub = os.path.join('**', '*.wav') if recursive else '*.wav'
+            found.update(glob.glob(os.path.join(pattern, sub), recursive=recursive))
+        elif os.path.isfile(pattern):
+            found.add(pattern)
+        else:
+            found.update(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+    return sorted(os.path.abspath(p) for p in found)
+
+
+def _init_worker(model_path):
+    global _engine
+    vosk.SetLogLevel(-1)
+    _engine = RecognitionEngine(vosk.Model(model_path), words=True, model_rate=read_sample_rate(model_path))
+
+
+def _output_base(path, output_dir):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(output_dir or os.path.dirname(path), stem)
+
+
+def _transcribe(path, output_dir, fmt, block_size):
+    sink = CollectingSink()
+    words = WordStore(max_words=None)  # Captions cover the whole file
+    _engine.sinks = [sink, words]
+    try:
+        stats = _engine.run(WavFileSource(path, block_size=block_size))
+    except Exception as e:
+        return {"path": path, "error": str(e)}
+
+    base = _output_base(path, output_dir)
+    if fmt in ("jsonl", "both"):
+        with open(base + ".jsonl", "w", encoding="utf-8") as f:
+            for result in sink.results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    if fmt in ("text", "both"):
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(sink.text() + "\n")
+    if fmt in ("srt", "vtt"):
+        words.export(f"{base}.{fmt}")
+
+    summary = stats.as_dict()
+    summary["path"] = path
+    return summary
+
+
+def transcribe_files(paths, model_path, jobs=None, output_dir=None, fmt="both",
+                     block_size=8000, progress=None):
+    """Transcribe paths in a process pool and return (per-file results, aggregate summary)"""
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(paths) or 1))
+
+    results = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(model_path,)) as pool:
+        futures = [pool.submit(_transcribe, p, output_dir, fmt, block_size) for p in paths]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if progress:
+                progress(result)
+    wall = time.perf_counter() - started
+
+    done = [r for r in results if "error" not in r]
+    audio = sum(r["audio_seconds"] for r in done)
+    decode = sum(r["decode_seconds"] for r in done)
+    summary = {
+        "files": len(paths),
+        "failed": len(results) - len(done),
+        "jobs": jobs,
+        "audio_seconds": round(audio, 3),
+        "decode_seconds": round(decode, 3),
+        "wall_seconds": round(wall, 3),
+        # Wall clock per second of audio for the whole machine
+        "real_time_factor": round(wall / audio, 4) if audio else 0.0,
+        # Decode time per second of audio for a single core
+        "per_core_real_time_factor": round(decode / audio, 4) if audio else 0.0,
+    }
+    return results, summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe WAV files in parallel with Vosk")
+    parser.add_argument("inputs", nargs="+", help="WAV files, directories or glob patterns")
+    parser.add_argument("-m", "--model",
+                        help="Model directory or folder name inside models/ (default: smallest model)")
+    parser.add_argument("-o", "--output-dir", help="Where to write outputs (default: next to each file)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("-f", "--format", choices=["jsonl", "text", "both", "srt", "vtt"], default="both")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Search directories recursively")
+    parser.add_argument("--block-size", type=int, default=8000, help="Samples per AcceptWaveform call")
+    parser.add_argument("--summary-json", help="Also write the aggregate summary to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        model_path = resolve_model_path(args.model)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    paths = collect_inputs(args.inputs, args.recursive)
+    if not paths:
+        parser.error("No WAV files matched the given inputs")
+
+    def progress(result):
+        if "error" in result:
+            print(f"FAILED {result['path']}: {result['error']}", file=sys.stderr)
+        else:
+            print(f"{result['path']}: {result['audio_seconds']:.1f}s audio, "
+                  f"RTF {result['real_time_factor']:.3f}")
+
+    results, summary = transcribe_files(paths, model_path, args.jobs, args.output_dir,
+                                        args.format, args.block_size, progress)
+
+    print(f"\n{summary['files']} files, {summary['audio_seconds']:.1f}s audio in "
+          f"{summary['wall_seconds']:.1f}s on {summary['jobs']} workers")
+    print(f"Aggregate real-time factor: {summary['real_time_factor']:.4f} "
+          f"(per core: {summary['per_core_real_time_factor']:.4f})")
+    if args.summary_json:
+        with open(args.summary_json, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "files": results}, f, indent=2)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Latency/CPU trade-off of capture block and recognizer chunk sizes.
+
+Capture side: drives MicrophoneSource's callback (ring write + on_block
+hook) and the recognition-thread EnergyTracker with synthetic blocks and reports the cost per
+call and as a share of one core at real time. The block length is also
+the granularity of every silence/endpoint decision.
+
+Recognizer side (needs --model and --wav): decodes the WAV in chunks of
+each size and reports real-time factor and the mean AcceptWaveform time
+per chunk. A final result can't arrive sooner than chunk length plus
+that decode time after the audio was captured.
+
+    python benchmarks/bench_block_size.py
+    python benchmarks/bench_block_size.py --model ../models/vosk-model-small-en-us-0.15 --wav talk.wav
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stt_engine import MicrophoneSource  # noqa: E402
+from vad import EnergyTracker  # noqa: E402
+
+SAMPLE_RATE = 16000
+CAPTURE_BLOCKS_MS = (10, 20, 50, 100, 500)
+CHUNKS_MS = (100, 200, 500, 1000)
+
+
+def bench_capture(block_ms, audio_seconds):
+    block = SAMPLE_RATE * block_ms // 1000
+    source = MicrophoneSource(SAMPLE_RATE, block_size=block, chunk_size=SAMPLE_RATE // 5,
+                              on_block=lambda samples, captured: None)
+    tracker = EnergyTracker(SAMPLE_RATE)
+    rng = np.random.default_rng(0)
+    indata = bytearray(rng.integers(-3000, 3000, block, dtype=np.int16).tobytes())
+    calls = int(audio_seconds * 1000 // block_ms)
+
+    started = time.perf_counter()
+    for i in range(calls):
+        source._callback(indata, block, None, None)
+        tracker.update(source.ring.read(block))  # What the recognition thread does
+    elapsed = time.perf_counter() - started
+
+    per_call_us = elapsed / calls * 1e6
+    cpu_share = elapsed / audio_seconds * 100
+    return per_call_us, cpu_share
+
+
+def bench_decode(model, wav_path, chunk_ms):
+    import wave
+    import vosk
+    with wave.open(wav_path, 'rb') as wav:
+        rate = wav.getframerate()
+        pcm = wav.readframes(wav.getnframes())
+    chunk_bytes = rate * chunk_ms // 1000 * 2
+    rec = vosk.KaldiRecognizer(model, rate)
+    chunks = [pcm[i:i + chunk_bytes] for i in range(0, len(pcm), chunk_bytes)]
+    started = time.perf_counter()
+    for chunk in chunks:
+        if rec.AcceptWaveform(chunk):
+            rec.Result()
+    rec.FinalResult()
+    elapsed = time.perf_counter() - started
+    audio = len(pcm) / (2 * rate)
+    return elapsed / audio, elapsed / len(chunks) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Capture block / recognizer chunk size benchmark")
+    parser.add_argument("--seconds", type=float, default=60.0, help="Simulated capture length")
+    parser.add_argument("--model", help="Model directory for the recognizer benchmark")
+    parser.add_argument("--wav", help="Mono 16-bit WAV for the recognizer benchmark")
+    args = parser.parse_args(argv)
+
+    print(f"Capture callback + energy tracking, {args.seconds:.0f}s of simulated audio")
+    print(f"{'block':>8} {'us/call':>10} {'CPU %':>8} {'decision step':>14}")
+    for block_ms in CAPTURE_BLOCKS_MS:
+        per_call_us, cpu_share = bench_capture(block_ms, args.seconds)
+        print(f"{block_ms:>6}ms {per_call_us:>10.1f} {cpu_share:>8.3f} {block_ms:>12}ms")
+
+    if args.model and args.wav:
+        import vosk
+        vosk.SetLogLevel(-1)
+        model = vosk.Model(args.model)
+        print(f"\nRecognizer chunks, {os.path.basename(args.wav)}")
+        print(f"{'chunk':>8} {'RTF':>8} {'ms/chunk':>10} {'min latency':>12}")
+        for chunk_ms in CHUNKS_MS:
+            rtf, ms_per_chunk = bench_decode(model, args.wav, chunk_ms)
+            print(f"{chunk_ms:>6}ms {rtf:>8.3f} {ms_per_chunk:>10.1f} {chunk_ms + ms_per_chunk:>10.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
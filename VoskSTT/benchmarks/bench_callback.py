@@ -0,0 +1,179 @@
+"""Microbenchmark: per-block cost of the microphone callback.
+
+Compares the old path (bytes copy + queue.Queue + frombuffer/square/mean)
+with a bare ring buffer write, then times the callback the app actually
+runs: MicrophoneSource._callback (capture stamp, ring write, callback
+metrics) with SpeechToTextApp.on_audio_block as on_block, in key phrase
+mode feeding a KeyPhraseSpotter. The app object is built without its
+window and its Tk variables are stubs that count reads; the audio thread
+must make none, so any read is reported and the benchmark exits with
+status 1. Reports time and heap allocation per block, measured with
+tracemalloc.
+
+The app rows need the app's own imports (Tk, pywin32, keyboard) and are
+skipped where those are missing.
+
+    python benchmarks/bench_callback.py [--block-size 8000] [--blocks 2000]
+"""
+import argparse
+import os
+import queue
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_buffer import AudioRingBuffer  # noqa: E402
+from key_phrases import KeyPhraseSpotter  # noqa: E402
+from stt_engine import DEFAULT_SAMPLE_RATE, MicrophoneSource  # noqa: E402
+
+# Tk variables the app reads somewhere; all of them are stubbed
+APP_TK_VARS = {
+    "activate_on_phrase": True,
+    "phrase_anywhere_var": False,
+    "show_key_phrase_var": True,
+    "delay_var": 0,
+    "low_latency_var": False,
+    "multi_language_var": False,
+}
+
+
+class TkVarStub:
+    """Stands in for a Tk variable and counts the reads made through it"""
+
+    def __init__(self, value):
+        self.value = value
+        self.reads = 0
+
+    def get(self):
+        self.reads += 1
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+def make_old_callback(block_size):
+    q = queue.Queue()
+
+    def callback(indata):
+        audio_data = bytes(indata)
+        q.put(audio_data)
+        audio_array = np.frombuffer(audio_data, dtype=np.int16)
+        np.sqrt(np.mean(np.square(audio_array)))
+
+    def drain():
+        q.queue.clear()
+
+    return callback, drain
+
+
+def make_ring_callback(block_size):
+    ring = AudioRingBuffer(block_size * 64)
+
+    def callback(indata):
+        ring.write(np.frombuffer(indata, dtype=np.int16))
+
+    def drain():
+        ring.clear()
+
+    return callback, drain
+
+
+def make_source_callback(block_size, on_block=None, spotter=None):
+    source = MicrophoneSource(DEFAULT_SAMPLE_RATE, block_size, on_block=on_block)
+
+    def callback(indata):
+        source._callback(indata, block_size, None, None)
+
+    def drain():
+        source.ring.clear()
+        if spotter:
+            spotter.ring.clear()
+
+    return callback, drain
+
+
+def make_app():
+    """SpeechToTextApp in key phrase mode without its window, or None where the app can't be imported"""
+    try:
+        from RDC_Vosk_STT import SpeechToTextApp
+    except Exception as e:
+        print(f"App callback skipped: {e}")
+        return None
+    app = SpeechToTextApp.__new__(SpeechToTextApp)  # Skips __init__ and the window
+    app.tk_vars = {name: TkVarStub(value) for name, value in APP_TK_VARS.items()}
+    for name, var in app.tk_vars.items():
+        setattr(app, name, var)
+    app.phrase_mode = True
+    app.live_mode_active = False
+    app.ui_calls = queue.Queue()
+    # Not started: feed() only buffers, as when the spotter thread is busy
+    app.spotter = KeyPhraseSpotter(None, ["send it"], DEFAULT_SAMPLE_RATE)
+    return app
+
+
+def make_app_callback(app):
+    def factory(block_size):
+        return make_source_callback(block_size, app.on_audio_block, app.spotter)
+    return factory
+
+
+def measure(factory, block_size, blocks):
+    callback, drain = factory(block_size)
+    rng = np.random.default_rng(0)
+    indata = bytearray(rng.integers(-3000, 3000, block_size, dtype=np.int16).tobytes())
+
+    for _ in range(50):  # Warm up caches and lazy imports
+        callback(indata)
+    drain()
+
+    started = time.perf_counter()
+    for i in range(blocks):
+        callback(indata)
+        if i % 32 == 31:
+            drain()  # Stand-in for the recognition thread consuming
+    elapsed = time.perf_counter() - started
+    drain()
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    sample = min(blocks, 200)
+    for _ in range(sample):
+        callback(indata)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(s.size_diff for s in after.compare_to(before, 'filename') if s.size_diff > 0)
+    drain()
+    return elapsed / blocks * 1e6, allocated / sample
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--block-size", type=int, default=8000)
+    parser.add_argument("--blocks", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    print(f"block size {args.block_size} samples, {args.blocks} blocks")
+    rows = [("queue + bytes (old)", make_old_callback),
+            ("ring buffer write", make_ring_callback),
+            ("capture callback", make_source_callback)]
+    app = make_app()
+    if app:
+        rows.append(("capture + app key phrase", make_app_callback(app)))
+    for name, factory in rows:
+        per_block_us, bytes_per_block = measure(factory, args.block_size, args.blocks)
+        print(f"{name:26s} {per_block_us:8.1f} us/block  {bytes_per_block:10.0f} B retained/block")
+    if app:
+        reads = {name: var.reads for name, var in app.tk_vars.items() if var.reads}
+        if reads:
+            print(f"The audio callback read Tk variables, which blocks on the Tk mainloop: {reads}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
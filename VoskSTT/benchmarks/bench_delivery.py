@@ -0,0 +1,84 @@
+"""Per-utterance delivery latency through DeliveryWorker.
+
+Feeds synthetic utterances to a DeliveryWorker backed by MemoryBackend
+and reports the time from deliver() until each utterance was sent, along
+with the number of focus calls. For comparison it also prints what the
+old word-by-word path costs for the same utterances by construction:
+100 ms between words plus keyboard.write's 10 ms per character. Runs on
+any platform.
+
+    python benchmarks/bench_delivery.py [--utterances 200] [--words 12] [--send-ms 0]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from delivery import DeliveryWorker, MemoryBackend  # noqa: E402
+
+WORDS = "the quick brown fox jumps over a lazy dog while we talk about speech recognition".split()
+OLD_WORD_DELAY = 0.1
+OLD_CHAR_DELAY = 0.01
+
+
+class SlowMemoryBackend(MemoryBackend):
+    """MemoryBackend with a fixed cost per send, to model a real backend"""
+
+    def __init__(self, send_seconds):
+        super().__init__()
+        self.send_seconds = send_seconds
+
+    def send(self, text):
+        if self.send_seconds:
+            time.sleep(self.send_seconds)
+        super().send(text)
+
+
+def make_utterances(count, words, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, words * 2))) for _ in range(count)]
+
+
+def old_latency(text):
+    words = text.split()
+    typing = sum(len(w) + 1 for w in words) * OLD_CHAR_DELAY
+    return (len(words) - 1) * OLD_WORD_DELAY + typing
+
+
+def summarize(latencies):
+    lat = np.array(latencies) * 1000
+    return f"p50 {np.percentile(lat, 50):8.2f} ms   p95 {np.percentile(lat, 95):8.2f} ms   max {lat.max():8.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--utterances", type=int, default=200)
+    parser.add_argument("--words", type=int, default=12, help="Average words per utterance")
+    parser.add_argument("--send-ms", type=float, default=0.0, help="Simulated cost of one send")
+    parser.add_argument("--gap-ms", type=float, default=50.0, help="Pause between utterances")
+    args = parser.parse_args()
+
+    utterances = make_utterances(args.utterances, args.words)
+    backend = SlowMemoryBackend(args.send_ms / 1000)
+    worker = DeliveryWorker(backend)
+    worker.start()
+    for text in utterances:
+        worker.deliver(text + " ", target=1)
+        time.sleep(args.gap_ms / 1000)
+    worker.wait_idle(10)
+    worker.stop()
+
+    assert backend.text() == "".join(t + " " for t in utterances)
+    print(f"{len(utterances)} utterances, {sum(len(t.split()) for t in utterances)} words")
+    print(f"{'worker':14}{summarize(worker.latencies)}   focus calls {backend.focus_calls}")
+    print(f"{'word-by-word':14}{summarize([old_latency(t) for t in utterances])}   "
+          f"focus calls {sum(len(t.split()) for t in utterances)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Recognition benchmark for every model in models/.
+
+Replays WAV fixtures through RecognitionEngine configured the way the
+app runs it (VAD gating, partials, word timings, the model's own sample
+rate) and reports per model:
+
+    load_seconds     vosk.Model() plus a short warm-up decode
+    peak_rss_mb      peak resident memory of the process that ran the model
+    accelerated      fixtures decoded as fast as possible: real-time factor
+                     (decode time per second of audio) and wall time
+    realtime         fixtures paced at real time in capture-sized blocks:
+                     latency from the end of the last word of each
+                     utterance (its word timing) to the final result
+
+Each model runs in its own spawned process so load time and peak RSS are
+not skewed by models measured before it. No audio device, Tk or win32
+is needed. Results are written as JSON; --compare prints the change
+against an earlier results file.
+
+    python benchmarks/bench_models.py fixtures/*.wav -o results.json
+    python benchmarks/bench_models.py fixtures/ --models vosk-model-small-en-us-0.15 --compare old.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_transcribe import collect_inputs, resolve_model_path  # noqa: E402
+from model_index import ModelIndex, read_sample_rate  # noqa: E402
+from stt_engine import AudioSource, RecognitionEngine, ResultSink, WavFileSource  # noqa: E402
+from vad import VoiceActivityDetector  # noqa: E402
+
+RESULTS_VERSION = 1
+CAPTURE_BLOCK_MS = 500  # The app's default capture block (RDC_Vosk_STT.CAPTURE_BLOCK_MS)
+ACCELERATED_BLOCK = 8000  # Samples per block when decoding flat out
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process, None where it can't be read"""
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class PacedSource(AudioSource):
+    """Deliver another source's blocks at wall-clock speed, like a microphone"""
+    realtime = True
+
+    def __init__(self, source, block_ms=CAPTURE_BLOCK_MS):
+        self.source = source
+        self.block_ms = block_ms
+        self.started = None
+
+    def open(self):
+        self.source.open()
+        self.sample_rate = self.source.sample_rate
+        self.source.block_size = self.sample_rate * self.block_ms // 1000  # Capture-sized blocks
+
+    def blocks(self, stop=None):
+        self.started = time.perf_counter()
+        sent = 0
+        for data in self.source.blocks(stop):
+            sent += len(data) // 2
+            # A block can only be handed over once all of it has been "spoken"
+            delay = self.started + sent / self.sample_rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            # Stamped like a microphone block: when its first sample was "captured"
+            self.block_captured = self.started + (sent - len(data) // 2) / self.sample_rate
+            yield data
+
+    def close(self):
+        self.source.close()
+
+
+class LatencySink(ResultSink):
+    """Time from the end of each utterance's last word to its final result"""
+
+    def __init__(self, source):
+        self.source = source
+        self.latencies = []
+        self.words = 0
+
+    def on_final(self, text, result):
+        words = result.get("result")
+        self.words += len(text.split())
+        # The engine's capture-clock stamp; word timing as a fallback
+        spoken = result.get("captured_end")
+        if spoken is None and words:
+            spoken = self.source.started + words[-1]["end"]
+        if spoken is not None:
+            self.latencies.append(time.perf_counter() - spoken)
+
+
+class CountingSink(ResultSink):
+    def __init__(self):
+        self.words = 0
+
+    def on_final(self, text, result):
+        self.words += len(text.split())
+
+
+def summarize(latencies):
+    if not latencies:
+        return {"utterances": 0}
+    lat = np.array(latencies) * 1000
+    return {
+        "utterances": len(lat),
+        "p50_ms": round(float(np.percentile(lat, 50)), 1),
+        "p95_ms": round(float(np.percentile(lat, 95)), 1),
+        "max_ms": round(float(lat.max()), 1),
+    }
+
+
+def make_engine(model, model_rate, sinks, use_vad):
+    return RecognitionEngine(
+        model,
+        sinks=sinks,
+        partials=True,
+        vad=VoiceActivityDetector() if use_vad else None,
+        words=True,
+        model_rate=model_rate,
+    )
+
+
+def bench_model(model_path, wavs, realtime=True, use_vad=True, block_ms=CAPTURE_BLOCK_MS):
+    """Runs in a fresh process: load one model and replay every fixture"""
+    import vosk
+    from model_loader import warm_up_model
+    vosk.SetLogLevel(-1)
+    rate = read_sample_rate(model_path)
+    started = time.perf_counter()
+    model = vosk.Model(model_path)
+    warm_up_model(model, rate or 16000)
+    load_seconds = time.perf_counter() - started
+
+    fixtures = []
+    for wav in wavs:
+        entry = {"wav": os.path.basename(wav)}
+        sink = CountingSink()
+        engine = make_engine(model, rate, [sink], use_vad)
+        stats = engine.run(WavFileSource(wav, block_size=ACCELERATED_BLOCK))
+        entry["audio_seconds"] = round(stats.audio_seconds, 3)
+        entry["accelerated"] = {
+            "real_time_factor": round(stats.real_time_factor, 4),
+            "wall_seconds": round(stats.wall_seconds, 3),
+            "decoded_share": round(stats.decoded_seconds / stats.audio_seconds, 3) if stats.audio_seconds else 0.0,
+            "words": sink.words,
+        }
+        if realtime:
+            paced = PacedSource(WavFileSource(wav), block_ms)
+            sink = LatencySink(paced)
+            engine = make_engine(model, rate, [sink], use_vad)
+            stats = engine.run(paced)
+            entry["realtime"] = dict(summarize(sink.latencies), real_time_factor=round(stats.real_time_factor, 4))
+        fixtures.append(entry)
+
+    audio = sum(f["audio_seconds"] for f in fixtures)
+    decode = sum(f["accelerated"]["real_time_factor"] * f["audio_seconds"] for f in fixtures)
+    latencies = [f["realtime"] for f in fixtures if f.get("realtime", {}).get("utterances")]
+    return {
+        "model": os.path.basename(model_path),
+        "sample_rate": rate,
+        "load_seconds": round(load_seconds, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        "real_time_factor": round(decode / audio, 4) if audio else 0.0,
+        "worst_p95_ms": max((f["p95_ms"] for f in latencies), default=None),
+        "fixtures": fixtures,
+    }
+
+
+def model_paths(names):
+    if names:
+        return [resolve_model_path(name) for name in names]
+    index = ModelIndex()
+    index.refresh()
+    return [entry["path"] for entry in index.entries(valid_only=True)]
+
+
+def environment():
+    try:
+        import vosk
+        vosk_version = getattr(vosk, "__version__", None)
+    except ImportError:
+        vosk_version = None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "vosk": vosk_version,
+    }
+
+
+def compare(current, baseline_path):
+    """Print how each model's headline numbers moved against a baseline file"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["model"]: r for r in json.load(f).get("models", [])}
+    keys = ("real_time_factor", "worst_p95_ms", "load_seconds", "peak_rss_mb")
+    print(f"\nChange against {baseline_path}")
+    for result in current:
+        old = baseline.get(result["model"])
+        if not old:
+            print(f"  {result['model']}: not in baseline")
+            continue
+        changes = []
+        for key in keys:
+            a, b = old.get(key), result.get(key)
+            if a is None or b is None:
+                continue
+            pct = (b - a) / a * 100 if a else 0.0
+            changes.append(f"{key} {a} -> {b} ({pct:+.1f}%)")
+        print(f"  {result['model']}: " + ", ".join(changes))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", nargs="+", help="WAV files, directories or glob patterns")
+    parser.add_argument("--models", nargs="*", help="Model folders or names in models/ (default: all valid models)")
+    parser.add_argument("-o", "--output", default="bench_models.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--no-realtime", action="store_true", help="Skip the paced runs (they take as long as the audio)")
+    parser.add_argument("--no-vad", action="store_true", help="Feed every block to the recognizer")
+    parser.add_argument("--block-ms", type=int, default=CAPTURE_BLOCK_MS, help="Capture block for the paced runs")
+    args = parser.parse_args(argv)
+
+    wavs = collect_inputs(args.fixtures)
+    if not wavs:
+        parser.error("No WAV fixtures matched")
+    try:
+        paths = model_paths(args.models)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    if not paths:
+        parser.error("No models found")
+
+    results = []
+    # A fresh process per model keeps load time and peak RSS independent
+    context = multiprocessing.get_context("spawn")
+    for path in paths:
+        print(f"{os.path.basename(path)}...", flush=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                result = pool.submit(bench_model, path, wavs, not args.no_realtime,
+                                     not args.no_vad, args.block_ms).result()
+            except Exception as e:
+                print(f"  failed: {e}", file=sys.stderr)
+                continue
+        results.append(result)
+        latency = f", p95 latency {result['worst_p95_ms']} ms" if result["worst_p95_ms"] is not None else ""
+        print(f"  load {result['load_seconds']:.2f}s, RTF {result['real_time_factor']:.3f}{latency}, "
+              f"peak RSS {result['peak_rss_mb']} MB")
+
+    report = {
+        "version": RESULTS_VERSION,
+        "environment": environment(),
+        "fixtures": [os.path.basename(w) for w in wavs],
+        "settings": {"realtime": not args.no_realtime, "vad": not args.no_vad, "block_ms": args.block_ms},
+        "models": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+    return 0 if results else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
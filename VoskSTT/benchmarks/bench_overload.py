@@ -0,0 +1,151 @@
+"""How each overload policy copes with a recognizer slower than real time.
+
+A simulated microphone feeds the real MicrophoneSource ring at wall-clock
+speed with alternating speech and silence, and RecognitionEngine decodes
+it with a stand-in recognizer that costs --rtf seconds per second of
+audio (plus --partial-ms per partial result), the way a large model on a
+slow machine would. For every policy, with and without the VAD, this
+reports the largest backlog, how long decoding kept going after capture
+stopped, and how much audio was shed or coalesced. No model, audio device
+or Tk is needed.
+
+    python benchmarks/bench_overload.py [--seconds 30] [--rtf 1.5]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stt_engine import OVERLOAD_POLICIES, MicrophoneSource, RecognitionEngine  # noqa: E402
+from vad import VoiceActivityDetector  # noqa: E402
+
+SAMPLE_RATE = 16000
+BLOCK_MS = 20  # Capture block, as in low-latency mode
+CHUNK_MS = 200  # Recognizer chunk
+SPEECH_SECONDS = 2.0  # Length of each burst of "speech"...
+PAUSE_SECONDS = 2.0  # ...and of the silence after it
+
+
+class SlowRecognizer:
+    """KaldiRecognizer stand-in with a fixed cost per second of audio"""
+
+    def __init__(self, sample_rate, rtf, partial_ms):
+        self.sample_rate = sample_rate
+        self.rtf = rtf
+        self.partial_ms = partial_ms
+        self.fed = 0
+
+    def SetWords(self, enabled):
+        pass
+
+    def AcceptWaveform(self, data):
+        samples = len(data) // 2
+        self.fed += samples
+        time.sleep(samples / self.sample_rate * self.rtf)  # Sleeping releases the GIL, as vosk does
+        return False
+
+    def PartialResult(self):
+        time.sleep(self.partial_ms / 1000)
+        return json.dumps({"partial": "x"})
+
+    def FinalResult(self):
+        text = "x" if self.fed else ""
+        self.fed = 0
+        return json.dumps({"text": text})
+
+
+class SlowModel:
+    def __init__(self, rtf, partial_ms):
+        self.rtf = rtf
+        self.partial_ms = partial_ms
+
+    def create_recognizer(self, sample_rate):
+        return SlowRecognizer(sample_rate, self.rtf, self.partial_ms)
+
+
+class SimulatedMicrophone(MicrophoneSource):
+    """MicrophoneSource whose callback is driven by a thread instead of PortAudio"""
+
+    def __init__(self, seconds, **kwargs):
+        super().__init__(**kwargs)
+        self.seconds = seconds
+        self.finished = threading.Event()
+
+    def open(self):
+        self._running = True
+        threading.Thread(target=self._feed, daemon=True).start()
+
+    def close(self):
+        self._running = False
+
+    def _feed(self):
+        rng = np.random.default_rng(0)
+        period = SPEECH_SECONDS + PAUSE_SECONDS
+        blocks = int(self.seconds * 1000 // BLOCK_MS)
+        started = time.perf_counter()
+        for i in range(blocks):
+            at = i * BLOCK_MS / 1000
+            level = 3000 if at % period < SPEECH_SECONDS else 30
+            indata = rng.normal(0, level, self.block_size).astype(np.int16).tobytes()
+            delay = started + at + BLOCK_MS / 1000 - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self._callback(indata, self.block_size, None, None)
+        self.finished.set()
+
+
+def run(policy, use_vad, seconds, rtf, partial_ms):
+    source = SimulatedMicrophone(
+        seconds,
+        sample_rate=SAMPLE_RATE,
+        block_size=SAMPLE_RATE * BLOCK_MS // 1000,
+        chunk_size=SAMPLE_RATE * CHUNK_MS // 1000,
+    )
+    engine = RecognitionEngine(
+        SlowModel(rtf, partial_ms),
+        partials=True,
+        vad=VoiceActivityDetector(SAMPLE_RATE) if use_vad else None,
+        overload=policy,
+    )
+    engine.start(source)
+    source.finished.wait()
+    captured = time.perf_counter()
+    while source.lag_seconds() > 0 and engine.is_running:
+        time.sleep(0.01)
+    drain = time.perf_counter() - captured
+    engine.stop()
+    stats = engine.stats
+    return {
+        "max_lag": stats.max_lag,
+        "drain": drain,
+        "decoded": stats.decoded_seconds,
+        "shed": stats.shed_seconds + (engine.vad.skipped_seconds if use_vad else 0.0),
+        "coalesced": stats.coalesced,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30.0, help="Simulated capture length")
+    parser.add_argument("--rtf", type=float, default=1.5, help="Recognizer cost per second of audio")
+    parser.add_argument("--partial-ms", type=float, default=5.0, help="Cost of one partial result")
+    args = parser.parse_args(argv)
+
+    print(f"{args.seconds:g}s of audio, {SPEECH_SECONDS:g}s speech / {PAUSE_SECONDS:g}s pause, "
+          f"recognizer RTF {args.rtf:g}")
+    print(f"{'policy':14}{'VAD':>5}{'max lag s':>11}{'drain s':>9}{'decoded s':>11}{'skipped s':>11}{'coalesced':>11}")
+    for use_vad in (False, True):
+        for policy in OVERLOAD_POLICIES:
+            r = run(policy, use_vad, args.seconds, args.rtf, args.partial_ms)
+            print(f"{policy:14}{'on' if use_vad else 'off':>5}{r['max_lag']:>11.2f}{r['drain']:>9.2f}"
+                  f"{r['decoded']:>11.2f}{r['shed']:>11.2f}{r['coalesced']:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Load test for recognition_server: streams per core and memory per session.
+
+Starts a RecognitionServer in this process with one model, then for each
+session count opens that many clients at once and streams a WAV fixture
+through every one of them as fast as the server takes it. Reported per
+step:
+
+    x realtime        seconds of audio decoded per wall second, i.e. how
+                      many live streams the server could keep up with
+    streams/core      the same divided by the cores the sessions could use
+    RSS MB            peak resident memory during the step
+    MB/session        peak RSS above the idle server (model loaded, no
+                      sessions), divided by the session count
+
+The clients live in the same process but only hold their send buffers,
+so the memory figures are the server's own. Current RSS is read from
+/proc, so the memory columns are Linux only.
+
+    python benchmarks/bench_server.py --model vosk-model-small-en-us-0.15 --wav talk.wav
+    python benchmarks/bench_server.py --model vosk-model-en-us-0.22 --wav talk.wav --sessions 1 2 4 8 16
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_transcribe import resolve_model_path  # noqa: E402
+from recognition_server import ModelCatalog, RecognitionClient, RecognitionServer  # noqa: E402
+
+CHUNK_MS = 200  # Client send size
+SESSION_STEPS = (1, 2, 4, 8)
+RSS_POLL_SECONDS = 0.05
+
+
+def current_rss_mb():
+    """Resident memory of this process now, None where /proc is missing"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class RssSampler:
+    """Track peak RSS on a background thread while a step runs"""
+
+    def __init__(self):
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            rss = current_rss_mb()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+            if self._stop.wait(RSS_POLL_SECONDS):
+                return
+
+
+def read_wav(path):
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError(f"{path}: expected 16-bit mono PCM WAV")
+        return wav.getframerate(), wav.readframes(wav.getnframes())
+
+
+def run_step(address, sessions, rate, pcm):
+    chunk = rate * CHUNK_MS // 1000 * 2
+    chunks = [pcm[i:i + chunk] for i in range(0, len(pcm), chunk)]
+    clients = [RecognitionClient(address, sample_rate=rate) for _ in range(sessions)]
+    finals = [0] * sessions
+
+    def stream(i):
+        finals[i] = len(clients[i].transcribe(chunks))
+
+    threads = [threading.Thread(target=stream, args=(i,)) for i in range(sessions)]
+    started = time.perf_counter()
+    with RssSampler() as rss:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - started
+    for client in clients:
+        client.close()
+    return wall, rss.peak, sum(finals)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", required=True, help="Model folder or name in models/")
+    parser.add_argument("--wav", required=True, help="16-bit mono WAV streamed by every session")
+    parser.add_argument("--sessions", type=int, nargs="+", default=list(SESSION_STEPS))
+    args = parser.parse_args(argv)
+
+    import vosk
+    vosk.SetLogLevel(-1)
+    rate, pcm = read_wav(args.wav)
+    audio = len(pcm) / (2 * rate)
+    catalog = ModelCatalog({"default": resolve_model_path(args.model)})
+    server = RecognitionServer(catalog, ("127.0.0.1", 0), max_sessions=max(args.sessions))
+    server.start()
+    address = f"127.0.0.1:{server.address[1]}"
+    cores = os.cpu_count() or 1
+    try:
+        baseline_rss = current_rss_mb()
+        load_started = time.perf_counter()
+        run_step(address, 1, rate, pcm[:rate * 2])  # Loads the model and warms it up
+        load = time.perf_counter() - load_started
+        idle_rss = current_rss_mb()
+        print(f"{os.path.basename(catalog.paths['default'])}: loaded in {load:.1f}s", end="")
+        if idle_rss is not None:
+            print(f", {idle_rss - baseline_rss:.0f} MB for the model", end="")
+        print(f"; {audio:.1f}s fixture, {cores} cores")
+        print(f"{'sessions':>9}{'wall s':>9}{'x realtime':>12}{'streams/core':>14}{'RSS MB':>9}{'MB/session':>12}{'finals':>8}")
+        for sessions in args.sessions:
+            wall, peak, finals = run_step(address, sessions, rate, pcm)
+            throughput = sessions * audio / wall
+            per_core = throughput / min(sessions, cores)
+            if peak is not None and idle_rss is not None:
+                memory = f"{peak:>9.0f}{(peak - idle_rss) / sessions:>12.1f}"
+            else:
+                memory = f"{'-':>9}{'-':>12}"
+            print(f"{sessions:>9}{wall:>9.2f}{throughput:>12.1f}{per_core:>14.1f}{memory}{finals:>8}")
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
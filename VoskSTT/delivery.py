@@ -0,0 +1,269 @@
+"""Text delivery to other applications.
+
+A DeliveryWorker owns a queue of utterances and hands each one to a
+backend on its own thread: the target window is focused once, then the
+whole utterance goes out in a single operation. Backends:
+
+    KeystrokeBackend  types the text with the keyboard module
+    ClipboardBackend  puts the text on the clipboard and sends Ctrl+V
+    MemoryBackend     records the text in memory (tests and benchmarks)
+
+Windows-only modules are imported lazily, so MemoryBackend and the
+worker run anywhere.
+"""
+import logging
+import queue
+import threading
+import time
+
+import numpy as np
+
+from metrics import REGISTRY
+
+log = logging.getLogger(__name__)
+
+FOCUS_TIMEOUT = 0.5  # Seconds to wait for a window to come to the front
+FOCUS_POLL = 0.05
+CLIPBOARD_RESTORE_DELAY = 0.2  # Let the paste land before restoring the old clipboard
+
+SEND_MS = REGISTRY.histogram("delivery_send_ms", "Focusing the target and sending one utterance")
+LATENCY_MS = REGISTRY.histogram("delivery_latency_ms", "From deliver() to the utterance being sent")
+PENDING = REGISTRY.gauge("delivery_pending", "Utterances and Enter presses waiting to be delivered")
+FAILURES = REGISTRY.counter("delivery_failures", "Utterances that could not be delivered")
+
+
+def focus_window(hwnd, timeout=FOCUS_TIMEOUT):
+    """Bring hwnd to the foreground; True once it has focus"""
+    import win32con
+    import win32gui
+    if win32gui.GetForegroundWindow() == hwnd:
+        return True
+    win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
+    win32gui.SetForegroundWindow(hwnd)
+    deadline = time.monotonic() + timeout
+    while win32gui.GetForegroundWindow() != hwnd:
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(FOCUS_POLL)
+    return True
+
+
+class DeliveryBackend:
+    """Base class: focus a target, send text, press Enter"""
+    name = "base"
+
+    def focus(self, target):
+        """Make target (a window handle) receive input; None means leave focus alone"""
+        if target is None:
+            return True
+        return focus_window(target)
+
+    def send(self, text):
+        raise NotImplementedError
+
+    def press_enter(self):
+        import win32api
+        import win32con
+        win32api.keybd_event(win32con.VK_RETURN, 0, 0, 0)
+        win32api.keybd_event(win32con.VK_RETURN, 0, win32con.KEYEVENTF_KEYUP, 0)
+
+
+class KeystrokeBackend(DeliveryBackend):
+    """Type the whole utterance in one keyboard.write call"""
+    name = "keystrokes"
+
+    def send(self, text):
+        import keyboard
+        keyboard.write(text, delay=0)
+
+
+class ClipboardBackend(DeliveryBackend):
+    """Paste the utterance; fastest for long text and any script"""
+    name = "clipboard"
+
+    def __init__(self, restore=True):
+        self.restore = restore  # Put the user's previous clipboard text back afterwards
+
+    def send(self, text):
+        import keyboard
+        import win32clipboard
+        previous = None
+        win32clipboard.OpenClipboard()
+        try:
+            if self.restore:
+                try:
+                    previous = win32clipboard.GetClipboardData(win32clipboard.CF_UNICODETEXT)
+                except TypeError:
+                    previous = None  # Clipboard held no text
+            win32clipboard.EmptyClipboard()
+            win32clipboard.SetClipboardData(win32clipboard.CF_UNICODETEXT, text)
+        finally:
+            win32clipboard.CloseClipboard()
+        keyboard.send('ctrl+v')
+        if previous is not None:
+            time.sleep(CLIPBOARD_RESTORE_DELAY)
+            win32clipboard.OpenClipboard()
+            try:
+                win32clipboard.EmptyClipboard()
+                win32clipboard.SetClipboardData(win32clipboard.CF_UNICODETEXT, previous)
+            finally:
+                win32clipboard.CloseClipboard()
+
+
+class MemoryBackend(DeliveryBackend):
+    """Record deliveries instead of sending them anywhere"""
+    name = "memory"
+
+    def __init__(self, focus_ok=True):
+        self.focus_ok = focus_ok
+        self.outputs = []  # (text, perf_counter time)
+        self.enters = 0
+        self.focus_calls = 0
+
+    def focus(self, target):
+        self.focus_calls += 1
+        return self.focus_ok
+
+    def send(self, text):
+        self.outputs.append((text, time.perf_counter()))
+
+    def press_enter(self):
+        self.enters += 1
+
+    def text(self):
+        return "".join(text for text, _ in self.outputs)
+
+
+BACKENDS = {
+    KeystrokeBackend.name: KeystrokeBackend,
+    ClipboardBackend.name: ClipboardBackend,
+    MemoryBackend.name: MemoryBackend,
+}
+
+
+def create_backend(name):
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown delivery backend: {name}") from None
+
+
+class DeliveryWorker:
+    """Deliver queued utterances and Enter presses in order on one thread
+
+    on_delivered(text, latency, tag), on_failed(text) and on_idle() run on
+    the worker thread. latency is seconds from the job's created time (by
+    default when it was queued) to the text being sent or Enter pressed;
+    text is None for an Enter press. tag is whatever the caller passed in,
+    e.g. the delivery mode. on_idle follows once nothing is left in the
+    queue.
+    """
+
+    def __init__(self, backend, on_delivered=None, on_failed=None, on_idle=None):
+        self.backend = backend
+        self.on_delivered = on_delivered
+        self.on_failed = on_failed
+        self.on_idle = on_idle
+        self.latencies = []
+        self._jobs = queue.Queue()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread = None
+
+    @property
+    def pending(self):
+        """Jobs queued or in progress"""
+        return self._pending
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        if not self._thread:
+            return
+        self._jobs.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def deliver(self, text, target=None, created=None, tag=None):
+        """Queue text for target; created is when the text came into being (perf_counter)"""
+        self._submit(("text", text, target, created or time.perf_counter(), tag))
+
+    def press_enter(self, created=None, tag=None):
+        """Queue an Enter press behind any text still being delivered"""
+        self._submit(("enter", None, None, created or time.perf_counter(), tag))
+
+    def wait_idle(self, timeout=None):
+        return self._idle.wait(timeout)
+
+    def _submit(self, job):
+        with self._pending_lock:
+            self._pending += 1
+            self._idle.clear()
+            PENDING.set(self._pending)
+        self._jobs.put(job)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            kind, text, target, created, tag = job
+            try:
+                if kind == "enter":
+                    self.backend.press_enter()
+                    self._notify(self.on_delivered, None, time.perf_counter() - created, tag)
+                else:
+                    self._send(text, target, created, tag)
+            except Exception:
+                log.exception(f"{self.backend.name} delivery failed")
+                if kind == "text":
+                    FAILURES.inc()
+                    self._notify(self.on_failed, text)
+            finally:
+                with self._pending_lock:
+                    self._pending -= 1
+                    PENDING.set(self._pending)
+                    idle = not self._pending
+                    if idle:
+                        self._idle.set()
+                if idle:
+                    self._notify(self.on_idle)
+
+    def _send(self, text, target, created, tag):
+        started = time.perf_counter()
+        if not self.backend.focus(target):
+            log.debug(f"Could not focus delivery target {target}")
+            FAILURES.inc()
+            self._notify(self.on_failed, text)
+            return
+        self.backend.send(text)
+        SEND_MS.since(started)
+        latency = time.perf_counter() - created
+        LATENCY_MS.observe(latency * 1000)
+        self.latencies.append(latency)
+        self._notify(self.on_delivered, text, latency, tag)
+
+    def _notify(self, callback, *args):
+        if not callback:
+            return
+        try:
+            callback(*args)
+        except Exception:
+            log.exception("Delivery callback failed")
+
+    def latency_stats(self):
+        if not self.latencies:
+            return {"utterances": 0}
+        lat = np.array(self.latencies) * 1000
+        return {
+            "utterances": len(lat),
+            "p50_ms": round(float(np.percentile(lat, 50)), 2),
+            "p95_ms": round(float(np.percentile(lat, 95)), 2),
+            "max_ms": round(float(lat.max()), 2),
+        }
@@ -0,0 +1,450 @@
+"""Append-only transcript journal with an inverted index.
+
+Every final result is appended as one JSON line to a per-day file in
+journal/ (YYYY-MM-DD.jsonl). A writer thread batches the appends and
+fsyncs at most once per FSYNC_INTERVAL, so a crash loses at most the last
+second; a line torn by a crash is skipped when reading and the next
+append starts on a fresh line.
+
+Each day file has an inverted index next to it (YYYY-MM-DD.idx.json):
+token -> record numbers, plus the start time and byte offset of every
+record. A small vocabulary file (vocab.json, token -> days) tells a
+search which days can match at all; it then loads only those days'
+indexes and seeks straight to the matching lines, so the journal itself
+is never read in full. An index that is missing or behind its journal is
+caught up from the last indexed byte.
+
+    python journal.py "send the report" --since 2025-03-01 --limit 20
+"""
+import argparse
+import atexit
+import bisect
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from key_phrases import tokenize
+from result_sinks import ResultSink
+
+log = logging.getLogger(__name__)
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+JOURNAL_DIR = os.path.join(BASE_PATH, 'journal')
+INDEX_VERSION = 1
+FSYNC_INTERVAL = 1.0  # Seconds between fsyncs while results keep coming
+FSYNC_BATCH = 64  # ...or after this many unsynced records
+INDEX_SAVE_INTERVAL = 30.0  # The journal is the source of truth; the index can lag
+INDEX_CACHE_DAYS = 16
+
+
+def day_of(timestamp):
+    return time.strftime('%Y-%m-%d', time.localtime(timestamp))
+
+
+def parse_day(text):
+    """'2025-03-01' -> local midnight as a timestamp"""
+    return time.mktime(time.strptime(text, '%Y-%m-%d'))
+
+
+def make_record(text, result=None, model=None, end_time=None, session=None):
+    """Journal entry for a final result; word timings give the utterance start"""
+    end_time = end_time or time.time()
+    words = (result or {}).get("result") or []
+    duration = words[-1]["end"] - words[0]["start"] if words else 0.0
+    confs = [w["conf"] for w in words if "conf" in w]
+    return {
+        "t": round(end_time - duration, 3),
+        "end": round(end_time, 3),
+        "text": text,
+        "model": model,
+        "conf": round(sum(confs) / len(confs), 3) if confs else None,
+        "session": session,
+    }
+
+
+class SegmentIndex:
+    """Inverted index over one day's journal file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path[:-len('.jsonl')] + '.idx.json'
+        self.times = []  # Start time per record number
+        self.offsets = []  # Byte offset per record number
+        self.postings = {}  # token -> ascending record numbers
+        self.indexed_bytes = 0
+        self.dirty = False
+
+    def load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            size = os.path.getsize(self.path)
+            if data.get("version") == INDEX_VERSION and data["indexed_bytes"] <= size:
+                self.times = data["times"]
+                self.offsets = data["offsets"]
+                self.postings = data["postings"]
+                self.indexed_bytes = data["indexed_bytes"]
+        except (OSError, ValueError, KeyError):
+            pass  # Rebuilt from the journal below
+        self.catch_up()
+        return self
+
+    def catch_up(self):
+        """Index journal lines written since the index was last saved"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self.indexed_bytes)
+            offset = self.indexed_bytes
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # Torn write; the writer starts a fresh line after it
+                try:
+                    self.add(json.loads(line), offset)
+                except ValueError:
+                    pass
+                offset += len(line)
+                self.indexed_bytes = offset
+
+    def add(self, record, offset):
+        number = len(self.times)
+        self.times.append(record["t"])
+        self.offsets.append(offset)
+        for token in set(tokenize(record.get("text", ""))):
+            self.postings.setdefault(token, []).append(number)
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        data = {
+            "version": INDEX_VERSION,
+            "indexed_bytes": self.indexed_bytes,
+            "times": self.times,
+            "offsets": self.offsets,
+            "postings": self.postings,
+        }
+        tmp = self.index_path + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp, self.index_path)
+            self.dirty = False
+        except OSError as e:
+            log.warning(f"Could not save journal index: {e}")
+
+    def _token_postings(self, token):
+        if token.endswith('*'):
+            # Prefix search: union over matching vocabulary, not over records
+            prefix = token[:-1]
+            numbers = set()
+            for word, posting in self.postings.items():
+                if word.startswith(prefix):
+                    numbers.update(posting)
+            return sorted(numbers)
+        return self.postings.get(token, [])
+
+    def find(self, tokens, start=None, end=None):
+        """Byte offsets of records containing every token, within [start, end]"""
+        if not tokens:
+            # Records are appended in time order, so the range is a slice
+            lo = bisect.bisect_left(self.times, start) if start is not None else 0
+            hi = bisect.bisect_right(self.times, end) if end is not None else len(self.times)
+            return self.offsets[lo:hi]
+        postings = sorted((self._token_postings(t) for t in tokens), key=len)
+        matches = set(postings[0])
+        for posting in postings[1:]:
+            matches.intersection_update(posting)
+            if not matches:
+                return []
+        return [self.offsets[n] for n in sorted(matches)
+                if (start is None or self.times[n] >= start) and (end is None or self.times[n] <= end)]
+
+
+class SessionJournal:
+    """Append final results to the journal on a writer thread and search it"""
+
+    def __init__(self, directory=JOURNAL_DIR, session=None):
+        self.directory = directory
+        self.session = session or time.strftime('%Y%m%d-%H%M%S')
+        self.records = queue.Queue()
+        self._lock = threading.Lock()  # Guards the indexes shared with search()
+        self._indexes = OrderedDict()  # day -> SegmentIndex, most recently used last
+        self._vocab = None  # token -> set of days, loaded on first search
+        self._vocab_days = {}  # day -> journal bytes the vocabulary covers
+        self._vocab_dirty = False
+        self._file = None
+        self._file_day = None
+        self._thread = None
+        self.written = 0
+        self.fsyncs = 0
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=2.0):
+        if not self._thread:
+            return
+        self.records.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def append(self, text, result=None, model=None, end_time=None):
+        """Queue a final result; returns immediately"""
+        self.records.put(make_record(text, result, model, end_time, self.session))
+
+    def _path(self, day):
+        return os.path.join(self.directory, f"{day}.jsonl")
+
+    def _index(self, day):
+        index = self._indexes.get(day)
+        if index is None:
+            index = SegmentIndex(self._path(day)).load()
+            self._indexes[day] = index
+            while len(self._indexes) > INDEX_CACHE_DAYS:
+                _, old = self._indexes.popitem(last=False)
+                old.save()
+        self._indexes.move_to_end(day)
+        return index
+
+    def _open_day(self, day):
+        if self._file:
+            self._sync()
+            self._file.close()
+        path = self._path(day)
+        self._file = open(path, 'ab')
+        self._file_day = day
+        size = self._file.tell()
+        if size:
+            with open(path, 'rb') as f:
+                f.seek(size - 1)
+                if f.read(1) != b'\n':
+                    self._file.write(b'\n')  # Close off a line torn by a crash
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.fsyncs += 1
+
+    def _write(self):
+        unsynced = 0
+        last_sync = time.monotonic()
+        last_save = time.monotonic()
+        while True:
+            try:
+                record = self.records.get(timeout=FSYNC_INTERVAL)
+            except queue.Empty:
+                record = False
+            if record is None:
+                break
+            try:
+                if record:
+                    batch = [record]
+                    # Take whatever else is queued as one batch
+                    while len(batch) < FSYNC_BATCH:
+                        try:
+                            record = self.records.get_nowait()
+                        except queue.Empty:
+                            break
+                        if record is None:
+                            self.records.put(None)
+                            break
+                        batch.append(record)
+                    self._append(batch)
+                    unsynced += len(batch)
+                now = time.monotonic()
+                if unsynced and (unsynced >= FSYNC_BATCH or now - last_sync >= FSYNC_INTERVAL):
+                    self._sync()
+                    unsynced = 0
+                    last_sync = now
+                if now - last_save >= INDEX_SAVE_INTERVAL:
+                    self._save_indexes()
+                    last_save = now
+            except Exception:
+                log.exception("Journal write failed")
+        if self._file:
+            try:
+                self._sync()
+            except OSError:
+                log.exception("Journal fsync failed")
+            self._file.close()
+            self._file = None
+        self._save_indexes()
+
+    def _append(self, batch):
+        written = []
+        for record in batch:
+            day = day_of(record["t"])
+            if day != self._file_day:
+                if written:
+                    self._file.flush()
+                    self._index_written(written)
+                    written = []
+                self._open_day(day)
+            line = (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+            written.append((day, record, self._file.tell(), len(line)))
+            self._file.write(line)
+        self._file.flush()
+        # Only index lines that are in the file, so search() can read them
+        self._index_written(written)
+        self.written += len(batch)
+
+    def _index_written(self, written):
+        with self._lock:
+            for day, record, offset, length in written:
+                index = self._index(day)
+                # An index loaded from disk has already seen anything before offset
+                if offset >= index.indexed_bytes:
+                    index.add(record, offset)
+                    index.indexed_bytes = offset + length
+                if self._vocab is not None:
+                    for token in tokenize(record["text"]):
+                        self._vocab.setdefault(token, set()).add(day)
+                    self._vocab_days[day] = index.indexed_bytes
+                    self._vocab_dirty = True
+
+    def _save_indexes(self):
+        with self._lock:
+            for index in self._indexes.values():
+                index.save()
+            self._save_vocabulary()
+
+    def _vocab_path(self):
+        return os.path.join(self.directory, 'vocab.json')
+
+    def _vocabulary(self):
+        """token -> days; days whose journal grew since the last save are merged in"""
+        if self._vocab is None:
+            self._vocab = {}
+            try:
+                with open(self._vocab_path(), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == INDEX_VERSION:
+                    self._vocab = {token: set(days) for token, days in data["tokens"].items()}
+                    self._vocab_days = data["days"]
+            except (OSError, ValueError, KeyError):
+                self._vocab_days = {}
+            for day in self.days():
+                try:
+                    size = os.path.getsize(self._path(day))
+                except OSError:
+                    continue
+                if self._vocab_days.get(day) != size:
+                    index = self._index(day)
+                    for token in index.postings:
+                        self._vocab.setdefault(token, set()).add(day)
+                    self._vocab_days[day] = index.indexed_bytes
+                    self._vocab_dirty = True
+        return self._vocab
+
+    def _save_vocabulary(self):
+        if not self._vocab_dirty or self._vocab is None:
+            return
+        data = {
+            "version": INDEX_VERSION,
+            "days": self._vocab_days,
+            "tokens": {token: sorted(days) for token, days in self._vocab.items()},
+        }
+        tmp = self._vocab_path() + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp, self._vocab_path())
+            self._vocab_dirty = False
+        except OSError as e:
+            log.warning(f"Could not save journal vocabulary: {e}")
+
+    def _candidate_days(self, tokens):
+        """Days that contain every token, or None when any day can match"""
+        if not tokens:
+            return None
+        vocab = self._vocabulary()
+        days = None
+        for token in tokens:
+            if token.endswith('*'):
+                prefix = token[:-1]
+                found = set()
+                for word, word_days in vocab.items():
+                    if word.startswith(prefix):
+                        found |= word_days
+            else:
+                found = vocab.get(token, set())
+            days = found if days is None else days & found
+            if not days:
+                break
+        return days
+
+    def days(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted(n[:-len('.jsonl')] for n in names if n.endswith('.jsonl'))
+
+    def search(self, query="", start=None, end=None, limit=50):
+        """Newest records matching every word of query (word* for a prefix) in [start, end]"""
+        tokens = tokenize(query)
+        first = day_of(start) if start is not None else None
+        last = day_of(end) if end is not None else None
+        with self._lock:
+            candidates = self._candidate_days(tokens)
+        results = []
+        for day in reversed(self.days()):
+            if (first and day < first) or (last and day > last):
+                continue
+            if candidates is not None and day not in candidates:
+                continue
+            with self._lock:
+                offsets = self._index(day).find(tokens, start, end)
+            if not offsets:
+                continue
+            with open(self._path(day), 'rb') as f:
+                for offset in reversed(offsets):
+                    f.seek(offset)
+                    results.append(json.loads(f.readline()))
+                    if len(results) >= limit:
+                        return results
+        return results
+
+
+class JournalSink(ResultSink):
+    """Engine sink that appends every final result to a SessionJournal"""
+
+    def __init__(self, journal, model=None):
+        self.journal = journal
+        self.model = model  # Name recorded with each entry; update it on model switches
+
+    def on_final(self, text, result):
+        self.journal.append(text, result, self.model)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search the transcript journal")
+    parser.add_argument("query", nargs="?", default="", help="Words that must all appear; word* matches a prefix")
+    parser.add_argument("--since", help="First day, YYYY-MM-DD")
+    parser.add_argument("--until", help="Last day, YYYY-MM-DD")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--dir", default=JOURNAL_DIR)
+    args = parser.parse_args(argv)
+
+    journal = SessionJournal(args.dir)
+    start = parse_day(args.since) if args.since else None
+    end = parse_day(args.until) + 86400 if args.until else None
+    t0 = time.perf_counter()
+    results = journal.search(args.query, start, end, args.limit)
+    elapsed = (time.perf_counter() - t0) * 1000
+    for record in results:
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record["t"]))
+        print(f"{stamp}  {record['text']}")
+    print(f"{len(results)} results in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""Streaming key-phrase spotting.
+
+KeyPhraseSpotter runs a second KaldiRecognizer on the same audio as the
+main engine. Its grammar holds only the key phrases plus [unk], so it is
+cheap to decode. It reacts to partial results, so a phrase fires while
+the speaker is still finishing it, not after the utterance is endpointed.
+
+PhraseMatcher finds the phrases in recognized text. The phrases are
+compiled into a word-level Aho-Corasick automaton, so one pass over the
+utterance finds every phrase whatever their number. Matching is exact
+by default, since a false match presses Enter in the target window.
+Phrases written with a trailing FUZZY_MARK opt in to tolerating
+misrecognized words: a word within max_edits of a phrase word is mapped
+to it first, through a deletion index whose lookup cost does not grow
+with the phrase list either, and a match still needs most of the
+phrase's words to be exact.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from audio_buffer import AudioRingBuffer
+from metrics import REGISTRY
+from resample import Resampler
+
+log = logging.getLogger(__name__)
+
+SPOTTER_CHUNK_MS = 100  # Small chunks keep detection latency low; the grammar makes them cheap
+SPOTTER_RING_SECONDS = 10
+
+CHUNK_DECODE_MS = REGISTRY.histogram("key_phrase_chunk_ms", "Spotter decode and phrase check per chunk")
+MATCH_MS = REGISTRY.histogram("key_phrase_match_ms", "Searching recognized text for key phrases")
+DEFAULT_MAX_EDITS = 0  # Character edits tolerated per word of fuzzy phrases, e.g. 1 for "talkin" as "talking"
+MIN_FUZZY_LENGTH = 4  # Shorter words ("it", "i'm") must match exactly
+FUZZY_MARK = "~"  # "i'm done talking~" opts that phrase in to fuzzy matching
+
+PUNCTUATION = ".,!?;:\"()[]"
+
+PhraseMatch = namedtuple("PhraseMatch", "phrase start end")  # Word span [start, end)
+
+
+def tokenize(text):
+    """Lowercase words with surrounding punctuation removed"""
+    words = (w.strip(PUNCTUATION) for w in text.lower().split())
+    return [w for w in words if w]
+
+
+def normalize_phrase(phrase):
+    return " ".join(tokenize(phrase))
+
+
+def _deletions(word, edits):
+    """word and every variant of it with up to edits characters deleted"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(edits):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance, or limit + 1 once it is known to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+class PhraseMatcher:
+    """Word-level Aho-Corasick automaton over the key phrases
+
+    search() scans the utterance once; the automaton state is advanced
+    per word with goto/fail links, so the cost is linear in the utterance
+    length and independent of how many phrases are registered. Words are
+    only resolved fuzzily for phrases marked with FUZZY_MARK, and only
+    when more than half of that phrase's words were recognized exactly.
+    """
+
+    def __init__(self, phrases=(), max_edits=DEFAULT_MAX_EDITS, min_fuzzy_length=MIN_FUZZY_LENGTH):
+        self.max_edits = max_edits
+        self.min_fuzzy_length = min_fuzzy_length
+        self.set_phrases(phrases)
+
+    def set_phrases(self, phrases):
+        normalized = {}
+        for p in phrases:
+            p = p.strip()
+            phrase = normalize_phrase(p.rstrip(FUZZY_MARK))
+            if phrase:
+                normalized[phrase] = normalized.get(phrase, False) or p.endswith(FUZZY_MARK)
+        self.phrases = sorted(normalized)
+        self.fuzzy = {p for p, fuzzy in normalized.items() if fuzzy}
+        # Node 0 is the root; goto[n] maps a word to the next node
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [None]  # Longest phrase ending at the node, as (phrase, word count)
+        for phrase in self.phrases:
+            words = phrase.split()
+            node = 0
+            for word in words:
+                nxt = self._goto[node].get(word)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][word] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(None)
+                node = nxt
+            self._output[node] = (phrase, len(words))
+        # Breadth-first fail links; a node inherits the output of its fail node
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(word, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                if self._output[nxt] is None:
+                    self._output[nxt] = self._output[self._fail[nxt]]
+        self._build_fuzzy_index()
+
+    def _build_fuzzy_index(self):
+        """Map deletion variants of each fuzzy phrase word back to the word"""
+        self._vocab = {w for p in self.phrases for w in p.split()}
+        self._variants = {}
+        self._resolved = {}  # Cache of utterance word -> phrase word (or None)
+        if not self.max_edits:
+            return
+        for word in {w for p in self.fuzzy for w in p.split()}:
+            if len(word) < self.min_fuzzy_length:
+                continue
+            for variant in _deletions(word, self.max_edits):
+                self._variants.setdefault(variant, set()).add(word)
+
+    def _resolve(self, word):
+        """The phrase word this utterance word stands for, if any"""
+        if word in self._vocab:
+            return word
+        if not self._variants or len(word) < self.min_fuzzy_length:
+            return None
+        if word in self._resolved:
+            return self._resolved[word]
+        best = None
+        best_distance = self.max_edits + 1
+        candidates = set()
+        for variant in _deletions(word, self.max_edits):
+            candidates |= self._variants.get(variant, set())
+        for candidate in sorted(candidates):
+            distance = _edit_distance(word, candidate, self.max_edits)
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+        self._resolved[word] = best
+        return best
+
+    def _step(self, node, word):
+        while node and word not in self._goto[node]:
+            node = self._fail[node]
+        return self._goto[node].get(word, 0)
+
+    def search(self, text, at_end=False):
+        """First (or, with at_end, final) phrase in text as a PhraseMatch, or None"""
+        started = time.perf_counter()
+        match = self._search(tokenize(text), at_end)
+        MATCH_MS.since(started)
+        return match
+
+    def _search(self, words, at_end):
+        node = 0
+        for i, word in enumerate(words):
+            resolved = self._resolve(word)
+            node = self._step(node, resolved) if resolved else 0
+            if not at_end:
+                output = self._accepted(node, words, i + 1)
+                if output:
+                    return PhraseMatch(output[0], i + 1 - output[1], i + 1)
+        if at_end:
+            output = self._accepted(node, words, len(words))
+            if output:
+                return PhraseMatch(output[0], len(words) - output[1], len(words))
+        return None
+
+    def _accepted(self, node, words, end):
+        """Longest phrase ending at node that words[:end] really match, as (phrase, word count)"""
+        seen = None
+        while node:
+            output = self._output[node]
+            if output is None:
+                break  # Outputs are inherited along fail links, so none are left
+            if output != seen:
+                seen = output
+                phrase, length = output
+                exact = sum(w == p for w, p in zip(words[end - length:end], phrase.split()))
+                if exact == length or (phrase in self.fuzzy and exact * 2 > length):
+                    return output
+            node = self._fail[node]
+        return None
+
+    def remove(self, text, at_end=False):
+        """(text without the matched phrase, phrase); phrase is None when nothing matched"""
+        match = self.search(text, at_end)
+        if not match:
+            return text, None
+        # Same word positions as tokenize(), but with the original spelling
+        words = [w for w in text.split() if w.strip(PUNCTUATION)]
+        return " ".join(words[:match.start] + words[match.end:]), match.phrase
+
+
+class KeyPhraseSpotter:
+    """Watch a grammar-constrained recognizer's partials for key phrases
+
+    feed() is called from the audio callback and only writes to a ring
+    buffer; decoding happens on the spotter's own thread. on_detect(phrase,
+    latency, spoken_at) runs on that thread: spoken_at is the
+    time.perf_counter() time the end of the phrase was captured and latency
+    the seconds from then to its detection.
+    """
+
+    def __init__(self, model, phrases, sample_rate=16000, on_detect=None,
+                 cooldown=0.5, chunk_ms=SPOTTER_CHUNK_MS, at_end=False, model_rate=None):
+        self.model = model
+        self.sample_rate = sample_rate
+        self.model_rate = model_rate or sample_rate
+        # Fed audio is at sample_rate; the recognizer gets the model's own rate
+        self._resampler = Resampler(sample_rate, self.model_rate) if self.model_rate != sample_rate else None
+        self.on_detect = on_detect
+        self.cooldown = cooldown  # Minimum seconds between two detections
+        self.chunk = sample_rate * chunk_ms // 1000
+        self.ring = AudioRingBuffer(sample_rate * SPOTTER_RING_SECONDS)
+        self.at_end = at_end  # Only fire when the recognized text ends with the phrase
+        self.matcher = PhraseMatcher(max_edits=0)  # The grammar only yields exact phrase words
+        self.phrases = []
+        self.latencies = []
+        self.detections = 0
+        self._rec = None
+        self._grammar_changed = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._fed = 0  # Samples written by feed()
+        self._fed_time = 0.0  # perf_counter capture time of the end of the fed audio
+        self._decoded = 0  # Samples passed to the recognizer
+        self._rec_start = 0  # Sample position where the current recognizer started
+        self._last_detect = 0.0
+        self.set_phrases(phrases)
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def set_phrases(self, phrases):
+        """Replace the phrase list; the grammar is rebuilt on the spotter thread"""
+        self.matcher.set_phrases(phrases)
+        self.phrases = self.matcher.phrases
+        self._grammar_changed.set()
+
+    def grammar(self):
+        return json.dumps(self.phrases + ["[unk]"], ensure_ascii=False)
+
+    def _new_recognizer(self):
+        import vosk  # Only the spotter needs it; tokenize() and PhraseMatcher work without vosk
+        rec = vosk.KaldiRecognizer(self.model, self.model_rate, self.grammar())
+        try:
+            rec.SetPartialWords(True)  # Word end times give the true detection latency
+        except AttributeError:
+            pass  # Older vosk: latency falls back to chunk boundaries
+        self._rec_start = self._decoded
+        return rec
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop.clear()
+        self.ring.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def feed(self, samples, captured=None):
+        """Audio callback entry point: buffer int16 samples for the spotter thread
+
+        captured is when the first of the samples was captured (perf_counter);
+        without it they are taken to end now.
+        """
+        self.ring.write(samples)
+        self._fed += len(samples)
+        if captured is None:
+            self._fed_time = time.perf_counter()
+        else:
+            self._fed_time = captured + len(samples) / self.sample_rate
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                if self._rec is None or self._grammar_changed.is_set():
+                    self._grammar_changed.clear()
+                    self._rec = self._new_recognizer()
+                if not self.ring.wait(self.chunk, timeout=0.2):
+                    continue
+                data = self.ring.read(self.chunk)
+                started = time.perf_counter()
+                self._decoded += len(data) // 2
+                if self._resampler:
+                    data = self._resampler.process(data).tobytes()
+                if self._rec.AcceptWaveform(data):
+                    result = json.loads(self._rec.Result())
+                    self._check(result.get("text", ""), result.get("result"))
+                else:
+                    result = json.loads(self._rec.PartialResult())
+                    self._check(result.get("partial", ""), result.get("partial_result"))
+                CHUNK_DECODE_MS.since(started)
+        except Exception:
+            log.exception("Key phrase spotter failed")
+
+    def match(self, text):
+        """Key phrase found in text, or None"""
+        match = self.matcher.search(text, self.at_end)
+        return match.phrase if match else None
+
+    def _check(self, text, words):
+        if not text:
+            return
+        phrase = self.match(text)
+        if not phrase:
+            return
+        now = time.perf_counter()
+        # Restart so the same words in the continuing partial don't fire again
+        self._rec.Reset()
+        if now - self._last_detect < self.cooldown:
+            return
+        self._last_detect = now
+        spoken_at = self._spoken_at(phrase, words)
+        latency = max(0.0, now - spoken_at)
+        self.latencies.append(latency)
+        self.detections += 1
+        log.debug(f"Key phrase spotted: '{phrase}' ({latency * 1000:.0f} ms after it was spoken)")
+        if self.on_detect:
+            self.on_detect(phrase, latency, spoken_at)
+
+    def _spoken_at(self, phrase, words):
+        """Capture time (perf_counter) of the end of the phrase"""
+        end_pos = self._decoded
+        if words:
+            last = phrase.split()[-1]
+            ends = [w["end"] for w in words if w.get("word") == last]
+            if ends:
+                end_pos = self._rec_start + int(ends[-1] * self.sample_rate)
+        # Counted back from the capture time of the newest fed sample
+        return self._fed_time - (self._fed - end_pos) / self.sample_rate
+
+    def latency_stats(self):
+        if not self.latencies:
+            return {"detections": 0}
+        lat = np.array(self.latencies) * 1000
+        return {
+            "detections": self.detections,
+            "p50_ms": round(float(np.percentile(lat, 50)), 1),
+            "p95_ms": round(float(np.percentile(lat, 95)), 1),
+            "max_ms": round(float(lat.max()), 1),
+        }
@@ -0,0 +1,207 @@
+"""Asynchronous logging with rate limiting and repeat collapsing.
+
+Logging calls only do a dictionary lookup and a queue put on the calling
+thread; formatting, file writes and UI updates happen on a background
+writer. A message repeated more than RATE_BURST times within RATE_WINDOW
+seconds is counted instead of logged, and one "(repeated N times)" line
+is written when the window closes. The log file rotates by size.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+MAX_LOG_BYTES = 1024 * 1024
+LOG_BACKUPS = 3  # speech_debug.log.1 ... .3
+QUEUE_SIZE = 10000  # Records beyond this are dropped rather than blocking the caller
+RATE_WINDOW = 10.0  # Seconds
+RATE_BURST = 5  # Identical messages let through per window
+FLUSH_INTERVAL = 1.0  # How often the writer reports collapsed repeats
+
+
+class DedupQueueHandler(logging.Handler):
+    """Rate-limit identical records and hand the rest to a queue"""
+
+    def __init__(self, records, window=RATE_WINDOW, burst=RATE_BURST):
+        super().__init__()
+        self.records = records
+        self.window = window
+        self.burst = burst
+        self.dropped = 0  # Records lost to a full queue
+        self.suppressed = 0  # Records collapsed into "repeated" summaries
+        self._seen = {}  # key -> [window start, count, suppressed, sample record]
+        self._seen_lock = threading.Lock()
+
+    @staticmethod
+    def _key(record):
+        exc_type = record.exc_info[0] if record.exc_info else None
+        return record.levelno, record.name, str(record.msg), exc_type
+
+    def emit(self, record):
+        key = self._key(record)
+        now = time.monotonic()
+        summary = None
+        with self._seen_lock:
+            entry = self._seen.get(key)
+            if entry is not None and now - entry[0] < self.window:
+                entry[1] += 1
+                if entry[1] > self.burst:
+                    entry[2] += 1
+                    self.suppressed += 1
+                    return
+            else:
+                if entry is not None and entry[2]:
+                    summary = self._summary(entry)
+                self._seen[key] = [now, 1, 0, record]
+        if summary:
+            self._put(summary)
+        self._put(self._prepare(record))
+
+    def _prepare(self, record):
+        # Resolve the message and traceback now; args may change after the call
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def _summary(self, entry):
+        sample = entry[3]
+        return logging.makeLogRecord({
+            "name": sample.name,
+            "levelno": sample.levelno,
+            "levelname": sample.levelname,
+            "msg": f"{sample.getMessage()} (repeated {entry[2]} times)",
+        })
+
+    def _put(self, record):
+        try:
+            self.records.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush_repeats(self, force=False):
+        """Queue summaries for windows that have closed (or all, with force) and forget them"""
+        now = time.monotonic()
+        summaries = []
+        with self._seen_lock:
+            for key, entry in list(self._seen.items()):
+                if force or now - entry[0] >= self.window:
+                    if entry[2]:
+                        summaries.append(self._summary(entry))
+                    del self._seen[key]
+        for summary in summaries:
+            self._put(summary)
+
+
+class CallbackHandler(logging.Handler):
+    """Pass formatted lines to a callable, e.g. a debug window"""
+
+    def __init__(self, callback):
+        super().__init__()
+        self.callback = callback
+
+    def emit(self, record):
+        try:
+            self.callback(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+class LogPipeline:
+    """Route the root logger through a DedupQueueHandler and a writer thread"""
+
+    def __init__(self, path, level=logging.DEBUG, max_bytes=MAX_LOG_BYTES, backups=LOG_BACKUPS):
+        self.records = queue.Queue(QUEUE_SIZE)
+        self.queue_handler = DedupQueueHandler(self.records)
+        formatter = logging.Formatter(LOG_FORMAT)
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8'
+        )
+        console = logging.StreamHandler()
+        self.handlers = [file_handler, console]
+        for handler in self.handlers:
+            handler.setFormatter(formatter)
+        self.level = level
+        self._thread = None
+
+    def start(self):
+        root = logging.getLogger()
+        root.addHandler(self.queue_handler)
+        root.setLevel(self.level)
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=2.0):
+        """Detach from the root logger and drain what is queued"""
+        if not self._thread:
+            return
+        logging.getLogger().removeHandler(self.queue_handler)
+        self.queue_handler.flush_repeats(force=True)
+        try:
+            self.records.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+        for handler in self.handlers:
+            handler.close()
+
+    def add_sink(self, callback, level=logging.NOTSET):
+        """Also send formatted lines to callback (called on the writer thread)"""
+        handler = CallbackHandler(callback)
+        handler.setLevel(level)
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s', '%H:%M:%S'))
+        self.handlers.append(handler)
+        return handler
+
+    def set_level(self, level):
+        """Change the level at runtime; filtered calls cost one comparison"""
+        if isinstance(level, str):
+            level = logging.getLevelName(level.upper())
+        self.level = level
+        logging.getLogger().setLevel(level)
+
+    def stats(self):
+        return {
+            "queued": self.records.qsize(),
+            "dropped": self.queue_handler.dropped,
+            "suppressed": self.queue_handler.suppressed,
+        }
+
+    def _write(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                record = self.records.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                record = False
+            if record is None:
+                break
+            if record:
+                self._dispatch(record)
+            if time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                last_flush = time.monotonic()
+                self.queue_handler.flush_repeats()
+        # Write out anything still queued behind the sentinel
+        while True:
+            try:
+                record = self.records.get_nowait()
+            except queue.Empty:
+                break
+            if record:
+                self._dispatch(record)
+
+    def _dispatch(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                try:
+                    handler.handle(record)
+                except Exception:
+                    pass  # A broken sink must not stop the writer
@@ -0,0 +1,371 @@
+"""In-process metrics and an on-demand sampling profiler.
+
+Hot stages record into a MetricsRegistry: counters, gauges and
+histograms with fixed millisecond buckets, so recording is a bisect and
+a few additions under an uncontended lock (well under a microsecond).
+REGISTRY is the shared instance the engine, capture, spotter and
+delivery code record into. MetricsWriter snapshots it periodically to
+JSON and to Prometheus text format (for a textfile scraper), written
+atomically so readers never see half a file.
+
+SamplingProfiler walks every thread's stack a few hundred times a second
+from a background thread and counts where time goes; nothing is added to
+the profiled code paths, and it only runs while switched on.
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Tally, deque
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is open-ended
+DEFAULT_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+FLUSH_INTERVAL = 10.0  # Seconds between metrics file writes
+PROFILE_INTERVAL = 0.005  # Seconds between stack samples
+LATENCY_WINDOW = 1000  # Most recent latencies per key kept for exact percentiles
+
+
+class Counter:
+    """Monotonic count of events"""
+    kind = "counter"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return {"value": self.value}
+
+
+class Gauge:
+    """Last value of something that goes up and down, plus its maximum"""
+    kind = "gauge"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.max = 0
+
+    def set(self, value):
+        self.value = value
+        if value > self.max:
+            self.max = value
+
+    def snapshot(self):
+        return {"value": self.value, "max": self.max}
+
+
+class Timer:
+    """Context manager that observes its duration into a histogram"""
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe((time.perf_counter() - self.started) * 1000)
+
+
+class Histogram:
+    """Distribution of durations (or any values) over fixed buckets"""
+    kind = "histogram"
+
+    def __init__(self, name, help="", buckets=DEFAULT_BUCKETS_MS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def time(self):
+        return Timer(self)
+
+    def since(self, started):
+        """Observe the milliseconds since a perf_counter() reading"""
+        self.observe((time.perf_counter() - started) * 1000)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th value, capped at the largest value seen"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "mean": round(self.sum / self.count, 3) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 3),
+            "p95": round(self.quantile(0.95), 3),
+            "p99": round(self.quantile(0.99), 3),
+            "max": round(self.max, 3),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+class MetricsRegistry:
+    """Named metrics, created on first use"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.get(name)
+                if metric is None:
+                    metric = self.metrics[name] = cls(name, help, **kwargs)
+        if not isinstance(metric, cls):
+            raise TypeError(f"Metric {name} is a {metric.kind}, not a {cls.kind}")
+        return metric
+
+    def counter(self, name, help=""):
+        return self._get(Counter, name, help)
+
+    def gauge(self, name, help=""):
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS_MS):
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def snapshot(self):
+        with self._lock:
+            metrics = sorted(self.metrics.items())
+        return {
+            "time": round(time.time(), 3),
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "metrics": {name: dict(metric.snapshot(), kind=metric.kind) for name, metric in metrics},
+        }
+
+    def summary(self):
+        """Human-readable lines, one per metric"""
+        lines = []
+        for name, m in self.snapshot()["metrics"].items():
+            if m["kind"] == "counter":
+                lines.append(f"{name:28} {m['value']}")
+            elif m["kind"] == "gauge":
+                lines.append(f"{name:28} {m['value']:g} (max {m['max']:g})")
+            else:
+                lines.append(f"{name:28} n={m['count']} p50={m['p50']:g} p95={m['p95']:g} "
+                             f"p99={m['p99']:g} max={m['max']:g} ms")
+        return lines
+
+    def prometheus(self, prefix="vosk_stt_"):
+        """The snapshot in Prometheus text exposition format"""
+        out = []
+        with self._lock:
+            metrics = sorted(self.metrics.items())
+        for name, metric in metrics:
+            full = prefix + name
+            if metric.help:
+                out.append(f"# HELP {full} {metric.help}")
+            out.append(f"# TYPE {full} {metric.kind}")
+            if metric.kind == "histogram":
+                cumulative = 0
+                for bound, n in zip(list(metric.buckets) + ["+Inf"], metric.counts):
+                    cumulative += n
+                    out.append(f'{full}_bucket{{le="{bound}"}} {cumulative}')
+                out.append(f"{full}_sum {metric.sum:.3f}")
+                out.append(f"{full}_count {metric.count}")
+            else:
+                out.append(f"{full} {metric.value}")
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class LatencyStats:
+    """Recent latencies per key (e.g. delivery mode) with exact percentiles
+
+    Every value also goes into the registry histogram <prefix>_<key>_ms,
+    so it shows up in the Debug window and the metrics files.
+    """
+
+    def __init__(self, prefix, registry=None, window=LATENCY_WINDOW):
+        self.prefix = prefix
+        self.registry = registry or REGISTRY
+        self.window = window
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds):
+        with self._lock:
+            values = self.values.get(key)
+            if values is None:
+                values = self.values[key] = deque(maxlen=self.window)
+            values.append(seconds)
+        self.registry.histogram(f"{self.prefix}_{key}_ms").observe(seconds * 1000)
+
+    def report(self):
+        """{key: {n, p50_ms, p95_ms, p99_ms, max_ms}} over the recent window"""
+        with self._lock:
+            snapshot = {key: np.array(values) * 1000 for key, values in self.values.items() if values}
+        return {
+            key: {
+                "n": len(lat),
+                "p50_ms": round(float(np.percentile(lat, 50)), 1),
+                "p95_ms": round(float(np.percentile(lat, 95)), 1),
+                "p99_ms": round(float(np.percentile(lat, 99)), 1),
+                "max_ms": round(float(lat.max()), 1),
+            }
+            for key, lat in sorted(snapshot.items())
+        }
+
+
+def _write_atomic(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class MetricsWriter:
+    """Write the registry to <base>.json and <base>.prom every interval seconds"""
+
+    def __init__(self, registry, base_path, interval=FLUSH_INTERVAL):
+        self.registry = registry
+        self.base_path = base_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join(2.0)
+        self._thread = None
+        self.write()
+
+    def write(self):
+        try:
+            _write_atomic(self.base_path + ".json", json.dumps(self.registry.snapshot(), indent=1))
+            _write_atomic(self.base_path + ".prom", self.registry.prometheus())
+        except OSError as e:
+            log.warning(f"Could not write metrics: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+
+class SamplingProfiler:
+    """Sample all threads' Python stacks on a timer while running
+
+    Each sample counts the innermost frame of every thread (self time) and
+    every distinct function on its stack (inclusive time). The profiler's
+    own thread is left out.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.self_counts = _Tally()
+        self.total_counts = _Tally()
+        self.started = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self.samples = 0
+        self.self_counts.clear()
+        self.total_counts.clear()
+        self._stop.clear()
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join(2.0)
+        self._thread = None
+        self.elapsed = time.perf_counter() - self.started
+
+    @staticmethod
+    def _label(code):
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                self.self_counts[self._label(frame.f_code)] += 1
+                seen = set()
+                while frame is not None:
+                    label = self._label(frame.f_code)
+                    if label not in seen:
+                        seen.add(label)
+                        self.total_counts[label] += 1
+                    frame = frame.f_back
+            self.samples += 1
+
+    def report(self, top=20):
+        """Top functions by self and inclusive samples, as text"""
+        lines = [f"{self.samples} samples over {self.elapsed:.1f}s ({self.interval * 1000:g} ms interval)",
+                 "", "Self:"]
+        for label, n in self.self_counts.most_common(top):
+            lines.append(f"{n:8} {n / max(1, self.samples):7.1%}  {label}")
+        lines += ["", "Inclusive:"]
+        for label, n in self.total_counts.most_common(top):
+            lines.append(f"{n:8} {n / max(1, self.samples):7.1%}  {label}")
+        return "\n".join(lines)
@@ -0,0 +1,226 @@
+"""Cached index of the models in the models/ folder.
+
+Scanning a model (os.walk for its size, reading its conf files) is only
+done when the model is new or its folder mtime changed; everything else
+comes from a JSON file persisted next to this script. ModelWatcher polls
+the folder in the background so dropped-in models show up on their own.
+"""
+import json
+import logging
+import os
+import re
+import threading
+
+log = logging.getLogger(__name__)
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+MODELS_PATH = os.path.abspath(os.path.join(BASE_PATH, '..', 'models'))
+INDEX_FILE = os.path.join(BASE_PATH, 'model_index.json')
+INDEX_VERSION = 1
+
+# Folders whose mtime is folded into a model's signature
+MODEL_SUBDIRS = ('am', 'conf', 'graph', 'ivector')
+# Name tokens that describe the model flavour rather than its language
+NAME_NOISE = {'vosk', 'model', 'small', 'big', 'large'}
+SAMPLE_RATE_RE = re.compile(r'--sample-frequency=(\d+)')
+
+
+def calculate_folder_size(folder_path):
+    total_size = 0
+    for root, dirs, files in os.walk(folder_path):
+        for f in files:
+            fp = os.path.join(root, f)
+            if os.path.isfile(fp):
+                total_size += os.path.getsize(fp)
+    return total_size
+
+
+def guess_language(name):
+    """'vosk-model-small-en-us-0.15' -> 'en-us', '' when it can't be told"""
+    tokens = [t for t in name.lower().split('-') if t not in NAME_NOISE]
+    lang = []
+    for token in tokens:
+        if not (token.isalpha() and 2 <= len(token) <= 3):
+            break
+        lang.append(token)
+    return '-'.join(lang)
+
+
+def read_sample_rate(model_path):
+    """Sample rate declared in conf/model.conf or conf/mfcc.conf, or None"""
+    for conf in ('model.conf', 'mfcc.conf'):
+        try:
+            with open(os.path.join(model_path, 'conf', conf), encoding='utf-8') as f:
+                match = SAMPLE_RATE_RE.search(f.read())
+        except OSError:
+            continue
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def model_signature(model_path):
+    """Newest mtime of the model folder and its well-known subfolders"""
+    mtime = os.stat(model_path).st_mtime
+    for sub in MODEL_SUBDIRS:
+        try:
+            mtime = max(mtime, os.stat(os.path.join(model_path, sub)).st_mtime)
+        except OSError:
+            pass
+    return mtime
+
+
+def scan_model(model_path):
+    """Build a fresh index entry for one model folder"""
+    name = os.path.basename(model_path)
+    has_graph = os.path.isdir(os.path.join(model_path, 'graph'))
+    has_ivector = os.path.isdir(os.path.join(model_path, 'ivector'))
+    has_conf = os.path.isdir(os.path.join(model_path, 'conf'))
+    return {
+        "name": name,
+        "path": model_path,
+        "size": calculate_folder_size(model_path),
+        "language": guess_language(name),
+        "sample_rate": read_sample_rate(model_path),
+        "has_graph": has_graph,
+        "has_ivector": has_ivector,
+        "valid": has_conf and has_graph,
+        "mtime": model_signature(model_path),
+    }
+
+
+class ModelIndex:
+    """Model metadata keyed by folder name, persisted to disk"""
+
+    def __init__(self, models_path=MODELS_PATH, index_file=INDEX_FILE):
+        self.models_path = models_path
+        self.index_file = index_file
+        self.models = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_file, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION and data.get("models_path") == self.models_path:
+            self.models = data.get("models", {})
+
+    def save(self):
+        data = {"version": INDEX_VERSION, "models_path": self.models_path, "models": self.models}
+        tmp = self.index_file + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp, self.index_file)
+        except OSError as e:
+            log.warning(f"Could not save model index: {e}")
+
+    def refresh(self):
+        """Rescan only new or modified models; return True if anything changed"""
+        with self._lock:
+            if not os.path.isdir(self.models_path):
+                changed = bool(self.models)
+                self.models = {}
+            else:
+                changed = False
+                current = {}
+                for name in os.listdir(self.models_path):
+                    path = os.path.join(self.models_path, name)
+                    if not os.path.isdir(path):
+                        continue
+                    entry = self.models.get(name)
+                    try:
+                        if entry is None or entry["mtime"] != model_signature(path):
+                            entry = scan_model(path)
+                            changed = True
+                            log.debug(f"Indexed model {name} ({entry['size']} bytes)")
+                    except OSError:
+                        continue  # Removed while we were looking
+                    current[name] = entry
+                if set(current) != set(self.models):
+                    changed = True
+                self.models = current
+            if changed:
+                self.save()
+            return changed
+
+    def entries(self, valid_only=False):
+        with self._lock:
+            entries = sorted(self.models.values(), key=lambda e: e["name"])
+        if valid_only:
+            entries = [e for e in entries if e["valid"]]
+        return entries
+
+    def paths(self):
+        return [e["path"] for e in self.entries()]
+
+    def get(self, path):
+        """Entry for a model path, or None"""
+        with self._lock:
+            return self.models.get(os.path.basename(os.path.normpath(path)))
+
+    def smallest(self):
+        """Path of the smallest valid model (any model if none look valid)"""
+        entries = self.entries(valid_only=True) or self.entries()
+        if not entries:
+            return None
+        return min(entries, key=lambda e: e["size"])["path"]
+
+    def smallest_per_language(self):
+        """{language: path of its smallest valid model}, for models whose language is known"""
+        best = {}
+        for entry in self.entries(valid_only=True):
+            lang = entry["language"]
+            if lang and (lang not in best or entry["size"] < best[lang]["size"]):
+                best[lang] = entry
+        return {lang: entry["path"] for lang, entry in best.items()}
+
+    def faster_model(self, path):
+        """Smallest valid model in path's language that is smaller than it, or None"""
+        current = self.get(path)
+        if not current:
+            return None
+        smaller = [e for e in self.entries(valid_only=True)
+                   if e["language"] == current["language"] and e["size"] < current["size"]]
+        return min(smaller, key=lambda e: e["size"])["path"] if smaller else None
+
+    def larger_model(self, path):
+        """Largest valid model in path's language that is larger than it, or None"""
+        current = self.get(path)
+        if not current:
+            return None
+        larger = [e for e in self.entries(valid_only=True)
+                  if e["language"] == current["language"] and e["size"] > current["size"]]
+        return max(larger, key=lambda e: e["size"])["path"] if larger else None
+
+
+class ModelWatcher:
+    """Poll the models folder and refresh the index when something changes"""
+
+    def __init__(self, index, interval=2.0, on_change=None):
+        self.index = index
+        self.interval = interval
+        self.on_change = on_change  # Called from the watcher thread
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if self.index.refresh() and self.on_change:
+                    self.on_change(self.index)
+            except Exception:
+                log.exception("Model watcher failed")
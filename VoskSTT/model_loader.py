@@ -0,0 +1,118 @@
+"""Background model loading with progress reporting.
+
+vosk.Model gives no progress of its own, so the loader first streams the
+model files through the OS page cache (which is where the time goes on a
+slow disk or network share) and reports real byte progress for that. The
+vosk.Model constructor then reads from cache. A short warm-up decode
+makes sure the first real utterance is not slower than the rest.
+"""
+import logging
+import os
+import threading
+
+import numpy as np
+import vosk
+
+from model_index import read_sample_rate
+
+log = logging.getLogger(__name__)
+
+PREREAD_CHUNK = 1024 * 1024
+PREREAD_SHARE = 0.7  # Part of the progress bar covered by the file pre-read
+WARMUP_SECONDS = 1.0
+
+
+def preread_model(path, on_progress=None):
+    """Read every model file once so vosk.Model loads from the page cache"""
+    files = []
+    for root, dirs, names in os.walk(path):
+        for name in names:
+            fp = os.path.join(root, name)
+            if os.path.isfile(fp):
+                files.append((fp, os.path.getsize(fp)))
+    total = sum(size for _, size in files) or 1
+    done = 0
+    reported = 0.0
+    for fp, _ in files:
+        with open(fp, 'rb') as f:
+            while True:
+                chunk = f.read(PREREAD_CHUNK)
+                if not chunk:
+                    break
+                done += len(chunk)
+                fraction = done / total
+                if on_progress and fraction - reported >= 0.02:
+                    reported = fraction
+                    on_progress(fraction, f"Reading model files ({done // (1024 * 1024)} MB)")
+
+
+def warm_up_model(model, sample_rate=16000, seconds=WARMUP_SECONDS):
+    """Decode a little low-level noise so lazy initialisation happens now"""
+    rng = np.random.default_rng(0)
+    noise = rng.normal(0, 30, int(sample_rate * seconds)).astype(np.int16).tobytes()
+    rec = vosk.KaldiRecognizer(model, sample_rate)
+    rec.AcceptWaveform(noise)
+    rec.FinalResult()
+
+
+class ModelLoader:
+    """Load models from a ModelPool on a worker thread
+
+    Callbacks run on the loader thread; GUI callers must marshal them back
+    to their own thread.
+    """
+
+    def __init__(self, pool, warmup=True, sample_rate=16000):
+        self.pool = pool
+        self.warmup = warmup
+        self.sample_rate = sample_rate
+        self._thread = None
+
+    @property
+    def is_loading(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def load(self, path, on_progress=None, on_done=None, on_error=None):
+        """Start loading path; on_done(path, model) or on_error(path, exc) follows
+
+        The model handed to on_done is leased from the pool; the caller
+        gives it back with pool.release(model) once it stops using it.
+
+        path may also be a function returning the path (None when there is
+        no model), which then runs on the loader thread too, e.g. to scan
+        the models folder first.
+        """
+        self._thread = threading.Thread(
+            target=self._load,
+            args=(path, on_progress or (lambda fraction, message: None), on_done, on_error),
+            daemon=True
+        )
+        self._thread.start()
+        return self._thread
+
+    def _load(self, path, on_progress, on_done, on_error):
+        try:
+            if callable(path):
+                on_progress(0.0, "Looking for models...")
+                path = path()
+                if not path:
+                    raise FileNotFoundError("No models found")
+            name = os.path.basename(path)
+            resident = self.pool.contains(path)
+            if resident:
+                on_progress(0.9, f"{name} already loaded")
+            else:
+                preread_model(path, lambda f, msg: on_progress(f * PREREAD_SHARE, msg))
+                on_progress(PREREAD_SHARE, f"Building {name}...")
+            model = self.pool.get(path, lease=True)
+            if self.warmup and not resident:
+                on_progress(0.9, "Warming up recognizer...")
+                warm_up_model(model, read_sample_rate(path) or self.sample_rate)
+            on_progress(1.0, "Ready")
+        except Exception as e:
+            log.exception(f"Failed to load model {path}")
+            if on_error:
+                on_error(None if callable(path) else path, e)
+            return
+        if on_done:
+            on_done(path, model)
@@ -0,0 +1,180 @@
+"""LRU pool of loaded vosk models.
+
+Keeps recently used vosk.Model instances resident under a memory budget so
+switching back to one only costs a new KaldiRecognizer. Model memory is
+estimated from the on-disk size of the model folder, which is close to
+what Kaldi maps in for the graph and acoustic model.
+
+A caller that keeps a model takes a lease (get(path, lease=True), or
+borrow() for a copy outside the LRU) and gives it back with release().
+Leased models are never evicted, and a leased model that was discarded,
+or never pooled, still counts against the budget until its last release.
+So free_bytes() is memory that is really free.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from model_index import calculate_folder_size
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BUDGET_BYTES = 2 * 1024 ** 3
+
+
+def load_vosk_model(path):
+    import vosk  # Only here, so a pool with another loader works without vosk
+    return vosk.Model(path)
+
+
+class ModelPool:
+    """Load-once cache of vosk.Model keyed by model path"""
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES, size_of=None, loader=load_vosk_model):
+        self.budget_bytes = budget_bytes
+        self.size_of = size_of or calculate_folder_size
+        self.loader = loader
+        self._models = OrderedDict()  # path -> (model, size), least recently used first
+        self._leases = {}  # id(model) -> [model, size, path, count], pooled or not
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def get(self, path, lease=False):
+        """Return the model for path, loading it on a miss
+
+        With lease=True the model stays resident and counted until release(model).
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._models:
+                self._models.move_to_end(path)
+                self.hits += 1
+                return self._lease(path) if lease else self._models[path][0]
+            self.misses += 1
+
+        # Load outside the lock so stats and hits stay responsive
+        started = time.perf_counter()
+        model = self.loader(path)
+        elapsed = time.perf_counter() - started
+        size = self.size_of(path)
+        log.debug(f"Loaded model {os.path.basename(path)} in {elapsed:.2f}s")
+
+        with self._lock:
+            self.load_seconds += elapsed
+            if path in self._models:  # Another thread loaded it meanwhile
+                self._models.move_to_end(path)
+                return self._lease(path) if lease else self._models[path][0]
+            self._models[path] = (model, size)
+            if lease:
+                self._lease(path)
+            self._evict(keep=path)
+        return model
+
+    def borrow(self, path):
+        """Leased model for path: the resident one, else a private copy the LRU never holds
+
+        For a second user that must not evict anything; the copy still
+        counts against the budget until it is released.
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._models:
+                return self._lease(path)
+        model = self.loader(path)
+        with self._lock:
+            self._leases[id(model)] = [model, self.size_of(path), path, 1]
+        return model
+
+    def release(self, model):
+        """Give back one lease on model; unknown models are ignored"""
+        with self._lock:
+            entry = self._leases.get(id(model))
+            if entry is None or entry[0] is not model:
+                return
+            entry[3] -= 1
+            if not entry[3]:
+                del self._leases[id(model)]
+                self._evict()
+
+    def _lease(self, path):
+        model, size = self._models[path]
+        entry = self._leases.setdefault(id(model), [model, size, path, 0])
+        entry[3] += 1
+        return model
+
+    def contains(self, path):
+        with self._lock:
+            return os.path.abspath(path) in self._models
+
+    def peek(self, path):
+        """The resident model for path, or None; neither loads nor counts as a use"""
+        with self._lock:
+            entry = self._models.get(os.path.abspath(path))
+            return entry[0] if entry else None
+
+    def free_bytes(self):
+        """Budget not taken by resident or leased models"""
+        with self._lock:
+            return self.budget_bytes - self._resident_bytes()
+
+    def fits(self, path):
+        """True when path is resident, or a copy of it fits next to everything else in use
+
+        Private copies of path itself don't count, so a borrower keeps
+        seeing room for the copy it already holds.
+        """
+        path = os.path.abspath(path)
+        size = self.size_of(path)
+        with self._lock:
+            if path in self._models:
+                return True
+            own = sum(entry[1] for entry in self._leases.values() if entry[2] == path)
+            return size <= self.budget_bytes - self._resident_bytes() + own
+
+    def discard(self, path):
+        """Drop a model from the pool; while leased it still counts as in use"""
+        with self._lock:
+            self._models.pop(os.path.abspath(path), None)
+
+    def set_budget(self, budget_bytes):
+        with self._lock:
+            self.budget_bytes = budget_bytes
+            self._evict()
+
+    def _evict(self, keep=None):
+        # Evicting a leased model would free nothing, so only idle ones go, oldest first
+        for path in list(self._models):
+            if self._resident_bytes() <= self.budget_bytes or len(self._models) <= 1:
+                break
+            model = self._models[path][0]
+            if path == keep or id(model) in self._leases:
+                continue
+            self._models.pop(path)
+            self.evictions += 1
+            log.debug(f"Evicted model {os.path.basename(path)} from pool")
+
+    def _resident_bytes(self):
+        """Bytes of pooled models plus leased ones that left (or never entered) the pool"""
+        pooled = {id(model) for model, _ in self._models.values()}
+        return (sum(size for _, size in self._models.values())
+                + sum(entry[1] for key, entry in self._leases.items() if key not in pooled))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "load_seconds": round(self.load_seconds, 3),
+                "resident_models": [os.path.basename(p) for p in self._models],
+                "resident_bytes": self._resident_bytes(),
+                "leased_models": sum(entry[3] for entry in self._leases.values()),
+                "budget_bytes": self.budget_bytes,
+            }
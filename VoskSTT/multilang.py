@@ -0,0 +1,216 @@
+"""Decode the same audio with several language models at once.
+
+A LanguageSet stands in for a single vosk.Model in RecognitionEngine:
+the engine asks it for a recognizer, and gets a MultiLanguageRecognizer
+that feeds every block to one KaldiRecognizer per language on a thread
+pool (vosk releases the GIL while decoding). When the leading language
+ends an utterance, every language finishes it too and the result with
+the highest mean word confidence is returned, tagged with its language.
+
+A language that loses SUSPEND_AFTER utterances in a row is suspended and
+gets no audio at all; every PROBE_EVERY utterances suspended languages
+decode one utterance again so a change of language is still picked up.
+CPU time is measured per language with time.thread_time(). Models
+trained at another rate than the audio get it resampled on their thread.
+"""
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import vosk
+
+from resample import Resampler
+
+log = logging.getLogger(__name__)
+
+SUSPEND_AFTER = 5  # Consecutive lost utterances before a language stops decoding
+PROBE_EVERY = 10  # Utterances between trial runs of suspended languages
+
+
+class Language:
+    """Per-language model, counters and suspension state"""
+
+    def __init__(self, name, model, sample_rate=None):
+        self.name = name
+        self.model = model
+        self.sample_rate = sample_rate  # The model's own rate; None takes the audio's
+        self.wins = 0
+        self.losing_streak = 0
+        self.suspended = False
+        self.cpu_seconds = 0.0
+        self.audio_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "wins": self.wins,
+            "suspended": self.suspended,
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "audio_seconds": round(self.audio_seconds, 3),
+            "real_time_factor": round(self.cpu_seconds / self.audio_seconds, 4) if self.audio_seconds else 0.0,
+        }
+
+
+class LanguageSet:
+    """Several models used together; pass it to RecognitionEngine as the model"""
+
+    def __init__(self, models, suspend_after=SUSPEND_AFTER, probe_every=PROBE_EVERY, rates=None):
+        rates = rates or {}
+        self.languages = [Language(name, model, rates.get(name)) for name, model in models.items()]
+        self.suspend_after = suspend_after
+        self.probe_every = probe_every
+        self.leader = self.languages[0].name if self.languages else None
+        self.utterances = 0
+        self.pool = ThreadPoolExecutor(max_workers=max(1, len(self.languages)), thread_name_prefix="lang")
+
+    def create_recognizer(self, sample_rate):
+        return MultiLanguageRecognizer(self, sample_rate)
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+
+    def record(self, winner, decoded):
+        """Update streaks and suspension after an utterance won by winner"""
+        self.utterances += 1
+        self.leader = winner
+        for language in self.languages:
+            if language.name == winner:
+                language.wins += 1
+                language.losing_streak = 0
+                if language.suspended:
+                    language.suspended = False
+                    log.info(f"Language {language.name} resumed")
+            elif language.name in decoded:
+                language.losing_streak += 1
+                if not language.suspended and language.losing_streak >= self.suspend_after:
+                    language.suspended = True
+                    log.info(f"Language {language.name} suspended after {language.losing_streak} lost utterances")
+
+    def active(self):
+        """Languages that decode the next utterance"""
+        probing = self.probe_every and self.utterances % self.probe_every == self.probe_every - 1
+        return [lang for lang in self.languages if not lang.suspended or probing]
+
+    def report(self):
+        """Per-language stats plus the CPU the non-leading languages added"""
+        leader = next((lang for lang in self.languages if lang.name == self.leader), None)
+        others = sum(lang.cpu_seconds for lang in self.languages if lang is not leader)
+        return {
+            "leader": self.leader,
+            "utterances": self.utterances,
+            "languages": {lang.name: lang.as_dict() for lang in self.languages},
+            # CPU spent on the other languages, relative to the leader's own decoding
+            "extra_cpu_ratio": round(others / leader.cpu_seconds, 3) if leader and leader.cpu_seconds else 0.0,
+        }
+
+
+class _Decoder:
+    """One language's recognizer inside a MultiLanguageRecognizer"""
+
+    def __init__(self, language, sample_rate, offset):
+        self.language = language
+        self.sample_rate = sample_rate
+        self.offset = offset  # Seconds of audio the multi-recognizer had seen before this one started
+        model_rate = language.sample_rate or sample_rate
+        self.resampler = Resampler(sample_rate, model_rate) if model_rate != sample_rate else None
+        self.rec = vosk.KaldiRecognizer(language.model, model_rate)
+        self.rec.SetWords(True)  # Word confidences decide the winner
+        self.pending = []  # Results the recognizer produced since the utterance began
+
+    def accept(self, data):
+        t0 = time.thread_time()
+        self.language.audio_seconds += len(data) / (2 * self.sample_rate)
+        if self.resampler:
+            data = self.resampler.process(data).tobytes()
+        ended = self.rec.AcceptWaveform(data)
+        if ended:
+            self.pending.append(json.loads(self.rec.Result()))
+        self.language.cpu_seconds += time.thread_time() - t0
+        return ended
+
+    def finish(self):
+        """Close the utterance: everything since it began as one result"""
+        t0 = time.thread_time()
+        self.pending.append(json.loads(self.rec.FinalResult()))
+        self.language.cpu_seconds += time.thread_time() - t0
+        words = []
+        for result in self.pending:
+            for word in result.get("result", []):
+                words.append(dict(word, start=word["start"] + self.offset, end=word["end"] + self.offset))
+        text = " ".join(r.get("text", "") for r in self.pending if r.get("text")).strip()
+        self.pending = []
+        return {"text": text, "result": words}
+
+
+def confidence(result):
+    words = result.get("result") or []
+    if not words:
+        return 0.0
+    return sum(w.get("conf", 0.0) for w in words) / len(words)
+
+
+class MultiLanguageRecognizer:
+    """KaldiRecognizer look-alike that decodes with every active language"""
+
+    def __init__(self, languages, sample_rate):
+        self.languages = languages
+        self.sample_rate = sample_rate
+        self.keep_words = False
+        self._decoders = {}
+        self._decoded = 0  # Samples fed so far
+        self._result = None
+        self._start_utterance()
+
+    def SetWords(self, enabled):
+        self.keep_words = enabled
+
+    def _start_utterance(self):
+        active = {lang.name for lang in self.languages.active()}
+        for name in list(self._decoders):
+            if name not in active:
+                del self._decoders[name]  # Suspended: free its recognizer
+        for language in self.languages.languages:
+            if language.name in active and language.name not in self._decoders:
+                self._decoders[language.name] = _Decoder(language, self.sample_rate, self._decoded / self.sample_rate)
+
+    def _leader(self):
+        if self.languages.leader in self._decoders:
+            return self.languages.leader
+        return next(iter(self._decoders))
+
+    def AcceptWaveform(self, data):
+        leader = self._leader()
+        names = list(self._decoders)
+        ended = list(self.languages.pool.map(lambda n: self._decoders[n].accept(data), names))
+        self._decoded += len(data) // 2
+        if ended[names.index(leader)]:
+            self._result = self._decide()
+            return True
+        return False
+
+    def _decide(self):
+        """Finish the utterance in every language and keep the most confident"""
+        names = list(self._decoders)
+        results = list(self.languages.pool.map(lambda n: self._decoders[n].finish(), names))
+        scores = [confidence(r) for r in results]
+        best = max(range(len(names)), key=lambda i: (scores[i], len(results[i]["result"])))
+        result = results[best]
+        result["language"] = names[best]
+        result["confidence"] = round(scores[best], 3)
+        if not self.keep_words:
+            result.pop("result", None)
+        if result["text"]:
+            self.languages.record(names[best], names)
+            log.debug(f"Language {names[best]} won ({', '.join(f'{n}={s:.2f}' for n, s in zip(names, scores))})")
+        self._start_utterance()
+        return result
+
+    def Result(self):
+        return json.dumps(self._result or {"text": ""}, ensure_ascii=False)
+
+    def PartialResult(self):
+        return self._decoders[self._leader()].rec.PartialResult()
+
+    def FinalResult(self):
+        self._result = self._decide()
+        return self.Result()
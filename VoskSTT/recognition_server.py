@@ -0,0 +1,427 @@
+"""Local recognition server: one loaded model per language, shared by every client.
+
+Loading a large model costs gigabytes per process, so scripts and other
+workstations can stream audio to one server instead of loading their own
+copy. The server listens on TCP (localhost by default) or a Unix socket.
+Each connection gets its own KaldiRecognizer, wrapped in a
+RecognitionEngine, on a worker thread from a fixed pool; all connections
+for a language share the same vosk.Model.
+
+Protocol. Client to server is a sequence of frames, each a 4-byte
+big-endian length followed by that many bytes:
+
+    1. a JSON header: {"language": "en", "sample_rate": 16000,
+       "partials": true, "words": false, "vad": false}
+       (every key is optional)
+    2. any number of int16 mono PCM frames at sample_rate
+    3. an empty frame: end of audio
+
+Server to client is newline-delimited JSON, one message per line:
+
+    {"type": "ready", "language": "en", "model": ..., "sample_rate": ...}
+    {"type": "partial", "text": ...}
+    {"type": "final", "text": ..., "result": [...]}
+    {"type": "end", "stats": {...}}
+    {"type": "error", "message": ...}
+
+    python recognition_server.py --port 2700
+    python recognition_server.py --unix /tmp/vosk-stt.sock --model vosk-model-en-us-0.22
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import struct
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from batch_transcribe import resolve_model_path
+from metrics import REGISTRY
+from model_index import ModelIndex, guess_language, read_sample_rate
+from model_pool import ModelPool
+from stt_engine import DEFAULT_SAMPLE_RATE, PcmIteratorSource, RecognitionEngine
+from vad import VoiceActivityDetector
+
+log = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 2700
+SESSIONS_PER_CORE = 4  # Live streams mostly wait for audio, so the pool is larger than the core count
+MAX_FRAME_BYTES = 1024 * 1024  # Largest frame accepted from a client
+IDLE_TIMEOUT = 30.0  # Seconds a client may send nothing before its session ends
+FRAME_HEADER = struct.Struct(">I")
+AF_UNIX = getattr(socket, "AF_UNIX", None)  # Missing on older Windows builds
+
+SESSIONS = REGISTRY.gauge("server_sessions", "Open recognition sessions")
+CONNECTIONS = REGISTRY.counter("server_connections", "Accepted connections")
+REJECTED = REGISTRY.counter("server_rejected", "Connections turned away because every worker was busy")
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def parse_address(address):
+    """'host:port', ':port' or 'unix:/path' -> (family, address)"""
+    if address.startswith("unix:"):
+        return AF_UNIX, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or DEFAULT_HOST, int(port))
+
+
+def recv_exact(sock, count):
+    """Exactly count bytes from sock, or None when it closes first"""
+    buf = bytearray(count)
+    view = memoryview(buf)
+    got = 0
+    while got < count:
+        n = sock.recv_into(view[got:])
+        if not n:
+            return None
+        got += n
+    return bytes(buf)
+
+
+def recv_frame(sock):
+    """Payload of the next frame; None when the peer closed the connection"""
+    header = recv_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_BYTES:
+        raise ProtocolError(f"Frame of {length} bytes exceeds {MAX_FRAME_BYTES}")
+    return recv_exact(sock, length) if length else b""
+
+
+def send_frame(sock, payload):
+    sock.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def parse_header(payload):
+    """Session options from the header frame; raises ProtocolError for anything but a valid JSON object"""
+    try:
+        options = json.loads(payload.decode("utf-8"))
+    except ValueError as e:
+        raise ProtocolError(f"Header is not valid JSON: {e}") from None
+    if not isinstance(options, dict):
+        raise ProtocolError(f"Header must be a JSON object, not {type(options).__name__}")
+    language = options.get("language")
+    if language is not None and not isinstance(language, str):
+        raise ProtocolError(f"language must be a string, not {type(language).__name__}")
+    rate = options.get("sample_rate", DEFAULT_SAMPLE_RATE)
+    try:
+        options["sample_rate"] = int(rate)
+    except (TypeError, ValueError):
+        raise ProtocolError(f"sample_rate must be a number, not {rate!r}") from None
+    if options["sample_rate"] <= 0:
+        raise ProtocolError(f"sample_rate must be positive, not {rate!r}")
+    return options
+
+
+class ModelCatalog:
+    """One model path per language, loaded on first use and then shared"""
+
+    def __init__(self, paths, pool=None):
+        self.paths = dict(paths)  # {language: model path}
+        self.default = next(iter(self.paths), None)
+        self.pool = pool or ModelPool(budget_bytes=float("inf"))
+        # One lock per path: two first clients of a language must not both load its model,
+        # while clients of already loaded languages never wait behind a load
+        self._locks = {path: threading.Lock() for path in self.paths.values()}
+
+    @classmethod
+    def from_models(cls, names=None):
+        """Catalog of the given model names/paths, or the smallest model of each installed language"""
+        if not names:
+            index = ModelIndex()
+            index.refresh()
+            return cls(index.smallest_per_language())
+        paths = {}
+        for name in names:
+            language, _, model = name.rpartition("=")
+            path = resolve_model_path(model)
+            paths[language or guess_language(os.path.basename(path)) or "default"] = path
+        return cls(paths)
+
+    def get(self, language=None):
+        """(language, path, model, model rate); raises KeyError for unknown languages"""
+        language = language or self.default
+        if language not in self.paths:
+            raise KeyError(f"No model for language {language!r} (available: {', '.join(self.paths)})")
+        path = self.paths[language]
+        if self.pool.contains(path):
+            model = self.pool.get(path)
+        else:
+            with self._locks[path]:
+                model = self.pool.get(path)
+        return language, path, model, read_sample_rate(path)
+
+
+class SocketSink:
+    """Result sink that writes messages to the client as JSON lines
+
+    Once the client has gone away further messages are dropped; the
+    session ends when reading its next frame fails.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.closed = False
+
+    def send(self, message):
+        if self.closed:
+            return
+        try:
+            self.sock.sendall((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+        except OSError as e:
+            self.closed = True
+            log.debug(f"Client went away: {e}")
+
+    def on_partial(self, text, result):
+        self.send({"type": "partial", "text": text})
+
+    def on_final(self, text, result):
+        message = {"type": "final", "text": text}
+        for key in ("result", "language", "confidence"):
+            if key in result:
+                message[key] = result[key]
+        self.send(message)
+
+    def on_end(self):
+        pass
+
+
+class RecognitionServer:
+    """Accept clients on one socket and decode each on a worker thread"""
+
+    def __init__(self, catalog, address=(DEFAULT_HOST, DEFAULT_PORT), family=socket.AF_INET, max_sessions=None):
+        self.catalog = catalog
+        self.family = family
+        self.max_sessions = max_sessions or (os.cpu_count() or 1) * SESSIONS_PER_CORE
+        self.pool = ThreadPoolExecutor(max_workers=self.max_sessions, thread_name_prefix="session")
+        self.sessions = set()
+        self._lock = threading.Lock()
+        self._listener = socket.socket(family, socket.SOCK_STREAM)
+        if family == AF_UNIX:
+            if os.path.exists(address):
+                os.unlink(address)
+        else:
+            self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(address)
+        if family == AF_UNIX:
+            os.chmod(address, 0o600)  # Only this user's processes may connect
+        self._listener.listen()
+        self.address = self._listener.getsockname()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self.serve_forever, name="recognition-server", daemon=True)
+        self._thread.start()
+
+    def serve_forever(self):
+        self._running = True
+        log.info(f"Recognition server listening on {self.address}, up to {self.max_sessions} sessions")
+        while self._running:
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                break  # Listener closed
+            CONNECTIONS.inc()
+            with self._lock:
+                busy = len(self.sessions) >= self.max_sessions
+                if not busy:
+                    self.sessions.add(conn)
+                    SESSIONS.set(len(self.sessions))
+            if busy:
+                REJECTED.inc()
+                self._reject(conn, "Server busy, try again later")
+                continue
+            self.pool.submit(self._session, conn)
+
+    def close(self):
+        """Stop accepting and end every open session"""
+        self._running = False
+        self._listener.close()
+        if self.family == AF_UNIX and isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        with self._lock:
+            open_sessions = list(self.sessions)
+        for conn in open_sessions:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.pool.shutdown(wait=True)
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(2.0)
+
+    @staticmethod
+    def _reject(conn, message):
+        SocketSink(conn).send({"type": "error", "message": message})
+        conn.close()
+
+    def _session(self, conn):
+        sink = SocketSink(conn)
+        try:
+            conn.settimeout(IDLE_TIMEOUT)
+            header = recv_frame(conn)
+            if not header:
+                return
+            options = parse_header(header)
+            language, path, model, model_rate = self.catalog.get(options.get("language"))
+            sample_rate = options["sample_rate"]
+            engine = RecognitionEngine(
+                model,
+                sinks=[sink],
+                partials=bool(options.get("partials", False)),
+                vad=VoiceActivityDetector(sample_rate) if options.get("vad") else None,
+                words=bool(options.get("words", False)),
+                model_rate=model_rate,
+            )
+            sink.send({"type": "ready", "language": language, "model": os.path.basename(path),
+                       "sample_rate": model_rate or sample_rate})
+            stats = engine.run(PcmIteratorSource(self._frames(conn), sample_rate))
+            sink.send({"type": "end", "stats": stats.as_dict()})
+        except (KeyError, ValueError, ProtocolError) as e:
+            sink.send({"type": "error", "message": e.args[0] if isinstance(e, KeyError) else str(e)})
+        except OSError as e:
+            log.debug(f"Session ended: {e}")
+        except Exception:
+            log.exception("Recognition session failed")
+        finally:
+            with self._lock:
+                self.sessions.discard(conn)
+                SESSIONS.set(len(self.sessions))
+            conn.close()
+
+    @staticmethod
+    def _frames(conn):
+        """PCM frames until the empty end-of-audio frame (or the client going away)"""
+        while True:
+            frame = recv_frame(conn)
+            if not frame:
+                return
+            yield frame
+
+
+class RecognitionClient:
+    """Stream PCM to a RecognitionServer and read its messages back
+
+        with RecognitionClient("127.0.0.1:2700", partials=True) as client:
+            client.send(pcm)
+            client.finish()
+            for message in client.messages():
+                ...
+    """
+
+    def __init__(self, address, language=None, sample_rate=DEFAULT_SAMPLE_RATE, partials=False,
+                 words=False, vad=False, timeout=IDLE_TIMEOUT):
+        family, target = parse_address(address) if isinstance(address, str) else (socket.AF_INET, address)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(target)
+        self._reader = self.sock.makefile("r", encoding="utf-8")
+        header = {"language": language, "sample_rate": sample_rate, "partials": partials, "words": words, "vad": vad}
+        send_frame(self.sock, json.dumps(header).encode("utf-8"))
+        self.ready = self._read()
+        if not self.ready or self.ready.get("type") != "ready":
+            self.close()
+            raise ConnectionError((self.ready or {}).get("message", "Server closed the connection"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read(self):
+        line = self._reader.readline()
+        return json.loads(line) if line else None
+
+    def send(self, pcm):
+        """Send int16 PCM; large buffers are split into frames the server accepts"""
+        for i in range(0, len(pcm), MAX_FRAME_BYTES):
+            send_frame(self.sock, pcm[i:i + MAX_FRAME_BYTES])
+
+    def finish(self):
+        """No more audio; the server sends the last final result and an end message"""
+        send_frame(self.sock, b"")
+
+    def messages(self):
+        """Messages from the server until its end (or error) message"""
+        while True:
+            message = self._read()
+            if message is None:
+                return
+            yield message
+            if message["type"] in ("end", "error"):
+                return
+
+    def transcribe(self, chunks):
+        """Send every chunk, finish, and return the final messages"""
+        def sender():
+            try:
+                for chunk in chunks:
+                    self.send(chunk)
+                self.finish()
+            except OSError:
+                pass  # The reader sees the connection end
+        thread = threading.Thread(target=sender, daemon=True)
+        thread.start()
+        finals = [m for m in self.messages() if m["type"] == "final"]
+        thread.join()
+        return finals
+
+    def close(self):
+        try:
+            self._reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to listen on (default: localhost only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument("--model", action="append",
+                        help="Model folder or name in models/, optionally as lang=model; repeat for more "
+                             "languages (default: the smallest model of each installed language)")
+    parser.add_argument("--max-sessions", type=int, help=f"Concurrent sessions (default: {SESSIONS_PER_CORE} per core)")
+    parser.add_argument("--preload", action="store_true", help="Load every model before accepting clients")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    import vosk
+    vosk.SetLogLevel(-1)
+    try:
+        catalog = ModelCatalog.from_models(args.model)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    if not catalog.paths:
+        parser.error("No models found")
+    for language, path in catalog.paths.items():
+        log.info(f"{language}: {os.path.basename(path)}")
+        if args.preload:
+            catalog.get(language)
+
+    if args.unix:
+        server = RecognitionServer(catalog, args.unix, AF_UNIX, args.max_sessions)
+    else:
+        server = RecognitionServer(catalog, (args.host, args.port), socket.AF_INET, args.max_sessions)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""Streaming sample-rate conversion and downmix for the capture path.
+
+Devices often only run at 44.1 or 48 kHz, in float32 and with more than
+one channel, while each Vosk model wants mono int16 at the rate in its
+conf/mfcc.conf. A Resampler takes blocks in the device's format, averages
+the channels and converts the rate with a windowed-sinc polyphase filter:
+the rate ratio is reduced to L/M, the filter is split into L phases, and
+each output sample is the dot product of one phase with the input window
+it lands on. All outputs of a block are computed in a single vectorized
+step into buffers allocated up front for the largest expected block, so
+steady-state processing does not allocate.
+"""
+import math
+
+import numpy as np
+
+ZERO_CROSSINGS = 16  # Sinc lobes on each side of the filter centre
+KAISER_BETA = 8.0  # About 80 dB stopband attenuation
+ROLLOFF = 0.95  # Pass band as a fraction of the lower Nyquist rate, so the transition band is not aliased
+INT16_SCALE = 32767.0
+
+
+def filter_bank(up, down, zero_crossings=ZERO_CROSSINGS, beta=KAISER_BETA, rolloff=ROLLOFF):
+    """(up, taps) polyphase bank of a low-pass for resampling by up/down
+
+    Row p holds the weights for an output sample falling p/up of an input
+    sample after the window's centre-left tap. Each row sums to 1.
+    """
+    cutoff = min(1.0, up / down) * rolloff  # Fraction of the input Nyquist band that survives
+    half = int(math.ceil(zero_crossings / cutoff))
+    taps = 2 * half
+    # Distance in input samples from each tap to the output sample, for every phase
+    t = (np.arange(up)[:, None] / up) + (half - 1) - np.arange(taps)[None, :]
+    window = np.i0(beta * np.sqrt(np.clip(1.0 - (t / half) ** 2, 0.0, 1.0))) / np.i0(beta)
+    bank = cutoff * np.sinc(cutoff * t) * window
+    bank /= bank.sum(axis=1, keepdims=True)
+    return bank.astype(np.float32)
+
+
+class Resampler:
+    """Convert blocks of interleaved PCM to mono int16 at another rate
+
+    in_dtype is 'int16' or 'float32' (-1.0..1.0). process() accepts bytes
+    or an array and returns an int16 view that stays valid until the next
+    call. Blocks larger than max_block input frames grow the buffers once.
+    """
+
+    def __init__(self, in_rate, out_rate, channels=1, in_dtype='int16', max_block=4096,
+                 zero_crossings=ZERO_CROSSINGS):
+        self.in_rate = int(in_rate)
+        self.out_rate = int(out_rate)
+        self.channels = channels
+        self.in_dtype = np.dtype(in_dtype)
+        if self.in_dtype not in (np.dtype(np.int16), np.dtype(np.float32)):
+            raise ValueError(f"Unsupported sample format: {in_dtype}")
+        # Float input is brought to the int16 range while mixing down
+        self.scale = INT16_SCALE if self.in_dtype == np.float32 else 1.0
+        g = math.gcd(self.in_rate, self.out_rate)
+        self.up = self.out_rate // g
+        self.down = self.in_rate // g
+        self.passthrough = self.up == self.down
+        if self.passthrough:
+            self.bank = np.ones((1, 1), dtype=np.float32)
+        else:
+            self.bank = filter_bank(self.up, self.down, zero_crossings)
+        self.taps = self.bank.shape[1]
+        self.half = self.taps // 2
+        self.max_block = 0
+        self._allocate(max_block)
+        self.reset()
+
+    def _allocate(self, max_block):
+        self.max_block = max_block
+        max_out = max_block * self.up // self.down + 2
+        self._mix = np.zeros(max_block, dtype=np.float32)
+        # Input history the filter still needs, followed by the new block
+        self._buf = np.zeros(self.taps + max_block, dtype=np.float32)
+        self._acc = np.zeros(max_out, dtype=np.float32)
+        self._out = np.zeros(max_out, dtype=np.int16)
+        self._pos_buf = np.zeros(max_out, dtype=np.int64)
+        self._phase = np.zeros(max_out, dtype=np.int64)
+        self._start = np.zeros(max_out, dtype=np.int64)
+        self._step = np.arange(max_out, dtype=np.int64) * self.down
+        self._taps_at = np.arange(self.taps, dtype=np.int64)
+        self._index = np.zeros((max_out, self.taps), dtype=np.int64)  # Input sample under each tap
+        self._windows = np.zeros((max_out, self.taps), dtype=np.float32)
+        self._weights = np.zeros((max_out, self.taps), dtype=np.float32)
+
+    def reset(self):
+        """Forget the history, e.g. when capture restarts"""
+        # Silence before the first sample, so output 0 lines up with input 0
+        self._held = self.half - 1
+        self._buf[:self._held] = 0.0
+        self._pos = self._held * self.up  # Next output position, in 1/up input samples
+
+    def _downmix(self, data):
+        samples = np.frombuffer(data, dtype=self.in_dtype) if isinstance(data, (bytes, bytearray, memoryview)) \
+            else np.asarray(data)
+        frames = len(samples) // self.channels
+        if frames > self.max_block:
+            history = self._buf[:self._held].copy()
+            self._allocate(frames)
+            self._buf[:self._held] = history
+        mix = self._mix[:frames]
+        if self.channels == 1:
+            np.multiply(samples[:frames], self.scale, out=mix, casting='unsafe')
+        else:
+            np.sum(samples[:frames * self.channels].reshape(frames, self.channels), axis=1,
+                   dtype=np.float32, out=mix)
+            mix *= self.scale / self.channels
+        return mix
+
+    def _to_int16(self, values):
+        np.rint(values, out=values)
+        np.clip(values, -32768, 32767, out=values)
+        out = self._out[:len(values)]
+        out[:] = values
+        return out
+
+    def process(self, data):
+        """Resample one block; returns int16 samples at out_rate"""
+        mix = self._downmix(data)
+        if self.passthrough:
+            return self._to_int16(mix)
+        avail = self._held + len(mix)
+        self._buf[self._held:avail] = mix
+        # Outputs whose whole window is inside the buffered input
+        last = (avail - self.half) * self.up - 1 - self._pos
+        count = last // self.down + 1 if last >= 0 else 0
+        if count:
+            pos = self._pos_buf[:count]
+            np.add(self._step[:count], self._pos, out=pos)
+            phase = self._phase[:count]
+            np.remainder(pos, self.up, out=phase)
+            start = self._start[:count]
+            np.floor_divide(pos, self.up, out=start)
+            start -= self.half - 1
+            index = self._index[:count]
+            index[:] = start[:, None]
+            index += self._taps_at
+            taken = self._windows[:count]
+            weights = self._weights[:count]
+            # mode='clip' writes straight into out; 'raise' would buffer it (indices are in range)
+            np.take(self._buf, index, out=taken, mode='clip')
+            np.take(self.bank, phase, axis=0, out=weights, mode='clip')
+            np.multiply(taken, weights, out=taken)
+            np.sum(taken, axis=1, out=self._acc[:count])
+        self._pos += count * self.down
+        # Keep only the input the next output's window reaches back to
+        drop = min(self._pos // self.up - (self.half - 1), avail)
+        self._held = avail - drop
+        self._buf[:self._held] = self._buf[drop:avail]
+        self._pos -= drop * self.up
+        return self._to_int16(self._acc[:count])
+
+    def flush(self):
+        """Outputs still held back by the filter, padded with silence"""
+        return self.process(np.zeros(self.half * self.channels, dtype=self.in_dtype))
+
+
+def resample_pcm(data, in_rate, out_rate, channels=1, in_dtype='int16'):
+    """One-shot conversion of a whole buffer to mono int16 bytes at out_rate"""
+    samples = np.frombuffer(data, dtype=in_dtype) if isinstance(data, (bytes, bytearray, memoryview)) \
+        else np.asarray(data)
+    resampler = Resampler(in_rate, out_rate, channels, in_dtype, max_block=max(1, len(samples) // channels))
+    return resampler.process(samples).tobytes() + resampler.flush().tobytes()
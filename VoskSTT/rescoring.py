@@ -0,0 +1,361 @@
+"""Second pass: re-decode finished utterances with a larger model while idle.
+
+The live path uses the smallest model for responsiveness. SegmentStore
+sits on the engine as an audio recorder and a result sink: it keeps the
+last HISTORY_SECONDS of decoded-rate audio in a ring and, for every final
+result with word timings, cuts that utterance out and keeps it
+compressed (zlib over sample-to-sample differences, lossless) together
+with the live text and its mean word confidence.
+
+Rescorer works through the stored segments on a background thread,
+lowest confidence first, with the larger model its model getter names.
+It only decodes while is_idle() says the live path has nothing to do,
+checks again between short chunks so speech pauses it within one chunk,
+and sleeps in proportion to the time it spends decoding so it never uses
+more than DUTY_CYCLE of a core. Loading the larger model is the one step
+that can't be chunked, so it waits for is_idle() and for can_load() to
+confirm the model fits next to the live one; the rescorer keeps the
+model itself rather than in a shared pool, where it could evict the live
+model. On Linux the thread also runs at a lower scheduling priority.
+Each rescored segment is handed to on_rescored.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+import vosk
+
+from metrics import REGISTRY
+from model_index import read_sample_rate
+from resample import resample_pcm
+from stt_engine import ResultSink
+
+log = logging.getLogger(__name__)
+
+HISTORY_SECONDS = 120  # Recent audio kept for cutting out utterances
+SEGMENT_PAD_SECONDS = 0.25  # Audio kept around each utterance's words
+SEGMENT_BUDGET_MB = 64  # Compressed audio kept; rescored and then oldest segments go first
+SKIP_CONFIDENCE = 0.98  # Segments the live model was this sure of are left alone
+CHUNK_SECONDS = 0.5  # Audio per AcceptWaveform call; idleness is rechecked between chunks
+DUTY_CYCLE = 0.5  # Most of one core the second pass may use while decoding
+IDLE_POLL_SECONDS = 0.5
+RESCORE_NICE = 10  # Added scheduling niceness of the rescoring thread (Linux)
+
+RESCORED = REGISTRY.counter("rescored_segments", "Utterances decoded again with the larger model")
+RESCORE_CHANGED = REGISTRY.counter("rescored_changed", "Rescored utterances whose text changed")
+RESCORE_MS = REGISTRY.histogram("rescore_chunk_ms", "Second-pass AcceptWaveform duration")
+
+
+def mean_confidence(words):
+    confs = [w["conf"] for w in words if "conf" in w]
+    return sum(confs) / len(confs) if confs else 0.0
+
+
+def pack_pcm(samples):
+    """int16 samples -> compact bytes (first differences wrap around in int16)"""
+    deltas = np.diff(samples, prepend=np.int16(0)).astype(np.int16)
+    return zlib.compress(deltas.tobytes(), 1)
+
+
+def unpack_pcm(packed):
+    deltas = np.frombuffer(zlib.decompress(packed), dtype=np.int16)
+    return np.cumsum(deltas, dtype=np.int16)
+
+
+class Segment:
+    """One utterance's audio and its live and rescored results"""
+
+    def __init__(self, segment_id, start, end, sample_rate, packed, text, words, model=None):
+        self.id = segment_id
+        self.start = start  # Source seconds of the first stored sample
+        self.end = end
+        self.sample_rate = sample_rate
+        self.packed = packed
+        self.text = text
+        self.words = words
+        self.confidence = mean_confidence(words)
+        self.model = model
+        self.rescored = None  # Result from the second pass
+
+    @property
+    def seconds(self):
+        return self.end - self.start
+
+    def pcm(self):
+        return unpack_pcm(self.packed).tobytes()
+
+
+class SegmentStore(ResultSink):
+    """Keep the audio of every final result; pass it to RecognitionEngine as recorder and sink
+
+    Sinks listed after it see result["segment"], the id of the stored
+    segment. Results at or above skip_confidence are not stored, since
+    the second pass would leave them alone anyway.
+    """
+
+    def __init__(self, history_seconds=HISTORY_SECONDS, budget_bytes=SEGMENT_BUDGET_MB * 1024 ** 2,
+                 pad_seconds=SEGMENT_PAD_SECONDS, skip_confidence=SKIP_CONFIDENCE):
+        self.history_seconds = history_seconds
+        self.budget_bytes = budget_bytes
+        self.pad_seconds = pad_seconds
+        self.skip_confidence = skip_confidence
+        self.model = None  # Name of the live model, recorded with each segment
+        self.on_evict = None  # Called with each segment dropped for the budget (recognition thread)
+        self.segments = {}  # id -> Segment, oldest first
+        self.next_id = 0
+        self.stored_bytes = 0
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, sample_rate=16000):
+        """Engine callback at the start of each run: the input clock starts again at 0"""
+        self.sample_rate = sample_rate
+        self._history = np.zeros(int(self.history_seconds * sample_rate), dtype=np.int16)
+        self._recorded = 0  # Samples ever recorded this run
+
+    def record(self, data):
+        """Engine callback with every block of input audio at the decoding rate"""
+        samples = np.frombuffer(data, dtype=np.int16)
+        count = len(samples)
+        size = len(self._history)
+        if count > size:
+            samples = samples[-size:]  # Only the tail fits
+        start = (self._recorded + count - len(samples)) % size
+        first = min(len(samples), size - start)
+        self._history[start:start + first] = samples[:first]
+        self._history[:len(samples) - first] = samples[first:]
+        self._recorded += count
+
+    def _cut(self, lo, hi):
+        """Recorded samples [lo, hi) of this run, or None once overwritten"""
+        size = len(self._history)
+        lo = max(lo, 0)
+        hi = min(hi, self._recorded)
+        if hi <= lo or lo < self._recorded - size:
+            return None
+        a, b = lo % size, hi % size
+        if a < b:
+            return self._history[a:b].copy()
+        return np.concatenate((self._history[a:], self._history[:b]))
+
+    def on_final(self, text, result):
+        words = result.get("result")
+        if not words or mean_confidence(words) >= self.skip_confidence:
+            return
+        pad = int(self.pad_seconds * self.sample_rate)
+        lo = int(words[0]["start"] * self.sample_rate) - pad
+        hi = int(words[-1]["end"] * self.sample_rate) + pad
+        samples = self._cut(lo, hi)
+        if samples is None or not len(samples):
+            return
+        lo = max(lo, 0)
+        with self.lock:
+            segment = Segment(self.next_id, lo / self.sample_rate, (lo + len(samples)) / self.sample_rate,
+                              self.sample_rate, pack_pcm(samples), text, words, self.model)
+            self.next_id += 1
+            self.segments[segment.id] = segment
+            self.stored_bytes += len(segment.packed)
+            evicted = self._evict()
+        result["segment"] = segment.id
+        if self.on_evict:
+            for victim in evicted:
+                self.on_evict(victim)
+
+    def _evict(self):
+        evicted = []
+        while self.stored_bytes > self.budget_bytes and self.segments:
+            victim = next((s for s in self.segments.values() if s.rescored is not None), None)
+            victim = victim or next(iter(self.segments.values()))
+            del self.segments[victim.id]
+            self.stored_bytes -= len(victim.packed)
+            evicted.append(victim)
+        return evicted
+
+    def next_pending(self, skip_confidence=None):
+        """The not yet rescored segment with the lowest live confidence, or None"""
+        if skip_confidence is None:
+            skip_confidence = self.skip_confidence
+        with self.lock:
+            pending = [s for s in self.segments.values() if s.rescored is None and s.confidence < skip_confidence]
+        return min(pending, key=lambda s: s.confidence) if pending else None
+
+    def clear(self):
+        with self.lock:
+            self.segments.clear()
+            self.stored_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            segments = list(self.segments.values())
+        audio = sum(s.seconds for s in segments)
+        return {
+            "segments": len(segments),
+            "rescored": sum(1 for s in segments if s.rescored is not None),
+            "audio_seconds": round(audio, 1),
+            "stored_kb": round(self.stored_bytes / 1024, 1),
+            # Compressed size relative to raw int16
+            "compression": round(self.stored_bytes / (audio * 2 * self.sample_rate), 3) if audio else 0.0,
+        }
+
+
+class Rescorer:
+    """Decode stored segments again with a larger model whenever the live path is idle
+
+    model_path(segment) returns the model to rescore it with (None: leave it);
+    load(path) returns the loaded model and release(model), when given,
+    is called once it is dropped. can_load(path) says whether there
+    is memory to hold it now; while it says no, the model is released and
+    rescoring waits. on_rescored(segment, result) runs on the rescoring
+    thread.
+    """
+
+    def __init__(self, store, model_path, load=vosk.Model, is_idle=None, on_rescored=None,
+                 duty_cycle=DUTY_CYCLE, chunk_seconds=CHUNK_SECONDS, can_load=None, release=None):
+        self.store = store
+        self.model_path = model_path
+        self.load = load
+        self.release = release
+        self.can_load = can_load or (lambda path: True)
+        self.is_idle = is_idle or (lambda: True)
+        self.on_rescored = on_rescored
+        self.duty_cycle = duty_cycle
+        self.chunk_seconds = chunk_seconds
+        self.rescored = 0
+        self.changed = 0
+        self.interrupted = 0  # Segments put back because the live path became busy
+        self.no_room = 0  # Steps skipped because the larger model didn't fit in memory
+        self.audio_seconds = 0.0
+        self.decode_seconds = 0.0
+        self._model = None
+        self._path = None
+        self._waiting_for_room = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rescorer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        self._lower_priority()
+        while not self._stop.is_set():
+            try:
+                worked = self._step()
+            except Exception:
+                log.exception("Rescoring failed")
+                worked = False
+            if not worked:
+                self._stop.wait(IDLE_POLL_SECONDS)
+
+    @staticmethod
+    def _lower_priority():
+        if not hasattr(os, "setpriority") or not hasattr(threading, "get_native_id"):
+            return
+        try:
+            # Linux applies this to the calling thread only
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), RESCORE_NICE)
+        except OSError:
+            pass
+
+    def _step(self):
+        """Rescore (or set aside) one segment; False when there was nothing to do or no time to do it"""
+        if not self.is_idle():
+            return False
+        segment = self.store.next_pending()
+        if not segment:
+            return False
+        path = self.model_path(segment)
+        if not path:
+            segment.rescored = {"text": segment.text, "result": segment.words}  # No larger model: done with it
+            if self.on_rescored:
+                self.on_rescored(segment, segment.rescored)
+            return True
+        if not self.can_load(path):
+            if not self._waiting_for_room:
+                self._waiting_for_room = True
+                log.info(f"Not enough memory for {os.path.basename(path)} next to the live model, rescoring paused")
+            self._drop_model()
+            self.no_room += 1
+            return False
+        self._waiting_for_room = False
+        if path != self._path:
+            self._drop_model()  # Release the old model before loading the next
+            if not self.is_idle():  # Loading takes seconds of CPU that can't be interrupted
+                return False
+            started = time.perf_counter()
+            self._model, self._path = self.load(path), path
+            log.info(f"Rescoring with {os.path.basename(path)} (loaded in {time.perf_counter() - started:.1f}s)")
+        result = self._decode(segment, read_sample_rate(path) or segment.sample_rate)
+        if result is None:
+            self.interrupted += 1
+            return False
+        if not result["text"] and segment.text:
+            result = {"text": segment.text, "result": segment.words}  # Keep what the live model heard
+        result["model"] = os.path.basename(path)
+        result["confidence"] = round(mean_confidence(result["result"]), 3)
+        segment.rescored = result
+        self.rescored += 1
+        RESCORED.inc()
+        if result["text"] != segment.text:
+            self.changed += 1
+            RESCORE_CHANGED.inc()
+        if self.on_rescored:
+            self.on_rescored(segment, result)
+        return True
+
+    def _drop_model(self):
+        model, self._model, self._path = self._model, None, None
+        if model is not None and self.release:
+            self.release(model)
+
+    def _decode(self, segment, model_rate):
+        """Words of the segment on the source clock, or None when interrupted"""
+        pcm = segment.pcm()
+        if model_rate != segment.sample_rate:
+            pcm = resample_pcm(pcm, segment.sample_rate, model_rate)
+        rec = vosk.KaldiRecognizer(self._model, model_rate)
+        rec.SetWords(True)
+        results = []
+        chunk = int(self.chunk_seconds * model_rate) * 2
+        for i in range(0, len(pcm), chunk):
+            if self._stop.is_set() or not self.is_idle():
+                return None
+            started = time.perf_counter()
+            if rec.AcceptWaveform(pcm[i:i + chunk]):
+                results.append(json.loads(rec.Result()))
+            elapsed = time.perf_counter() - started
+            RESCORE_MS.observe(elapsed * 1000)
+            self.decode_seconds += elapsed
+            # Stay under the duty cycle: rest in proportion to the work just done
+            self._stop.wait(elapsed * (1 - self.duty_cycle) / self.duty_cycle)
+        results.append(json.loads(rec.FinalResult()))
+        self.audio_seconds += segment.seconds
+        words = [dict(w, start=round(w["start"] + segment.start, 3), end=round(w["end"] + segment.start, 3))
+                 for r in results for w in r.get("result", [])]
+        text = " ".join(r.get("text", "") for r in results if r.get("text")).strip()
+        return {"text": text, "result": words}
+
+    def report(self):
+        return {
+            "model": os.path.basename(self._path) if self._path else None,
+            "rescored": self.rescored,
+            "changed": self.changed,
+            "interrupted": self.interrupted,
+            "no_room": self.no_room,
+            "audio_seconds": round(self.audio_seconds, 1),
+            "real_time_factor": round(self.decode_seconds / self.audio_seconds, 3) if self.audio_seconds else 0.0,
+            "store": self.store.stats(),
+        }
@@ -0,0 +1,69 @@
+"""Receivers of recognition results.
+
+RecognitionEngine calls on_partial(text, result) for in-progress text,
+on_final(text, result) for every finished utterance and on_end() when a
+run stops. These classes have no dependencies, so modules that only
+consume results (the journal and its search CLI, the word store) can be
+imported where vosk is not installed; stt_engine re-exports them.
+"""
+import json
+
+
+class ResultSink:
+    """Base class for receivers of recognition results"""
+
+    def on_partial(self, text, result):
+        pass
+
+    def on_final(self, text, result):
+        pass
+
+    def on_end(self):
+        pass
+
+
+class CallbackSink(ResultSink):
+    """Forward results to plain callables"""
+
+    def __init__(self, on_final=None, on_partial=None, on_end=None):
+        self._on_final = on_final
+        self._on_partial = on_partial
+        self._on_end = on_end
+
+    def on_partial(self, text, result):
+        if self._on_partial:
+            self._on_partial(text, result)
+
+    def on_final(self, text, result):
+        if self._on_final:
+            self._on_final(text, result)
+
+    def on_end(self):
+        if self._on_end:
+            self._on_end()
+
+
+class CollectingSink(ResultSink):
+    """Keep every final result in memory"""
+
+    def __init__(self):
+        self.results = []
+
+    def on_final(self, text, result):
+        self.results.append(result)
+
+    def text(self):
+        return " ".join(r.get("text", "") for r in self.results).strip()
+
+
+class JsonlSink(ResultSink):
+    """Write each final result as one JSON line to a text stream"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def on_final(self, text, result):
+        self.stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    def on_end(self):
+        self.stream.flush()
@@ -0,0 +1,701 @@
+"""Headless streaming recognition engine.
+
+Drives a vosk.KaldiRecognizer from a pluggable audio source (microphone,
+WAV file, raw PCM iterator) and hands results to result sinks. Nothing in
+here depends on Tk or win32, so it runs on a headless Linux box and can
+decode files faster than real time.
+
+Live sources buffer what the recognizer has not read yet. When decoding
+falls more than max_lag seconds behind, the engine's overload policy
+decides what gives: "block" decodes everything in order (the bounded
+capture ring drops the newest audio once full), "drop_silence" skips
+non-speech audio until it has caught up, and "coalesce" merges the
+backlog into large blocks and skips partial results. Past lag_warn
+seconds on_lag is called once, so the caller can switch to a faster
+model or warn.
+"""
+import bisect
+import json
+import logging
+import threading
+import time
+import wave
+from collections import deque
+
+import numpy as np
+
+from audio_buffer import AudioRingBuffer, CaptureClock
+from metrics import REGISTRY
+from resample import Resampler
+from result_sinks import CallbackSink, CollectingSink, JsonlSink, ResultSink  # noqa: F401 (re-exported)
+from vad import EnergyTracker
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_RATE = 16000
+DEFAULT_BLOCK_SIZE = 8000  # Samples per block, 500 ms at 16 kHz
+BYTES_PER_SAMPLE = 2  # int16 mono
+RING_SECONDS = 60  # Audio the microphone ring can hold while the recognizer lags
+CLOCK_ANCHORS = 512  # Capture-time anchors the engine keeps for mapping word timings
+CAPTURE_DTYPE = 'float32'  # Native-rate capture format; converted to int16 by the resampler
+MAX_CAPTURE_CHANNELS = 2  # Channels are averaged anyway, more only costs bandwidth
+OVERLOAD_POLICIES = ("block", "drop_silence", "coalesce")
+MAX_LAG_SECONDS = 2.0  # Backlog beyond which the overload policy starts shedding work
+LAG_WARN_SECONDS = 10.0  # Backlog at which on_lag fires
+COALESCE_SECONDS = 2.0  # Most buffered audio merged into one AcceptWaveform call
+
+# Stage metrics, see metrics.py
+CALLBACK_MS = REGISTRY.histogram("callback_ms", "Audio callback duration")
+CAPTURE_STATUS = REGISTRY.counter("capture_status_flags", "Callbacks reporting over/underflow")
+RING_WAIT_MS = REGISTRY.histogram("ring_wait_ms", "Recognizer wait for the next chunk")
+RING_DEPTH_MS = REGISTRY.gauge("ring_depth_ms", "Captured audio waiting for the recognizer")
+RING_OVERRUNS = REGISTRY.gauge("ring_overrun_samples", "Samples dropped because the recognizer fell behind")
+ACCEPT_MS = REGISTRY.histogram("accept_waveform_ms", "AcceptWaveform duration")
+RESULT_MS = REGISTRY.histogram("result_ms", "Result/PartialResult/FinalResult call duration")
+JSON_PARSE_MS = REGISTRY.histogram("json_parse_ms", "Parsing recognizer JSON")
+SINK_MS = REGISTRY.histogram("sink_ms", "Dispatching one result to all sinks")
+FINALS = REGISTRY.counter("final_results", "Non-empty final results")
+LAG_SECONDS = REGISTRY.gauge("lag_seconds", "Captured audio not decoded yet")
+SHED_MS = REGISTRY.counter("shed_audio_ms", "Non-speech audio skipped while lagging")
+COALESCED = REGISTRY.counter("coalesced_blocks", "Blocks merged with buffered audio while lagging")
+
+
+class AudioSource:
+    """Base class for audio sources yielding raw int16 mono PCM blocks
+
+    Live sources set block_captured to the time.perf_counter() time the
+    first sample of the block just yielded was captured; None otherwise.
+    blocks(stop) ends without taking another block once the stop event
+    is set, so buffered audio stays for the next reader.
+    """
+    sample_rate = DEFAULT_SAMPLE_RATE
+    realtime = False  # True when blocks arrive at wall-clock speed
+    block_captured = None
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def blocks(self, stop=None):
+        raise NotImplementedError
+
+    def lag_seconds(self):
+        """Audio captured but not handed out yet; sources read on demand never lag"""
+        return 0.0
+
+    def read_backlog(self, limit):
+        """Up to limit already-buffered samples as bytes, without waiting"""
+        return b''
+
+
+class PcmIteratorSource(AudioSource):
+    """Feed the engine from any iterable of PCM byte chunks"""
+
+    def __init__(self, chunks, sample_rate=DEFAULT_SAMPLE_RATE):
+        self.chunks = chunks
+        self.sample_rate = sample_rate
+
+    def blocks(self, stop=None):
+        for chunk in self.chunks:
+            yield bytes(chunk)
+
+
+class WavFileSource(AudioSource):
+    """Read a 16-bit WAV file block by block, mixing multi-channel files down to mono"""
+
+    def __init__(self, path, block_size=DEFAULT_BLOCK_SIZE):
+        self.path = path
+        self.block_size = block_size
+        self._wav = None
+        self._downmix = None
+
+    def open(self):
+        self._wav = wave.open(self.path, 'rb')
+        if self._wav.getsampwidth() != BYTES_PER_SAMPLE:
+            self._wav.close()
+            self._wav = None
+            raise ValueError(f"{self.path}: expected 16-bit PCM WAV")
+        self.sample_rate = self._wav.getframerate()
+        channels = self._wav.getnchannels()
+        if channels > 1:
+            self._downmix = Resampler(self.sample_rate, self.sample_rate, channels, max_block=self.block_size)
+
+    def blocks(self, stop=None):
+        while True:
+            data = self._wav.readframes(self.block_size)
+            if not data:
+                break
+            if self._downmix:
+                data = self._downmix.process(data).tobytes()
+            yield data
+
+    def close(self):
+        if self._wav:
+            self._wav.close()
+            self._wav = None
+
+
+class MicrophoneSource(AudioSource):
+    """Capture from the default (or given) input device via sounddevice
+
+    With native=True the device is opened at its own default rate, in
+    float32 and with up to MAX_CAPTURE_CHANNELS channels, and each block is
+    mixed down and resampled to sample_rate (int16 mono) in the callback
+    into preallocated buffers. Devices that refuse that fall back to
+    capturing sample_rate int16 mono directly.
+
+    The audio callback only copies each block into a preallocated ring
+    buffer; apart from the small NumPy view of the block it allocates
+    nothing. Energy and silence are tracked on the recognition thread by
+    vad.EnergyTracker. on_block(samples,
+    captured) gets an int16 view of the block that is only valid during the
+    call, and the block's capture time.
+
+    Each block is stamped with the time its first sample reached the
+    ADC, taken from PortAudio's inputBufferAdcTime and mapped onto
+    time.perf_counter(). When the host API gives no ADC time, the block
+    is assumed to end at the moment the callback runs. The stamps go into
+    a CaptureClock, so every chunk the recognizer reads carries its
+    capture time.
+
+    block_size is the capture block handed to the callback; chunk_size is
+    what the recognizer is fed. Small capture blocks (10-50 ms) let silence
+    logic react quickly while AcceptWaveform still gets efficient chunks.
+    """
+    realtime = True
+
+    def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE, block_size=DEFAULT_BLOCK_SIZE,
+                 device=None, on_block=None, ring_seconds=RING_SECONDS, chunk_size=None, native=True):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.chunk_size = chunk_size or block_size
+        self.device = device
+        self.on_block = on_block  # Called from the audio thread with each block
+        self.muted = False
+        self.native = native  # Capture at the device's own rate and format
+        self.capture_format = None  # (rate, channels, dtype) actually opened
+        self.ring = AudioRingBuffer(int(sample_rate * ring_seconds))
+        self.clock = CaptureClock(sample_rate)
+        self.block_captured = None
+        self._capture_rate = sample_rate
+        self._resampler = None
+        self._stream = None
+        self._running = False
+
+    def open(self):
+        if self._stream:
+            return  # Already capturing, e.g. while a model was loading
+        import sounddevice as sd  # Only needed for live capture
+        if self.native:
+            try:
+                info = sd.query_devices(self.device, 'input')
+                channels = max(1, min(int(info['max_input_channels']), MAX_CAPTURE_CHANNELS))
+                self._open_stream(sd, int(info['default_samplerate']), channels, CAPTURE_DTYPE)
+            except Exception as e:
+                log.warning(f"Native-rate capture failed, using {self.sample_rate} Hz int16 mono: {e}")
+                self._stream = None
+        if not self._stream:
+            self._open_stream(sd, self.sample_rate, 1, 'int16')
+        self._running = True
+        self._stream.start()
+
+    def _open_stream(self, sd, rate, channels, dtype):
+        # Same block duration as block_size samples at the recognition rate
+        block = self.block_size * rate // self.sample_rate
+        if rate == self.sample_rate and channels == 1 and dtype == 'int16':
+            self._resampler = None
+        else:
+            self._resampler = Resampler(rate, self.sample_rate, channels, dtype, max_block=block)
+        self._stream = sd.RawInputStream(
+            samplerate=rate,
+            blocksize=block,
+            device=self.device,
+            dtype=dtype,
+            channels=channels,
+            callback=self._callback
+        )
+        self.capture_format = (rate, channels, dtype)
+        self._capture_rate = rate
+        log.debug(f"Capturing {rate} Hz, {channels} channel(s), {dtype}")
+
+    def _captured_at(self, now, frames, time_info):
+        """perf_counter time of the block's first sample"""
+        adc = getattr(time_info, 'inputBufferAdcTime', 0)
+        current = getattr(time_info, 'currentTime', 0)
+        if adc and current:
+            return now - (current - adc)
+        return now - frames / self._capture_rate
+
+    def _callback(self, indata, frames, time_info, status):
+        started = time.perf_counter()
+        try:
+            if status:
+                CAPTURE_STATUS.inc()
+            if self.muted:
+                return
+            if self._resampler:
+                samples = self._resampler.process(indata)
+            else:
+                samples = np.frombuffer(indata, dtype=np.int16)
+            captured = self._captured_at(started, frames, time_info)
+            self.clock.stamp(self.ring.write_position, captured)
+            self.ring.write(samples)
+            if self.on_block:
+                self.on_block(samples, captured)
+        except Exception:
+            log.exception("Error in audio callback")
+        CALLBACK_MS.since(started)
+
+    def blocks(self, stop=None):
+        while self._running:
+            started = time.perf_counter()
+            if self.ring.wait(self.chunk_size, timeout=0.5):
+                if stop is not None and stop.is_set():
+                    break  # Leave the block in the ring for whoever reads next
+                RING_WAIT_MS.since(started)
+                RING_DEPTH_MS.set(round(self.ring.available() * 1000 / self.sample_rate))
+                RING_OVERRUNS.set(self.ring.overruns)
+                self.block_captured = self.clock.time_at(self.ring.read_position)
+                yield self.ring.read(self.chunk_size)
+
+    def lag_seconds(self):
+        return self.ring.available() / self.sample_rate
+
+    def read_backlog(self, limit):
+        return self.ring.read(min(limit, self.ring.available()))
+
+    def close(self):
+        self._running = False
+        if self._stream:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+        self.ring.clear()
+        self.block_captured = None
+
+
+class EngineStats:
+    """Counters for one engine run"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.audio_seconds = 0.0
+        self.decoded_seconds = 0.0  # Audio actually fed to the recognizer
+        self.decode_seconds = 0.0  # Time spent inside the recognizer
+        self.wall_seconds = 0.0
+        self.blocks = 0
+        self.finals = 0
+        self.max_lag = 0.0  # Largest backlog seen, in seconds
+        self.shed_seconds = 0.0  # Non-speech audio dropped by the overload policy
+        self.coalesced = 0
+
+    @property
+    def real_time_factor(self):
+        """Decode time per second of audio (below 1.0 is faster than real time)"""
+        if not self.audio_seconds:
+            return 0.0
+        return self.decode_seconds / self.audio_seconds
+
+    def as_dict(self):
+        return {
+            "audio_seconds": round(self.audio_seconds, 3),
+            "decoded_seconds": round(self.decoded_seconds, 3),
+            "decode_seconds": round(self.decode_seconds, 3),
+            "wall_seconds": round(self.wall_seconds, 3),
+            "blocks": self.blocks,
+            "finals": self.finals,
+            "max_lag": round(self.max_lag, 3),
+            "shed_seconds": round(self.shed_seconds, 3),
+            "coalesced": self.coalesced,
+            "real_time_factor": round(self.real_time_factor, 4),
+        }
+
+
+class EngineRun:
+    """Stop flag, source ownership and decoding state of one start() ... stop()
+
+    Each run gets its own, so a worker that outlives stop()'s join
+    timeout only ever sees its own run being stopped, never closes a
+    source a later run is reading and never feeds or flushes a later
+    run's recognizer.
+    """
+
+    def __init__(self, rec=None, sample_rate=DEFAULT_SAMPLE_RATE, resampler=None):
+        self.stop = threading.Event()
+        self.keep_source = False  # Detach from a live source instead of closing it
+        self.rec = rec
+        self.sample_rate = sample_rate  # Decoding rate
+        self.resampler = resampler  # Source rate -> model rate, when they differ
+        self.shed_run = False  # The previous block was dropped
+        self.last_partial = ""
+        # Decoded-sample -> source-sample anchors, one per stretch of contiguous audio
+        self.decoded_samples = 0
+        self.anchor_decoded = [0]
+        self.anchor_source = [0]
+        # (input sample, perf_counter capture time) per block from live sources
+        self.input_samples = 0
+        self.clock = deque(maxlen=CLOCK_ANCHORS)
+
+    def source_time(self, decoded_seconds):
+        """Map a recognizer timestamp to seconds on the source's audio clock"""
+        pos = decoded_seconds * self.sample_rate
+        k = max(0, bisect.bisect_right(self.anchor_decoded, pos) - 1)
+        return (self.anchor_source[k] + pos - self.anchor_decoded[k]) / self.sample_rate
+
+    def capture_time(self, seconds):
+        """perf_counter time a point on the source's audio clock was captured, or None"""
+        if not self.clock:
+            return None
+        pos = seconds * self.sample_rate
+        anchor = self.clock[0]
+        for candidate in reversed(self.clock):
+            if candidate[0] <= pos:
+                anchor = candidate
+                break
+        return anchor[1] + (pos - anchor[0]) / self.sample_rate
+
+
+class RecognitionEngine:
+    """Run a KaldiRecognizer over an audio source and dispatch results to sinks"""
+
+    def __init__(self, model, sinks=None, partials=False, vad=None, tracker=None, words=False, model_rate=None,
+                 overload="block", max_lag=MAX_LAG_SECONDS, lag_warn=LAG_WARN_SECONDS, on_lag=None, recorder=None):
+        if overload not in OVERLOAD_POLICIES:
+            raise ValueError(f"Unknown overload policy: {overload}")
+        self.model = model
+        # Rate the model was trained at (conf/mfcc.conf); None decodes at the source's rate
+        self.model_rate = model_rate
+        self.sinks = list(sinks or [])
+        self.partials = partials  # Emit PartialResult() updates between finals
+        # Per-word start/end/conf in final results, on the source's audio clock
+        self.words = words
+        self.vad = vad  # Optional VoiceActivityDetector; silence never reaches the recognizer
+        # Shared EnergyTracker (the VAD's own when gating) for silence-dependent logic
+        self.tracker = vad.tracker if vad else tracker
+        if self.tracker is None and overload == "drop_silence":
+            self.tracker = EnergyTracker()  # Tells speech from silence for the policy
+        self.overload = overload
+        self.max_lag = max_lag
+        self.lag_warn = lag_warn
+        self.on_lag = on_lag  # Called once with the lag in seconds when it passes lag_warn
+        # Optional tap on the input audio at the decoding rate: reset(sample_rate) per run, record(pcm) per block
+        self.recorder = recorder
+        self.lagging = False  # Backlog above max_lag: the overload policy is shedding work
+        self._lag_reported = False
+        self.stats = EngineStats()
+        self._source = None
+        self._thread = None
+        self._run = EngineRun()  # The current run; a stale worker keeps its own
+        self._flush_requested = threading.Event()
+        self._carry = None  # (source, block, captured) picked up after a detach
+
+    @property
+    def sample_rate(self):
+        """Decoding rate of the current run"""
+        return self._run.sample_rate
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink):
+        if sink in self.sinks:
+            self.sinks.remove(sink)
+
+    def set_model(self, model, model_rate=None):
+        """Swap the model; the recognizer is rebuilt on the next run"""
+        if self.is_running:
+            raise RuntimeError("Cannot change model while the engine is running")
+        self.model = model
+        self.model_rate = model_rate
+
+    def _new_recognizer(self, sample_rate):
+        # A multilang.LanguageSet (or anything with create_recognizer) can stand in for the model
+        create = getattr(self.model, "create_recognizer", None)
+        if create:
+            return create(sample_rate)
+        import vosk  # Only here, so sources, sinks and tests with a stand-in model work without vosk
+        return vosk.KaldiRecognizer(self.model, sample_rate)
+
+    def _prepare(self, source):
+        sample_rate = self.model_rate or source.sample_rate
+        resampler = None
+        if sample_rate != source.sample_rate:
+            resampler = Resampler(source.sample_rate, sample_rate)
+            log.debug(f"Resampling {source.sample_rate} Hz to the model's {sample_rate} Hz")
+        rec = self._new_recognizer(sample_rate)
+        if self.words:
+            rec.SetWords(True)
+        if self.recorder:
+            self.recorder.reset(sample_rate)
+        self._set_lagging(False)
+        self._lag_reported = False
+        self.stats.reset()
+        if self.vad:
+            self.vad.reset(sample_rate)
+        elif self.tracker:
+            self.tracker.reset(sample_rate)
+        self._run = EngineRun(rec, sample_rate, resampler)
+
+    def start(self, source):
+        """Open the source and decode it on a background worker thread
+
+        A source that is already open keeps its buffered audio, which is
+        then decoded back to back until the engine has caught up.
+        """
+        if self.is_running:
+            raise RuntimeError("Engine is already running")
+        source.open()
+        self._source = source
+        self._prepare(source)
+        self._thread = threading.Thread(target=self._worker, args=(source, self._run), daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0, close_source=True):
+        """Stop the worker; with close_source=False the source keeps capturing"""
+        self._run.keep_source = not close_source
+        self._run.stop.set()
+        if self._source and close_source:
+            self._source.close()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+        self._source = None
+
+    def run(self, source):
+        """Decode a whole source on the calling thread and return the stats"""
+        source.open()
+        try:
+            self._prepare(source)
+            self._decode(source, self._run)
+        finally:
+            source.close()
+        return self.stats
+
+    def _worker(self, source, run):
+        try:
+            self._decode(source, run)
+        except Exception:
+            log.exception("Recognition worker failed")
+        finally:
+            if not run.keep_source:
+                source.close()
+
+    def _decode(self, source, run):
+        started = time.perf_counter()
+        if self._carry and self._carry[0] is source:
+            self._accept(run, self._carry[1], self._carry[2])
+        self._carry = None
+        for data in source.blocks(run.stop):
+            captured = source.block_captured
+            if run.stop.is_set():
+                if run.keep_source and run is self._run:
+                    self._carry = (source, data, captured)
+                break
+            if self._check_lag(source.lag_seconds()) and self.overload == "coalesce":
+                more = source.read_backlog(int(COALESCE_SECONDS * source.sample_rate) - len(data) // BYTES_PER_SAMPLE)
+                if more:
+                    data += more
+                    self.stats.coalesced += 1
+                    COALESCED.inc()
+            self._accept(run, data, captured)
+            if self._flush_requested.is_set():
+                self._flush_requested.clear()
+                self._flush(run)
+        # When detaching, deliver what the outgoing recognizer still holds, unless a new run has replaced it
+        if run is self._run and (not run.stop.is_set() or run.keep_source):
+            self._flush(run)
+        self.stats.wall_seconds = time.perf_counter() - started
+        if run is not self._run:
+            return  # A new run already feeds the sinks; its own end is the one they see
+        for sink in self.sinks:
+            self._call_sink(sink.on_end)
+
+    def _check_lag(self, lag):
+        """Track the backlog; True while it is above max_lag"""
+        LAG_SECONDS.set(round(lag, 2))
+        if lag > self.stats.max_lag:
+            self.stats.max_lag = lag
+        if lag > self.max_lag:
+            self._set_lagging(True)
+        elif lag < self.max_lag / 2:  # Hysteresis, so the policy doesn't flap at the threshold
+            self._set_lagging(False)
+            self._lag_reported = False
+        if lag > self.lag_warn and not self._lag_reported:
+            self._lag_reported = True
+            log.warning(f"Recognition is {lag:.1f}s behind live audio")
+            if self.on_lag:
+                try:
+                    self.on_lag(lag)
+                except Exception:
+                    log.exception("Lag callback failed")
+        return self.lagging
+
+    def _set_lagging(self, lagging):
+        if lagging == self.lagging:
+            return
+        self.lagging = lagging
+        if lagging:
+            log.info(f"Recognition lagging, overload policy: {self.overload}")
+        if self.vad and self.overload == "drop_silence":
+            self.vad.shedding = lagging
+
+    def accept(self, data, captured=None):
+        """Feed one PCM block to the recognizer and dispatch any result
+
+        captured is the perf_counter time the block's first sample was
+        captured, when the source knows it.
+        """
+        self._accept(self._run, data, captured)
+
+    def _accept(self, run, data, captured=None):
+        if run.resampler:
+            data = run.resampler.process(data).tobytes()
+        if self.recorder:
+            self.recorder.record(data)
+        if captured is not None:
+            run.clock.append((run.input_samples, captured))
+        start = run.input_samples
+        run.input_samples += len(data) // BYTES_PER_SAMPLE
+        self.stats.blocks += 1
+        self.stats.audio_seconds += len(data) / (BYTES_PER_SAMPLE * run.sample_rate)
+        if self.vad is None:
+            speech = True
+            if self.tracker:
+                _, flags = self.tracker.update(data)
+                speech = self.tracker.in_speech or flags.any()
+            if not speech and self.lagging and self.overload == "drop_silence":
+                self._shed(run, data)
+                return
+            run.shed_run = False
+            self._accept_waveform(run, data, start)
+            return
+        for speech, region_ended, start in self.vad.process(data):
+            if speech:
+                self._accept_waveform(run, speech, start)
+            if region_ended:
+                self._flush(run)
+
+    def _shed(self, run, data):
+        """Skip a silent block; the utterance before it ends here"""
+        if not run.shed_run:
+            run.shed_run = True
+            self._flush(run)
+        seconds = len(data) / (BYTES_PER_SAMPLE * run.sample_rate)
+        self.stats.shed_seconds += seconds
+        SHED_MS.inc(round(seconds * 1000))
+
+    def _accept_waveform(self, run, data, source_start=None):
+        if source_start is not None:
+            # Audio was skipped before this PCM; remember where it really starts
+            expected = run.anchor_source[-1] + run.decoded_samples - run.anchor_decoded[-1]
+            if source_start != expected:
+                run.anchor_decoded.append(run.decoded_samples)
+                run.anchor_source.append(source_start)
+        run.decoded_samples += len(data) // BYTES_PER_SAMPLE
+        self.stats.decoded_seconds += len(data) / (BYTES_PER_SAMPLE * run.sample_rate)
+        t0 = time.perf_counter()
+        ended = run.rec.AcceptWaveform(data)
+        ACCEPT_MS.since(t0)
+        if ended:
+            result = self._result(run.rec.Result)
+            self.stats.decode_seconds += time.perf_counter() - t0
+            self._emit_final(run, result)
+        elif self.partials and not (self.lagging and self.overload == "coalesce"):
+            result = self._result(run.rec.PartialResult)
+            self.stats.decode_seconds += time.perf_counter() - t0
+            self._emit_partial(run, result)
+        else:
+            self.stats.decode_seconds += time.perf_counter() - t0
+
+    @staticmethod
+    def _result(fetch):
+        """Call one of the recognizer's result methods and parse its JSON, timing both"""
+        t0 = time.perf_counter()
+        raw = fetch()
+        t1 = time.perf_counter()
+        RESULT_MS.observe((t1 - t0) * 1000)
+        result = json.loads(raw)
+        JSON_PARSE_MS.since(t1)
+        return result
+
+    def request_flush(self):
+        """Ask the worker to end the current utterance after the next block"""
+        self._flush_requested.set()
+
+    def flush(self):
+        """Force out whatever the recognizer is still holding"""
+        self._flush(self._run)
+
+    def _flush(self, run):
+        t0 = time.perf_counter()
+        result = self._result(run.rec.FinalResult)
+        self.stats.decode_seconds += time.perf_counter() - t0
+        self._emit_final(run, result)
+
+    def vad_report(self):
+        """Skipped audio and estimated CPU saved by the VAD this session"""
+        if not self.vad:
+            return None
+        cost = self.stats.decode_seconds / self.stats.decoded_seconds if self.stats.decoded_seconds else None
+        return self.vad.report(cost)
+
+    def _emit_partial(self, run, result):
+        text = result.get("partial", "").strip()
+        if text == run.last_partial or run is not self._run:
+            return
+        run.last_partial = text
+        started = time.perf_counter()
+        for sink in self.sinks:
+            self._call_sink(sink.on_partial, text, result)
+        SINK_MS.since(started)
+
+    def source_time(self, decoded_seconds):
+        """Map a recognizer timestamp to seconds on the source's audio clock"""
+        return self._run.source_time(decoded_seconds)
+
+    def capture_time(self, seconds):
+        """perf_counter time a point on the source's audio clock was captured, or None"""
+        return self._run.capture_time(seconds)
+
+    def _emit_final(self, run, result):
+        run.last_partial = ""
+        text = result.get("text", "").strip()
+        if not text or run is not self._run:
+            return  # A stale worker's results are on a clock the sinks have moved past
+        words = result.get("result")
+        if words:
+            # Always mapped: after pruning, a single anchor can still be far from (0, 0).
+            # Anchors before the end of this utterance are never needed again
+            k = max(0, bisect.bisect_right(run.anchor_decoded, words[-1]["end"] * run.sample_rate) - 1)
+            for word in words:
+                word["start"] = round(run.source_time(word["start"]), 3)
+                word["end"] = round(run.source_time(word["end"]), 3)
+            del run.anchor_decoded[:k]
+            del run.anchor_source[:k]
+        if run.clock:
+            # When the utterance was spoken, for end-to-end latency downstream
+            if words:
+                result["captured_start"] = run.capture_time(words[0]["start"])
+                result["captured_end"] = run.capture_time(words[-1]["end"])
+            else:
+                result["captured_end"] = run.capture_time(run.input_samples / run.sample_rate)
+        self.stats.finals += 1
+        FINALS.inc()
+        started = time.perf_counter()
+        for sink in self.sinks:
+            self._call_sink(sink.on_final, text, result)
+        SINK_MS.since(started)
+
+    def _call_sink(self, method, *args):
+        try:
+            method(*args)
+        except Exception:
+            log.exception("Result sink failed")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules live side by side in VoskSTT/, as the app and benchmarks import them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
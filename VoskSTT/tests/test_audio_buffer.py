@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from audio_buffer import AudioRingBuffer, CaptureClock
+
+
+def ramp(start, count):
+    return np.arange(start, start + count, dtype=np.int16)
+
+
+def test_reads_come_back_in_order_across_the_wrap():
+    ring = AudioRingBuffer(10)
+    ring.write(ramp(0, 7))
+    assert np.frombuffer(ring.read(5), dtype=np.int16).tolist() == list(range(5))
+    ring.write(ramp(7, 6))  # Wraps past the end of the ring
+    assert ring.available() == 8
+    data = ring.read(8)
+    assert np.frombuffer(data, dtype=np.int16).tolist() == list(range(5, 13))
+    assert ring.read(4) == b''
+
+
+def test_a_read_is_not_changed_by_later_writes():
+    ring = AudioRingBuffer(8)
+    ring.write(ramp(0, 6))
+    ring.read(4)
+    ring.write(ramp(6, 6))
+    first = ring.read(6)  # Staged across the wrap
+    ring.write(ramp(100, 6))
+    ring.read(6)
+    assert np.frombuffer(first, dtype=np.int16).tolist() == list(range(4, 10))
+
+
+def test_overrun_drops_what_does_not_fit():
+    ring = AudioRingBuffer(8)
+    assert ring.write(ramp(0, 6)) == 6
+    assert ring.write(ramp(6, 6)) == 2
+    assert ring.overruns == 4
+    assert np.frombuffer(ring.read(100), dtype=np.int16).tolist() == list(range(8))
+
+
+def test_wait_times_out_until_enough_is_buffered():
+    ring = AudioRingBuffer(16)
+    ring.write(ramp(0, 4))
+    assert not ring.wait(8, timeout=0.01)
+    ring.write(ramp(4, 4))
+    assert ring.wait(8, timeout=0.01)
+    ring.clear()
+    assert ring.available() == 0
+
+
+def test_capture_clock_interpolates_from_the_newest_earlier_stamp():
+    clock = CaptureClock(1000, size=4)
+    assert clock.time_at(0) is None
+    for i in range(6):  # The first two stamps are overwritten
+        clock.stamp(i * 100, 10.0 + i)
+    assert clock.time_at(350) == pytest.approx(13.05)
+    assert clock.time_at(150) == pytest.approx(11.95)  # Before every kept stamp: extrapolated back from the oldest
@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from delivery import DeliveryWorker, MemoryBackend, create_backend
+
+
+@pytest.fixture
+def worker():
+    workers = []
+
+    def make(backend=None, **callbacks):
+        workers.append(DeliveryWorker(backend or MemoryBackend(), **callbacks))
+        workers[-1].start()
+        return workers[-1]
+
+    yield make
+    for w in workers:
+        w.stop()
+
+
+def test_text_and_enter_are_delivered_in_order(worker):
+    delivered = []
+    w = worker(on_delivered=lambda text, latency, tag: delivered.append((text, tag)))
+    w.deliver("hello ", tag="live")
+    w.press_enter(tag="live")
+    w.deliver("world")
+    assert w.wait_idle(5)
+    assert w.backend.text() == "hello world"
+    assert w.backend.enters == 1
+    assert delivered == [("hello ", "live"), (None, "live"), ("world", None)]
+    assert w.pending == 0
+    assert w.latency_stats()["utterances"] == 2
+
+
+def test_unfocusable_target_fails_without_sending(worker):
+    failed = []
+    w = worker(MemoryBackend(focus_ok=False), on_failed=failed.append)
+    w.deliver("lost", target=1234)
+    assert w.wait_idle(5)
+    assert failed == ["lost"]
+    assert w.backend.outputs == []
+
+
+def test_a_failing_backend_does_not_stop_the_worker(worker):
+    class Flaky(MemoryBackend):
+        def send(self, text):
+            if text == "boom":
+                raise OSError("target closed")
+            super().send(text)
+
+    failed = []
+    w = worker(Flaky(), on_failed=failed.append)
+    w.deliver("boom")
+    w.deliver("fine")
+    assert w.wait_idle(5)
+    assert failed == ["boom"]
+    assert w.backend.text() == "fine"
+
+
+def test_on_idle_follows_the_last_queued_job(worker):
+    release = threading.Event()
+    went_idle = threading.Event()
+    idle = []
+
+    class Slow(MemoryBackend):
+        def send(self, text):
+            release.wait(5)
+            super().send(text)
+
+    w = worker(Slow(), on_idle=lambda: idle.append(w.pending) or went_idle.set())
+    w.deliver("a")
+    w.deliver("b")
+    assert w.pending == 2 and not w.wait_idle(0.01)
+    release.set()
+    assert went_idle.wait(5)
+    assert idle == [0]
+
+
+def test_unknown_backend_name_is_refused():
+    assert isinstance(create_backend("memory"), MemoryBackend)
+    with pytest.raises(ValueError):
+        create_backend("carrier-pigeon")
@@ -0,0 +1,70 @@
+import json
+import os
+import time
+
+from journal import SessionJournal, day_of, make_record, parse_day
+
+DAY = 24 * 3600
+
+
+def fill(directory, entries):
+    """Journal of (text, end time) entries, written and closed"""
+    journal = SessionJournal(str(directory), session="test")
+    journal.start()
+    for text, end_time in entries:
+        journal.append(text, model="small", end_time=end_time)
+    journal.stop()
+    return journal
+
+
+def texts(records):
+    return [r["text"] for r in records]
+
+
+def test_search_finds_records_containing_every_word_newest_first(tmp_path):
+    now = time.time()
+    journal = fill(tmp_path, [("send the report", now - 30), ("the weather report", now - 20),
+                              ("send it", now - 10)])
+    assert texts(journal.search("report")) == ["the weather report", "send the report"]
+    assert texts(journal.search("send report")) == ["send the report"]
+    assert texts(journal.search("rep*")) == ["the weather report", "send the report"]
+    assert journal.search("nothing") == []
+    assert texts(journal.search("", limit=2)) == ["send it", "the weather report"]
+
+
+def test_search_is_limited_to_the_time_range(tmp_path):
+    today = parse_day(day_of(time.time())) + 12 * 3600
+    journal = fill(tmp_path, [("old report", today - 2 * DAY), ("new report", today)])
+    assert sorted(journal.days()) == [day_of(today - 2 * DAY), day_of(today)]
+    assert texts(journal.search("report", start=today - DAY)) == ["new report"]
+    assert texts(journal.search("report", end=today - DAY)) == ["old report"]
+
+
+def test_a_new_journal_searches_what_an_earlier_session_wrote(tmp_path):
+    now = time.time()
+    fill(tmp_path, [("first session", now - 60)])
+    for name in os.listdir(tmp_path):
+        if name.endswith(".idx.json") or name == "vocab.json":
+            os.remove(tmp_path / name)  # Indexes are rebuilt from the journal
+    journal = fill(tmp_path, [("second session", now)])
+    assert texts(journal.search("session")) == ["second session", "first session"]
+
+
+def test_torn_last_line_is_skipped_and_the_next_append_starts_fresh(tmp_path):
+    now = time.time()
+    fill(tmp_path, [("kept", now - 60)])
+    path = tmp_path / f"{day_of(now)}.jsonl"
+    with open(path, "ab") as f:
+        f.write(b'{"t": 1, "text": "torn')
+    journal = fill(tmp_path, [("after the crash", now)])
+    assert texts(journal.search("")) == ["after the crash", "kept"]
+    lines = path.read_bytes().split(b"\n")
+    assert json.loads(lines[-2])["text"] == "after the crash"
+
+
+def test_record_start_comes_from_the_word_timings():
+    result = {"result": [{"word": "a", "start": 1.0, "end": 1.5, "conf": 0.5},
+                         {"word": "b", "start": 1.5, "end": 3.0, "conf": 1.0}]}
+    record = make_record("a b", result, model="m", end_time=100.0, session="s")
+    assert record["t"] == 98.0 and record["end"] == 100.0
+    assert record["conf"] == 0.75
@@ -0,0 +1,47 @@
+import pytest
+
+from key_phrases import PhraseMatcher
+
+DEFAULT_PHRASES = ["Send it", "I'm done talking", "That's it"]
+
+
+def test_exact_phrases_match():
+    matcher = PhraseMatcher(DEFAULT_PHRASES)
+    assert matcher.search("ok send it").phrase == "send it"
+    assert matcher.search("I'm done talking.", at_end=True).phrase == "i'm done talking"
+    assert matcher.remove("that is all that's it", at_end=True) == ("that is all", "that's it")
+
+
+@pytest.mark.parametrize("text", [
+    "i will spend it",
+    "you can lend it",
+    "i sent it",
+    "what's it",
+    "i'm gone walking",
+])
+def test_near_misses_do_not_match_by_default(text):
+    assert PhraseMatcher(DEFAULT_PHRASES).search(text) is None
+
+
+@pytest.mark.parametrize("text", [
+    "i will spend it",
+    "i sent it",
+    "what's it",
+    "i'm gone walking",
+])
+def test_near_misses_do_not_match_fuzzy_phrases(text):
+    matcher = PhraseMatcher([p + "~" for p in DEFAULT_PHRASES], max_edits=1)
+    assert matcher.search(text) is None
+
+
+def test_fuzzy_phrase_needs_most_words_exact():
+    matcher = PhraseMatcher(["I'm done talking~"], max_edits=1)
+    assert matcher.search("i'm done talkin").phrase == "i'm done talking"
+    assert matcher.search("i'm gone talkin") is None
+
+
+def test_fuzziness_is_per_phrase():
+    matcher = PhraseMatcher(["I'm done talking~", "all right then"], max_edits=1)
+    assert matcher.phrases == ["all right then", "i'm done talking"]
+    assert matcher.search("i'm done talkin") is not None
+    assert matcher.search("all right than") is None
@@ -0,0 +1,68 @@
+from model_pool import ModelPool
+
+SIZES = {"/m/a": 400, "/m/b": 400, "/m/c": 400, "/m/big": 700}
+
+
+class FakeModel:
+    def __init__(self, path):
+        self.path = path
+
+
+def make_pool(budget=1000):
+    return ModelPool(budget, size_of=SIZES.get, loader=FakeModel)
+
+
+def test_least_recently_used_idle_model_is_evicted():
+    pool = make_pool()
+    a = pool.get("/m/a")
+    pool.get("/m/b")
+    assert pool.get("/m/a") is a  # Hit; b is now the oldest
+    pool.get("/m/c")
+    assert pool.contains("/m/a") and not pool.contains("/m/b")
+    assert pool.stats()["evictions"] == 1
+    assert pool.free_bytes() == 200
+
+
+def test_leased_models_stay_resident():
+    pool = make_pool()
+    pool.get("/m/a", lease=True)
+    pool.get("/m/b")
+    pool.get("/m/c")
+    assert pool.contains("/m/a") and not pool.contains("/m/b")
+
+
+def test_discarded_model_counts_until_released():
+    pool = make_pool()
+    a = pool.get("/m/a", lease=True)
+    pool.discard("/m/a")
+    assert not pool.contains("/m/a")
+    assert pool.free_bytes() == 600
+    pool.release(a)
+    assert pool.free_bytes() == 1000
+
+
+def test_borrowed_copy_counts_but_never_enters_the_pool():
+    pool = make_pool()
+    pool.get("/m/a", lease=True)
+    assert pool.fits("/m/big") is False
+    pool.set_budget(1200)
+    assert pool.fits("/m/big")
+    big = pool.borrow("/m/big")
+    assert not pool.contains("/m/big")
+    assert pool.free_bytes() == 100
+    assert pool.fits("/m/big")  # Its own copy doesn't crowd it out
+    assert not pool.fits("/m/b")
+    pool.release(big)
+    assert pool.free_bytes() == 800
+
+
+def test_borrowing_a_resident_model_shares_it():
+    pool = make_pool()
+    a = pool.get("/m/a")
+    assert pool.borrow("/m/a") is a
+    pool.get("/m/b")
+    pool.get("/m/c")  # Over budget, but a is leased and b is the one to go
+    assert pool.contains("/m/a")
+    pool.release(a)
+    pool.release(a)  # Extra releases are ignored
+    assert pool.stats()["leased_models"] == 0
@@ -0,0 +1,105 @@
+import json
+import socket
+
+import numpy as np
+import pytest
+
+from recognition_server import (ProtocolError, RecognitionClient, RecognitionServer, parse_header, recv_frame,
+                                send_frame)
+
+RATE = 16000
+
+
+class OneWordRecognizer:
+    """KaldiRecognizer stand-in: one word "w" per flush, covering everything fed since the last one"""
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.fed = 0
+
+    def SetWords(self, enabled):
+        pass
+
+    def AcceptWaveform(self, data):
+        self.fed += len(data) // 2
+        return False
+
+    def PartialResult(self):
+        return json.dumps({"partial": "w" if self.fed else ""})
+
+    def FinalResult(self):
+        if not self.fed:
+            return json.dumps({"text": ""})
+        result = {"text": "w", "result": [{"word": "w", "start": 0.0, "end": self.fed / self.sample_rate}]}
+        self.fed = 0
+        return json.dumps(result)
+
+
+class StubModel:
+    def create_recognizer(self, sample_rate):
+        return OneWordRecognizer(sample_rate)
+
+
+class StubCatalog:
+    def get(self, language=None):
+        if language not in (None, "en"):
+            raise KeyError(f"No model for language {language!r} (available: en)")
+        return "en", "/models/stub-en", StubModel(), None
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = RecognitionServer(StubCatalog(), ("127.0.0.1", 0), max_sessions=2)
+    server.start()
+    yield server
+    server.close()
+
+
+def exchange(server, header):
+    """Send a raw header frame; the first message the server answers with"""
+    with socket.create_connection(server.address, timeout=5) as sock:
+        send_frame(sock, header)
+        return json.loads(sock.makefile("r", encoding="utf-8").readline())
+
+
+@pytest.mark.parametrize("header, problem", [
+    (b"[]", "JSON object"),
+    (b'"en"', "JSON object"),
+    (b"42", "JSON object"),
+    (b"{not json", "not valid JSON"),
+    (b"\xff\xfe", "not valid JSON"),
+    (b'{"language": ["en"]}', "language"),
+    (b'{"sample_rate": null}', "sample_rate"),
+    (b'{"sample_rate": "fast"}', "sample_rate"),
+    (b'{"sample_rate": 0}', "sample_rate"),
+])
+def test_malformed_headers_get_an_error_message(server, header, problem):
+    with pytest.raises(ProtocolError):
+        parse_header(header)
+    message = exchange(server, header)
+    assert message["type"] == "error" and problem in message["message"]
+
+
+def test_unknown_language_is_reported(server):
+    message = exchange(server, json.dumps({"language": "xx"}).encode())
+    assert message == {"type": "error", "message": "No model for language 'xx' (available: en)"}
+
+
+def test_session_streams_results_back(server):
+    audio = np.zeros(RATE, dtype=np.int16).tobytes()
+    with RecognitionClient(server.address, words=True) as client:
+        assert client.ready["model"] == "stub-en"
+        client.send(audio)
+        client.finish()
+        messages = list(client.messages())
+    assert [m["type"] for m in messages] == ["final", "end"]
+    assert messages[0]["result"][0]["end"] == pytest.approx(1.0)
+    assert messages[1]["stats"]["finals"] == 1
+
+
+def test_oversized_frame_is_refused():
+    a, b = socket.socketpair()
+    with a, b:
+        a.sendall((2 ** 31).to_bytes(4, "big"))
+        with pytest.raises(ProtocolError):
+            recv_frame(b)
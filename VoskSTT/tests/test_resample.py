@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from resample import Resampler, resample_pcm
+
+
+def tone(freq, seconds, rate, amplitude=10000):
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+
+
+def dominant_frequency(samples, rate):
+    spectrum = np.abs(np.fft.rfft(samples * np.hanning(len(samples))))
+    return np.argmax(spectrum) * rate / len(samples)
+
+
+@pytest.mark.parametrize("in_rate, out_rate", [(48000, 16000), (44100, 16000), (8000, 16000)])
+def test_tone_keeps_its_pitch_and_length(in_rate, out_rate):
+    out = np.frombuffer(resample_pcm(tone(440, 1.0, in_rate).tobytes(), in_rate, out_rate), dtype=np.int16)
+    assert abs(len(out) - out_rate) <= 2
+    assert dominant_frequency(out[1000:-1000], out_rate) == pytest.approx(440, abs=5)
+
+
+def test_blockwise_output_matches_one_shot():
+    audio = tone(300, 0.5, 48000)
+    resampler = Resampler(48000, 16000, max_block=480)
+    parts = [resampler.process(audio[i:i + 480]).copy() for i in range(0, len(audio), 480)]
+    parts.append(resampler.flush().copy())
+    assert np.array_equal(np.concatenate(parts), np.frombuffer(resample_pcm(audio, 48000, 16000), dtype=np.int16))
+
+
+def test_frequencies_above_the_new_nyquist_are_filtered_out():
+    out = Resampler(48000, 16000, max_block=48000).process(tone(12000, 1.0, 48000))
+    assert np.sqrt(np.mean(out[100:-100].astype(np.float64) ** 2)) < 100  # Would alias to 4 kHz
+
+
+def test_float_stereo_is_mixed_down_and_scaled():
+    left = np.full(1000, 0.5, dtype=np.float32)
+    stereo = np.stack([left, -left * 0.5], axis=1).ravel()
+    out = Resampler(16000, 16000, channels=2, in_dtype='float32').process(stereo.tobytes())
+    assert len(out) == 1000
+    assert out[0] == pytest.approx(0.125 * 32767, abs=2)
+
+
+def test_blocks_larger_than_max_block_grow_the_buffers():
+    resampler = Resampler(32000, 16000, max_block=16)
+    out = resampler.process(tone(200, 0.1, 32000))
+    assert resampler.max_block == 3200
+    assert abs(len(out) - 1600) <= resampler.half
+
+
+def test_unsupported_format_is_refused():
+    with pytest.raises(ValueError):
+        Resampler(48000, 16000, in_dtype='int32')
@@ -0,0 +1,233 @@
+import json
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from stt_engine import AudioSource, CollectingSink, MicrophoneSource, PcmIteratorSource, RecognitionEngine
+from vad import VoiceActivityDetector
+
+RATE = 16000
+
+
+class StubRecognizer:
+    """KaldiRecognizer stand-in: one word per utterance, spanning the audio it was fed
+
+    Like Kaldi's endpointer it also ends an utterance by itself once
+    utterance_seconds of audio have gone in.
+    """
+
+    def __init__(self, sample_rate, utterance_seconds=0.5):
+        self.sample_rate = sample_rate
+        self.utterance = int(utterance_seconds * sample_rate)
+        self.decoded = 0  # Samples fed, i.e. the recognizer's own clock
+        self.start = 0
+        self.words = False
+
+    def SetWords(self, enabled):
+        self.words = enabled
+
+    def AcceptWaveform(self, data):
+        self.decoded += len(data) // 2
+        return self.decoded - self.start >= self.utterance
+
+    def PartialResult(self):
+        return json.dumps({"partial": "w" if self.decoded > self.start else ""})
+
+    def Result(self):
+        return self.FinalResult()
+
+    def FinalResult(self):
+        if self.decoded == self.start:
+            return json.dumps({"text": ""})
+        word = {"word": "w", "start": self.start / self.sample_rate, "end": self.decoded / self.sample_rate,
+                "conf": 1.0}
+        self.start = self.decoded
+        return json.dumps({"text": "w", "result": [word]})
+
+
+class StubModel:
+    def __init__(self):
+        self.recognizers = []
+
+    def create_recognizer(self, sample_rate):
+        self.recognizers.append(StubRecognizer(sample_rate))
+        return self.recognizers[-1]
+
+
+class HeldRecognizer(StubRecognizer):
+    """Blocks in AcceptWaveform until released, like a decoder stuck on a slow block"""
+
+    def __init__(self, sample_rate):
+        super().__init__(sample_rate)
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.flushed = False
+
+    def AcceptWaveform(self, data):
+        self.entered.set()
+        self.release.wait(5)
+        return super().AcceptWaveform(data)
+
+    def FinalResult(self):
+        self.flushed = True
+        return super().FinalResult()
+
+
+class QueueSource(AudioSource):
+    """Live source fed by the test; honours the stop event like MicrophoneSource"""
+    realtime = True
+
+    def __init__(self):
+        self.queue = queue.Queue()
+
+    def blocks(self, stop=None):
+        while not (stop and stop.is_set()):
+            try:
+                yield self.queue.get(timeout=0.01)
+            except queue.Empty:
+                pass
+
+
+def voiced(seconds):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (3000 * np.sin(2 * np.pi * 150 * t)).astype(np.int16)
+
+
+def silence(seconds):
+    return np.random.default_rng(0).normal(0, 30, int(seconds * RATE)).astype(np.int16)
+
+
+def blocks(audio, block=RATE // 2):
+    return [audio[i:i + block].tobytes() for i in range(0, len(audio), block)]
+
+
+def test_vad_gated_word_times_follow_the_source_clock():
+    # (start, end) of each speech region on the source clock
+    regions = [(1.0, 2.0), (4.0, 5.0), (7.0, 8.5), (11.5, 12.0)]
+    parts, at = [], 0.0
+    for start, end in regions:
+        parts += [silence(start - at), voiced(end - start)]
+        at = end
+    parts.append(silence(2.0))
+    sink = CollectingSink()
+    engine = RecognitionEngine(StubModel(), sinks=[sink], vad=VoiceActivityDetector(RATE), words=True)
+    engine.run(PcmIteratorSource(blocks(np.concatenate(parts)), RATE))
+
+    words = [w for r in sink.results for w in r["result"]]
+    times = [t for w in words for t in (w["start"], w["end"])]
+    assert times == sorted(times)
+    # Every region is covered by words from its start (less pre-roll) to its end (plus hangover)
+    vad = engine.vad
+    for start, end in regions:
+        inside = [w for w in words if start - 1.0 < w["start"] < end]
+        assert start - vad.preroll_ms / 1000 - 0.05 <= inside[0]["start"] <= start + 0.05
+        assert end <= inside[-1]["end"] <= end + vad.hangover_ms / 1000 + 0.05
+    assert sum(w["end"] - w["start"] for w in words) == pytest.approx(engine.stats.decoded_seconds, abs=0.01)
+
+
+def test_stopped_microphone_leaves_buffered_audio_for_the_next_reader():
+    source = MicrophoneSource(RATE, block_size=RATE // 10)
+    source._running = True  # As if opened, without a device
+    source.clock.stamp(0, 0.0)
+    source.ring.write(voiced(0.5))
+    stop = threading.Event()
+    stop.set()
+    assert list(source.blocks(stop)) == []
+    assert source.ring.available() == RATE // 2
+
+
+def test_stale_worker_keeps_its_own_recognizer():
+    model = StubModel()
+    sink = CollectingSink()
+    engine = RecognitionEngine(model, sinks=[sink], words=True)
+    source = QueueSource()
+    model.create_recognizer = lambda rate: model.recognizers.append(HeldRecognizer(rate)) or model.recognizers[-1]
+    engine.start(source)
+    held = model.recognizers[0]
+    source.queue.put(voiced(0.25).tobytes())
+    assert held.entered.wait(5)
+    engine.stop(timeout=0.05, close_source=False)  # Gives up on the stuck worker
+    del model.create_recognizer
+    engine.start(source)
+    fresh = model.recognizers[1]
+    held.release.set()
+    for block in blocks(voiced(1.0), RATE // 4):
+        source.queue.put(block)
+    engine.request_flush()
+    deadline = time.monotonic() + 5
+    while fresh.decoded < RATE and time.monotonic() < deadline:
+        time.sleep(0.01)
+    engine.stop(close_source=False)
+
+    assert held.decoded == RATE // 4 and not held.flushed
+    assert fresh.decoded == RATE
+    # Only the live run's results reach the sinks, all on its clock
+    assert sum(w["end"] - w["start"] for r in sink.results for w in r["result"]) == pytest.approx(1.0)
+
+
+class RecordingSink(CollectingSink):
+    def __init__(self):
+        super().__init__()
+        self.partials = []
+        self.ends = 0
+
+    def on_partial(self, text, result):
+        self.partials.append(text)
+
+    def on_end(self):
+        self.ends += 1
+
+
+def test_source_blocks_flow_to_every_sink_and_the_tail_is_flushed():
+    first, second = RecordingSink(), RecordingSink()
+    engine = RecognitionEngine(StubModel(), sinks=[first, second], partials=True, words=True)
+    stats = engine.run(PcmIteratorSource(blocks(voiced(1.2), RATE // 10), RATE))
+
+    # Two utterances ended by the recognizer, the last 0.2 s by the flush at the end of the source
+    assert [round(r["result"][0]["end"] - r["result"][0]["start"], 2) for r in first.results] == [0.5, 0.5, 0.2]
+    assert second.results == first.results
+    assert first.ends == second.ends == 1
+    assert first.partials == ["w", "w", "w"]  # Once per utterance; repeats of the same partial are dropped
+    assert stats.blocks == 12 and stats.finals == 3
+    assert stats.audio_seconds == pytest.approx(1.2)
+
+
+def test_source_audio_is_resampled_to_the_model_rate():
+    model = StubModel()
+    sink = CollectingSink()
+    engine = RecognitionEngine(model, sinks=[sink], words=True, model_rate=RATE)
+    engine.run(PcmIteratorSource(blocks(np.zeros(48000, dtype=np.int16), 4800), 48000))
+    assert model.recognizers[0].sample_rate == RATE
+    assert abs(model.recognizers[0].decoded - RATE) <= 32  # Less what the filter still holds
+    assert sink.results[-1]["result"][0]["end"] <= 1.0
+
+
+def test_detaching_flushes_the_held_utterance_but_closing_drops_it():
+    for close_source, expected in ((False, 1), (True, 0)):
+        model = StubModel()
+        sink = RecordingSink()
+        engine = RecognitionEngine(model, sinks=[sink], words=True)
+        source = QueueSource()
+        engine.start(source)
+        source.queue.put(voiced(0.25).tobytes())  # Less than an utterance: the recognizer holds it
+        deadline = time.monotonic() + 5
+        while model.recognizers[0].decoded < RATE // 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        engine.stop(close_source=close_source)
+        assert len(sink.results) == expected
+        assert sink.ends == 1
+
+
+def test_skipped_audio_keeps_word_times_on_the_source_clock():
+    sink = CollectingSink()
+    engine = RecognitionEngine(StubModel(), sinks=[sink], words=True)
+    engine.run(PcmIteratorSource([], RATE))
+    # Fed by hand: 0.5 s, then a block that really starts 2 s later on the source clock
+    engine._accept_waveform(engine._run, voiced(0.5).tobytes(), 0)
+    engine._accept_waveform(engine._run, voiced(0.5).tobytes(), 3 * RATE)
+    starts = [r["result"][0]["start"] for r in sink.results]
+    assert starts == [0.0, 3.0]
+    assert engine.source_time(0.75) == pytest.approx(3.25)
@@ -0,0 +1,41 @@
+import numpy as np
+
+from vad import EnergyTracker, VoiceActivityDetector
+
+RATE = 16000
+
+
+def voiced(seconds, amplitude=3000, pitch=150):
+    """Low-ZCR stand-in for voiced speech"""
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * pitch * t)).astype(np.int16)
+
+
+def hum(seconds, amplitude=40):
+    rng = np.random.default_rng(0)
+    return rng.normal(0, amplitude, int(seconds * RATE)).astype(np.int16)
+
+
+def test_speech_at_capture_start_is_detected():
+    tracker = EnergyTracker(RATE)
+    _, flags = tracker.update(voiced(0.5).tobytes())
+    assert flags.all()
+    assert tracker.noise_floor < 2 * tracker.min_threshold
+
+
+def test_vad_forwards_opening_words():
+    vad = VoiceActivityDetector(RATE)
+    audio = np.concatenate((voiced(1.0), hum(1.0)))
+    block = RATE // 2  # Capture-sized blocks, so the first one is all speech
+    segments = [s for i in range(0, len(audio), block) for s in vad.process(audio[i:i + block].tobytes())]
+    assert segments[0][2] == 0
+    assert sum(len(speech) for speech, _, _ in segments) >= RATE * 2  # The whole first second, as int16
+    assert segments[-1][1]
+
+
+def test_floor_follows_quiet_room_down():
+    tracker = EnergyTracker(RATE)
+    tracker.update(hum(1.0).tobytes())
+    assert tracker.noise_floor < 100
+    _, flags = tracker.update(hum(0.5).tobytes())
+    assert not flags.any()
@@ -0,0 +1,120 @@
+import io
+
+import pytest
+
+from word_store import RUN_GAP_SECONDS, WordStore
+
+
+def final(words, segment=None):
+    """A recognizer final result with one (word, start, end) per word"""
+    result = {"text": " ".join(w for w, _, _ in words),
+              "result": [{"word": w, "start": s, "end": e, "conf": 1.0} for w, s, e in words]}
+    if segment is not None:
+        result["segment"] = segment
+    return result
+
+
+def feed(store, result):
+    store.on_final(result["text"], result)
+
+
+def test_runs_are_laid_out_one_after_another():
+    store = WordStore()
+    feed(store, final([("one", 0.5, 1.0), ("two", 1.2, 1.6)]))
+    store.on_end()
+    feed(store, final([("three", 0.2, 0.7)]))  # The next run's clock starts at 0 again
+
+    starts = list(store.start[:len(store)])
+    assert starts == sorted(starts)
+    assert store.start[2] == pytest.approx(1.6 + RUN_GAP_SECONDS + 0.2)
+    cue_starts = [start for start, _, _ in store.cues()]
+    assert cue_starts == sorted(cue_starts)
+
+
+def test_replace_utterance_finds_the_segment_not_a_start_time():
+    store = WordStore()
+    feed(store, final([("hello", 0.0, 0.4)], segment=0))
+    store.on_end()
+    feed(store, final([("world", 0.0, 0.4)], segment=1))  # Same run-relative start as segment 0
+
+    assert store.replace_utterance(0, final([("yellow", 0.0, 0.4)]))
+    assert store.text() == "yellow world"
+    assert store.start[0] == 0.0
+
+    assert store.replace_utterance(1, final([("whirled", 0.1, 0.5)]))
+    assert store.text() == "yellow whirled"
+    assert store.start[1] == pytest.approx(0.4 + RUN_GAP_SECONDS + 0.1)
+    assert not store.replace_utterance(1, final([("again", 0.0, 0.1)]))  # Rescored only once
+    assert not store.replace_utterance(7, final([("nope", 0.0, 0.1)]))
+
+
+def test_replace_utterance_with_more_words_keeps_order():
+    store = WordStore()
+    feed(store, final([("a", 0.0, 0.2)], segment=0))
+    feed(store, final([("b", 1.0, 1.2)], segment=1))
+    assert store.replace_utterance(0, final([("x", 0.0, 0.1), ("y", 0.1, 0.2)]))
+    assert store.text() == "x y b"
+    assert [list(span) for span in store.utterance_spans()] == [[0, 2], [2, 3]]
+
+
+def test_arrays_grow_past_their_capacity():
+    store = WordStore(capacity=2)
+    for i in range(10):
+        feed(store, final([(f"w{i}", i, i + 0.5)]))
+    assert len(store) == 10
+    assert store.text().split() == [f"w{i}" for i in range(10)]
+
+
+def test_oldest_utterances_are_trimmed_at_the_cap():
+    store = WordStore(capacity=4, max_words=8)
+    for i in range(5):  # Two words per utterance
+        feed(store, final([(f"a{i}", 2 * i, 2 * i + 0.5), (f"b{i}", 2 * i + 0.5, 2 * i + 1)], segment=i))
+    # The fifth utterance didn't fit: a quarter of the cap went, rounded up to whole utterances
+    assert store.text() == "a2 b2 a3 b3 a4 b4"
+    assert store.trimmed == 4
+    assert len(store.start) == 8
+    assert [list(span) for span in store.utterance_spans()] == [[0, 2], [2, 4], [4, 6]]
+    assert not store.replace_utterance(1, final([("gone", 2.0, 2.5)]))
+    assert store.replace_utterance(3, final([("kept", 6.0, 7.0)]))
+    assert store.text() == "a2 b2 kept a4 b4"
+    assert next(store.cues())[0] == 4.0
+
+
+def test_no_cap_keeps_every_word():
+    store = WordStore(capacity=2, max_words=None)
+    for i in range(50):
+        feed(store, final([(f"w{i}", i, i + 0.5)]))
+    assert len(store) == 50 and store.trimmed == 0
+
+
+def test_words_without_timings_are_stored_but_not_captioned():
+    store = WordStore()
+    store.on_final("no times here", {"text": "no times here"})
+    feed(store, final([("timed", 2.0, 2.5)]))
+    assert store.text() == "no times here timed"
+    assert [text for _, _, text in store.cues()] == ["timed"]
+
+
+def test_srt_and_vtt_exports():
+    store = WordStore()
+    feed(store, final([("hello", 0.0, 0.5), ("there", 0.6, 1.0)]))
+    feed(store, final([("again", 3.0, 3.5)]))
+
+    srt = io.StringIO()
+    store.write_srt(srt)
+    assert srt.getvalue().startswith("1\n00:00:00,000 --> 00:00:01,000\nhello there\n")
+    assert "2\n00:00:03,000 --> 00:00:03,500\nagain\n" in srt.getvalue()
+
+    vtt = io.StringIO()
+    store.write_vtt(vtt)
+    assert vtt.getvalue().startswith("WEBVTT")
+    assert "00:00:03.000 --> 00:00:03.500" in vtt.getvalue()
+
+
+def test_export_picks_the_format_by_extension(tmp_path):
+    store = WordStore()
+    feed(store, final([("hello", 0.0, 0.5)]))
+    store.export(str(tmp_path / "out.json"))
+    assert "hello" in (tmp_path / "out.json").read_text(encoding="utf-8")
+    with pytest.raises(ValueError):
+        store.export(str(tmp_path / "out.txt"))
@@ -0,0 +1,224 @@
+"""Frame-level activity tracking and voice-activity gating.
+
+EnergyTracker is the one place audio energy gets measured. It cuts audio
+into short frames, computes vectorized per-frame RMS energy and
+zero-crossing rate, follows the room's noise floor and decides
+speech/silence with hysteresis. Silence is timed on the audio clock
+(samples seen), not wall-clock time. VoiceActivityDetector and live-mode
+auto-Enter both consume its decisions instead of computing RMS themselves.
+"""
+import logging
+from collections import deque
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+DEFAULT_FRAME_MS = 20
+DEFAULT_MIN_THRESHOLD = 300  # int16 RMS; speech needs at least this even in a silent room
+DEFAULT_ZCR_MAX = 0.35  # Hiss and fan noise cross zero far more often than voiced speech
+ON_RATIO = 3.0  # Speech starts this far above the noise floor...
+OFF_RATIO = 2.0  # ...and only ends once energy falls below this (hysteresis)
+LOUD_FACTOR = 4.0  # Frames this far above the on-threshold count as speech regardless of ZCR
+FLOOR_FALL = 0.3  # Noise floor follows quiet frames quickly...
+FLOOR_RISE = 0.01  # ...and louder background slowly
+FLOOR_RISE_IN_SPEECH = 0.0002  # Lets a lasting jump in background noise end a "speech" run eventually
+DEFAULT_HANGOVER_MS = 600
+DEFAULT_PREROLL_MS = 300
+
+
+class EnergyTracker:
+    """Per-frame energy, adaptive noise floor and speech/silence state"""
+
+    def __init__(self, sample_rate=16000, frame_ms=DEFAULT_FRAME_MS,
+                 min_threshold=DEFAULT_MIN_THRESHOLD, zcr_max=DEFAULT_ZCR_MAX):
+        self.frame_ms = frame_ms
+        self.min_threshold = min_threshold
+        self.zcr_max = zcr_max
+        self.listeners = []  # Called with the tracker after every update
+        self.reset(sample_rate)
+
+    def reset(self, sample_rate=None):
+        if sample_rate:
+            self.sample_rate = sample_rate
+        self.frame_len = self.sample_rate * self.frame_ms // 1000
+        self._leftover = np.zeros(0, dtype=np.int16)
+        self.noise_floor = None
+        self.in_speech = False
+        self.speech_seen = False
+        self.position = 0  # Samples consumed, i.e. the audio clock
+        self.last_speech_time = 0.0  # Audio-clock time of the end of the last speech frame
+        self.last_energy = 0.0
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    @property
+    def now(self):
+        """Current audio-clock time in seconds"""
+        return self.position / self.sample_rate
+
+    @property
+    def silence_seconds(self):
+        """Audio-clock seconds since speech last ended (0 while speaking)"""
+        if self.in_speech or not self.speech_seen:
+            return 0.0
+        return self.now - self.last_speech_time
+
+    @property
+    def thresholds(self):
+        floor = self.noise_floor or 0.0
+        on = max(self.min_threshold, floor * ON_RATIO)
+        off = max(self.min_threshold * OFF_RATIO / ON_RATIO, floor * OFF_RATIO)
+        return on, off
+
+    def features(self, frames):
+        """Vectorized RMS energy and zero-crossing rate per frame"""
+        x = frames.astype(np.float32)
+        energy = np.sqrt(np.mean(x * x, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame_len - 1)
+        return energy, zcr
+
+    def update(self, data):
+        """Consume a PCM block; return (frames, speech flags) for the whole frames in it"""
+        samples = np.frombuffer(data, dtype=np.int16)
+        if len(self._leftover):
+            samples = np.concatenate((self._leftover, samples))
+        usable = len(samples) - len(samples) % self.frame_len
+        self._leftover = samples[usable:].copy()
+        frames = samples[:usable].reshape(-1, self.frame_len)
+        flags = np.zeros(len(frames), dtype=bool)
+        if len(frames):
+            energy, zcr = self.features(frames)
+            if self.noise_floor is None:
+                # Never seed above min_threshold: capture may start mid-sentence,
+                # and a floor at speech level would gate out the opening words
+                self.noise_floor = min(float(energy.min()), float(self.min_threshold))
+            for i in range(len(frames)):
+                e = float(energy[i])
+                on, off = self.thresholds
+                if self.in_speech:
+                    self.in_speech = e >= off
+                    self.noise_floor += (e - self.noise_floor) * FLOOR_RISE_IN_SPEECH
+                else:
+                    self.in_speech = (e > on and zcr[i] < self.zcr_max) or e > on * LOUD_FACTOR
+                    if not self.in_speech:
+                        rate = FLOOR_FALL if e < self.noise_floor else FLOOR_RISE
+                        self.noise_floor += (e - self.noise_floor) * rate
+                if self.in_speech:
+                    self.speech_seen = True
+                    self.last_speech_time = (self.position + (i + 1) * self.frame_len) / self.sample_rate
+                flags[i] = self.in_speech
+            self.last_energy = float(energy[-1])
+            self.position += usable
+        for listener in self.listeners:
+            try:
+                listener(self)
+            except Exception:
+                log.exception("Energy tracker listener failed")
+        return frames, flags
+
+
+class VoiceActivityDetector:
+    """Forward speech regions with hangover and pre-roll, based on an EnergyTracker"""
+
+    def __init__(self, sample_rate=16000, tracker=None,
+                 hangover_ms=DEFAULT_HANGOVER_MS, preroll_ms=DEFAULT_PREROLL_MS):
+        self.tracker = tracker or EnergyTracker(sample_rate)
+        self.hangover_ms = hangover_ms
+        self.preroll_ms = preroll_ms
+        # Set while the recognizer lags: regions end on their first silent frame, without pre-roll
+        self.shedding = False
+        self.reset(sample_rate)
+
+    @property
+    def frame_ms(self):
+        return self.tracker.frame_ms
+
+    def reset(self, sample_rate=None):
+        self.tracker.reset(sample_rate)
+        self.hangover_frames = max(1, self.hangover_ms // self.frame_ms)
+        self._preroll = deque(maxlen=max(0, self.preroll_ms // self.frame_ms))
+        self._hang = 0
+        self.in_speech = False
+        self.total_frames = 0
+        self.speech_frames = 0  # Frames forwarded, including pre-roll and hangover
+        self.regions = 0
+
+    def process(self, data):
+        """Split a PCM block into [(speech_pcm, region_ended, start_sample), ...]
+
+        region_ended tells the caller a speech region finished after that
+        PCM, so it can flush the recognizer instead of waiting for
+        trailing silence that will never arrive. start_sample is where the
+        PCM begins on the tracker's audio clock, which lets word timings
+        from the recognizer be mapped back past the skipped silence.
+        """
+        position = self.tracker.position  # Audio clock at the first frame of this block
+        frames, flags = self.tracker.update(data)
+        frame_len = self.tracker.frame_len
+        self.total_frames += len(flags)
+        segments = []
+        current = []
+        start = None
+        for i, (frame, speech) in enumerate(zip(frames, flags)):
+            frame_pos = position + i * frame_len
+            if speech:
+                if not self.in_speech:
+                    self.in_speech = True
+                    self.regions += 1
+                    if self._preroll and not self.shedding:
+                        start = self._preroll[0][0]
+                        current.extend(f for _, f in self._preroll)
+                        self.speech_frames += len(self._preroll)
+                    self._preroll.clear()
+                self._hang = 1 if self.shedding else self.hangover_frames
+            elif self.in_speech:
+                self._hang -= 1
+                if self._hang <= 0:
+                    self.in_speech = False
+                    if start is None:
+                        start = frame_pos
+                    current.append(frame)
+                    self.speech_frames += 1
+                    segments.append((b"".join(f.tobytes() for f in current), True, start))
+                    current = []
+                    start = None
+                    continue
+            if self.in_speech:
+                if start is None:
+                    start = frame_pos
+                current.append(frame)
+                self.speech_frames += 1
+            else:
+                self._preroll.append((frame_pos, frame))
+        if current:
+            segments.append((b"".join(f.tobytes() for f in current), False, start))
+        return segments
+
+    @property
+    def total_seconds(self):
+        return self.total_frames * self.frame_ms / 1000
+
+    @property
+    def skipped_seconds(self):
+        return (self.total_frames - self.speech_frames) * self.frame_ms / 1000
+
+    def report(self, decode_seconds_per_audio_second=None):
+        """Session summary; pass the measured decode cost to estimate CPU saved"""
+        report = {
+            "audio_seconds": round(self.total_seconds, 3),
+            "speech_seconds": round(self.total_seconds - self.skipped_seconds, 3),
+            "skipped_seconds": round(self.skipped_seconds, 3),
+            "skipped_share": round(self.skipped_seconds / self.total_seconds, 3) if self.total_frames else 0.0,
+            "speech_regions": self.regions,
+            "noise_floor": round(self.tracker.noise_floor or 0.0, 1),
+        }
+        if decode_seconds_per_audio_second is not None:
+            report["cpu_seconds_saved"] = round(self.skipped_seconds * decode_seconds_per_audio_second, 3)
+        return report
@@ -0,0 +1,258 @@
+"""Columnar storage of word-level results and caption export.
+
+WordStore keeps every recognized word of a session in parallel NumPy
+arrays (start, end, confidence, word id, utterance id) with the words
+themselves interned in a vocabulary, about 28 bytes per word instead of
+a dict per word. The arrays grow by doubling up to max_words (MAX_WORDS,
+about 28 MB and a hundred hours of speech, by default); past that the
+oldest TRIM_FRACTION of the words goes, whole utterances at a time, so a
+session left running keeps its recent transcript in bounded memory.
+SRT, WebVTT and JSON exports are written cue by cue straight from the
+arrays and cover what is still stored.
+
+Each engine run starts its audio clock at 0, so as a sink the store
+shifts every run's word times to follow the previous run's last word;
+times in the store are session seconds. Utterances stored for the
+second pass are found again by their segment id, not by time.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+from result_sinks import ResultSink
+
+INITIAL_CAPACITY = 4096
+MAX_WORDS = 1000000  # Default cap; None keeps every word (batch transcription of one file)
+TRIM_FRACTION = 0.25  # Share of max_words dropped at once when the cap is hit, so trims stay rare
+CAPTION_MAX_CHARS = 42  # Usual single-line subtitle width
+CAPTION_MAX_SECONDS = 5.0
+CAPTION_MAX_GAP = 1.0  # A pause this long starts a new caption
+RUN_GAP_SECONDS = 1.0  # Session time put between the last word of one engine run and the next run
+
+
+def format_timestamp(seconds, separator):
+    ms = int(round(seconds * 1000))
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    secs, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{ms:03d}"
+
+
+class WordStore(ResultSink):
+    """Every word of a session in parallel arrays; also usable as an engine sink"""
+
+    def __init__(self, capacity=INITIAL_CAPACITY, max_words=MAX_WORDS):
+        self.vocab = []  # Word id -> word
+        self._ids = {}  # Word -> id
+        self.max_words = max_words
+        self._allocate(min(capacity, max_words) if max_words else capacity)
+        self.count = 0
+        self.utterances = 0
+        self.trimmed = 0  # Words dropped to stay under max_words
+        self.offset = 0.0  # Session seconds at which the current engine run's clock started
+        self._session_end = 0.0  # Latest word end, in session seconds
+        self._segments = {}  # Second-pass segment id -> (utterance id, run offset)
+        self.lock = threading.Lock()  # Results arrive on the engine thread, exports run elsewhere
+
+    def _allocate(self, capacity):
+        self.start = np.empty(capacity, dtype=np.float64)
+        self.end = np.empty(capacity, dtype=np.float64)
+        self.conf = np.empty(capacity, dtype=np.float32)
+        self.word_id = np.empty(capacity, dtype=np.int32)
+        self.utterance = np.empty(capacity, dtype=np.int32)
+
+    def _grow(self, needed):
+        capacity = len(self.start)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        if self.max_words:
+            capacity = max(min(capacity, self.max_words), needed)  # One oversized utterance may still exceed it
+        old = (self.start, self.end, self.conf, self.word_id, self.utterance)
+        self._allocate(capacity)
+        for new, column in zip((self.start, self.end, self.conf, self.word_id, self.utterance), old):
+            new[:self.count] = column[:self.count]
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        """Bytes held by the arrays (capacity, not just the used part)"""
+        return sum(a.nbytes for a in (self.start, self.end, self.conf, self.word_id, self.utterance))
+
+    def intern(self, word):
+        word_id = self._ids.get(word)
+        if word_id is None:
+            word_id = len(self.vocab)
+            self._ids[word] = word_id
+            self.vocab.append(word)
+        return word_id
+
+    def on_final(self, text, result):
+        with self.lock:
+            self.add_result(result, text)
+
+    def on_end(self):
+        """The engine run ended; the next one's clock starts again at 0"""
+        with self.lock:
+            if self._session_end > self.offset:
+                self.offset = self._session_end + RUN_GAP_SECONDS
+
+    def add_result(self, result, text=None):
+        """Append one final result; without word timings the words get NaN times
+
+        Word times are on the current run's clock and stored shifted by offset.
+        """
+        words = result.get("result") or []
+        if not words:
+            words = [{"word": w} for w in (text or result.get("text", "")).split()]
+        if not words:
+            return
+        n = len(words)
+        self._trim(n)
+        self._grow(self.count + n)
+        i = self.count
+        for w in words:
+            self.start[i] = w.get("start", np.nan) + self.offset
+            self.end[i] = w.get("end", np.nan) + self.offset
+            self.conf[i] = w.get("conf", np.nan)
+            self.word_id[i] = self.intern(w["word"])
+            i += 1
+        if not np.isnan(self.end[i - 1]):
+            self._session_end = max(self._session_end, float(self.end[i - 1]))
+        if result.get("segment") is not None:
+            self._segments[result["segment"]] = (self.utterances, self.offset)
+        self.utterance[self.count:i] = self.utterances
+        self.count = i
+        self.utterances += 1
+
+    def _trim(self, incoming):
+        """Drop the oldest utterances when incoming more words would pass max_words"""
+        if not self.max_words or self.count + incoming <= self.max_words:
+            return
+        need = self.count + incoming - int(self.max_words * (1 - TRIM_FRACTION))
+        if need >= self.count:
+            k = self.count
+        else:
+            # Utterance ids ascend through the arrays; cut after the utterance holding word need - 1
+            k = int(np.searchsorted(self.utterance[:self.count], self.utterance[need - 1], side='right'))
+        kept = self.count - k
+        for column in (self.start, self.end, self.conf, self.word_id, self.utterance):
+            column[:kept] = column[k:self.count]
+        self.count = kept
+        self.trimmed += k
+        first = self.utterance[0] if kept else self.utterances
+        self._segments = {segment: entry for segment, entry in self._segments.items() if entry[0] >= first}
+
+    def replace_utterance(self, segment, result):
+        """Swap the words of the utterance stored as second-pass segment for result's
+
+        result's word times are on the clock of the run that produced the
+        segment. Returns False when the utterance is no longer stored.
+        """
+        with self.lock:
+            if segment not in self._segments:
+                return False
+            utterance, offset = self._segments.pop(segment)
+            span = np.flatnonzero(self.utterance[:self.count] == utterance)
+            if not len(span):
+                return False
+            lo, hi = int(span[0]), int(span[-1]) + 1
+            words = result.get("result") or []
+            tail = [column[hi:self.count].copy() for column in (self.start, self.end, self.conf, self.word_id, self.utterance)]
+            self._grow(lo + len(words) + len(tail[0]))
+            for i, w in enumerate(words, lo):
+                self.start[i] = w.get("start", np.nan) + offset
+                self.end[i] = w.get("end", np.nan) + offset
+                self.conf[i] = w.get("conf", np.nan)
+                self.word_id[i] = self.intern(w["word"])
+                self.utterance[i] = utterance
+            after = lo + len(words)
+            for column, values in zip((self.start, self.end, self.conf, self.word_id, self.utterance), tail):
+                column[after:after + len(values)] = values
+            self.count = after + len(tail[0])
+            return True
+
+    def clear(self):
+        with self.lock:
+            self.count = 0
+            self.utterances = 0
+            self.trimmed = 0
+            self.offset = 0.0
+            self._session_end = 0.0
+            self._segments.clear()
+
+    def text(self, lo=0, hi=None):
+        vocab = self.vocab
+        return " ".join(vocab[k] for k in self.word_id[lo:self.count if hi is None else hi])
+
+    def utterance_spans(self):
+        """(first, last + 1) word indices of each utterance, in order"""
+        if not self.count:
+            return
+        bounds = np.flatnonzero(np.diff(self.utterance[:self.count])) + 1
+        lo = 0
+        for hi in bounds:
+            yield lo, int(hi)
+            lo = int(hi)
+        yield lo, self.count
+
+    def cues(self, max_chars=CAPTION_MAX_CHARS, max_seconds=CAPTION_MAX_SECONDS, max_gap=CAPTION_MAX_GAP):
+        """(start, end, text) caption cues; untimed utterances are skipped"""
+        for lo, hi in self.utterance_spans():
+            if np.isnan(self.start[lo]):
+                continue
+            first = lo
+            chars = 0
+            for i in range(lo, hi):
+                length = len(self.vocab[self.word_id[i]])
+                split = i > first and (
+                    chars + 1 + length > max_chars
+                    or self.end[i] - self.start[first] > max_seconds
+                    or self.start[i] - self.end[i - 1] > max_gap
+                )
+                if split:
+                    yield float(self.start[first]), float(self.end[i - 1]), self.text(first, i)
+                    first = i
+                    chars = 0
+                chars += length + (1 if chars else 0)
+            yield float(self.start[first]), float(self.end[hi - 1]), self.text(first, hi)
+
+    def write_srt(self, stream, **cue_options):
+        for number, (start, end, text) in enumerate(self.cues(**cue_options), 1):
+            stream.write(f"{number}\n{format_timestamp(start, ',')} --> {format_timestamp(end, ',')}\n{text}\n\n")
+
+    def write_vtt(self, stream, **cue_options):
+        stream.write("WEBVTT\n\n")
+        for start, end, text in self.cues(**cue_options):
+            stream.write(f"{format_timestamp(start, '.')} --> {format_timestamp(end, '.')}\n{text}\n\n")
+
+    def write_json(self, stream):
+        """A JSON list of utterances with their words, written one utterance at a time"""
+        stream.write("[")
+        for n, (lo, hi) in enumerate(self.utterance_spans()):
+            words = [
+                {
+                    "word": self.vocab[self.word_id[i]],
+                    "start": None if np.isnan(self.start[i]) else round(float(self.start[i]), 3),
+                    "end": None if np.isnan(self.end[i]) else round(float(self.end[i]), 3),
+                    "conf": None if np.isnan(self.conf[i]) else round(float(self.conf[i]), 3),
+                }
+                for i in range(lo, hi)
+            ]
+            utterance = {"start": words[0]["start"], "end": words[-1]["end"], "text": self.text(lo, hi), "words": words}
+            stream.write(("," if n else "") + "\n" + json.dumps(utterance, ensure_ascii=False))
+        stream.write("\n]\n")
+
+    def export(self, path):
+        """Write path as .srt, .vtt or .json depending on its extension"""
+        writers = {".srt": self.write_srt, ".vtt": self.write_vtt, ".json": self.write_json}
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in writers:
+            raise ValueError(f"Unsupported export format: {ext or path}")
+        with open(path, "w", encoding="utf-8") as f, self.lock:
+            writers[ext](f)